@@ -0,0 +1,203 @@
+"""
+Benchmark generation, model build, solve, extraction and validation by instance size.
+
+Every case is one (num_credits, num_swaps, solver) triple on a deterministic
+instance of a scenario from ``utils.data_generation.scenarios``. The seconds
+of each stage and the peak Python memory of generation, solver call and
+validation are appended as one JSON line per case to a history file, tagged
+with the current git commit, so a regression of any stage shows up between
+commits (see ``compare_history``).
+
+Usage (from the repository root)::
+
+    python -m utils.benchmarks.suite --num-credits 1000 10000 --num-swaps 2 10 --time-limit 60
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import pandas as pd
+
+from utils.data_generation.scenarios import DISTRIBUTION_SCENARIOS, RATE_CHANGE_SCENARIOS, generate_instance
+from utils.solvers.solve_cache import resolve_solver
+from utils.solvers.solve_stats import peak_rss_mb
+from utils.validation_functions.validation_cbc import validate_solution_cbc
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DEFAULT_HISTORY_PATH = os.path.join(REPO_ROOT, "output", "benchmarks", "history.jsonl")
+
+DEFAULT_NUM_CREDITS = [1_000, 10_000, 100_000]
+DEFAULT_NUM_SWAPS = [2, 10, 50]
+
+CASE_COLUMNS = ['Solver', 'Num_Credits', 'Num_Swaps', 'Dist_Key', 'Rate_Key', 'Seed']
+
+
+def git_commit():
+    """Short hash of the checked-out commit, with '+dirty' for uncommitted changes."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ('+dirty' if dirty else '')
+
+
+def measure(func, *args, **kwargs):
+    """Run ``func`` and return ``(result, seconds, peak traced MiB)``."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, seconds, peak / 2 ** 20
+
+
+def run_case(num_credits, num_swaps, solver='cbc', dist_key='Cash_90-8-2', rate_key='one_perc_change', seed=1,
+             fulfillment_ratio=0.6, time_limit=60, mip_gap=0.01, num_cpu=1):
+    """
+    Benchmark one case.
+
+    The solver stages ('build', 'solve', 'extract' and, for CBC, 'heuristic'
+    and 'export') come from the ``timings`` of the returned model; solvers
+    without them report the whole call as 'solve'. Memory is traced with
+    ``tracemalloc``, so it covers Python allocations only and not the CBC
+    subprocess.
+
+    Returns
+    -------
+    dict : one history record.
+    """
+    record = {'Solver': solver, 'Num_Credits': num_credits, 'Num_Swaps': num_swaps, 'Dist_Key': dist_key,
+              'Rate_Key': rate_key, 'Seed': seed, 'Time_Limit': time_limit, 'MIP_Gap': mip_gap}
+    stages, peak_mb = {}, {}
+
+    (credits_df, swaps_df), stages['generation'], peak_mb['generation'] = measure(
+        generate_instance, rate_key, dist_key, num_credits, num_swaps, seed, fulfillment_ratio=fulfillment_ratio)
+
+    params = {'time_limit': time_limit, 'mip_gap': mip_gap, 'num_cpu': num_cpu}
+    if solver in ('cbc', 'cplex'):
+        params['export'] = False
+    (assignment, delta, status, mdl), wall_time, peak_mb['solver'] = measure(
+        resolve_solver(solver), credits_df, swaps_df, **params)
+    timings = getattr(mdl, 'timings', None) or {'solve': wall_time}
+    stages.update(timings)
+    stages['solver_total'] = wall_time
+
+    record.update(Status=status, Objective_Delta=delta)
+    if assignment is not None:
+        (_, summary), stages['validation'], peak_mb['validation'] = measure(
+            validate_solution_cbc, assignment, swaps_df, credits_df, delta, solver_name=solver.upper(),
+            stats=getattr(mdl, 'stats', None))
+        record['All_OK'] = bool(summary['All_Delta_OK'] and summary['All_Principal_OK']
+                                and summary['All_Maturity_OK'])
+
+    record['Seconds'] = stages
+    record['Peak_MB'] = peak_mb
+    record['Max_RSS_MB'] = peak_rss_mb()
+    record['Max_Child_RSS_MB'] = peak_rss_mb(children=True)
+    return record
+
+
+def append_history(records, history_path=DEFAULT_HISTORY_PATH):
+    """Append records as JSON lines, tagged with commit, time and machine."""
+    os.makedirs(os.path.dirname(os.path.abspath(history_path)), exist_ok=True)
+    context = {'Commit': git_commit(),
+               'Timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+               'Python': platform.python_version(),
+               'Machine': platform.node()}
+    with open(history_path, 'a') as f:
+        for record in records:
+            f.write(json.dumps(dict(context, **record), default=float) + '\n')
+
+
+def load_history(history_path=DEFAULT_HISTORY_PATH):
+    """History as a flat frame, one 'Seconds.<stage>' and 'Peak_MB.<stage>' column per stage."""
+    with open(history_path) as f:
+        return pd.json_normalize([json.loads(line) for line in f if line.strip()])
+
+
+def compare_history(history_path=DEFAULT_HISTORY_PATH, baseline=None, candidate=None, threshold=0.2,
+                    min_delta=0.01):
+    """
+    Compare two commits of the history stage by stage.
+
+    ``candidate`` defaults to the last commit in the history and ``baseline``
+    to the one before it. Repeated runs of a case are averaged.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per case and metric with the baseline and candidate values and
+        their ratio; ``Regression`` marks ratios above ``1 + threshold`` that
+        also grew by more than ``min_delta`` (seconds or MiB), so that
+        sub-millisecond stages do not flag noise.
+    """
+    history = load_history(history_path)
+    commits = list(dict.fromkeys(history['Commit']))
+    candidate = candidate or commits[-1]
+    if baseline is None:
+        if len(commits) < 2:
+            raise ValueError("The history holds a single commit, nothing to compare against.")
+        baseline = commits[commits.index(candidate) - 1]
+
+    metrics = [c for c in history.columns if c.startswith(('Seconds.', 'Peak_MB.'))]
+    means = (history[history['Commit'].isin([baseline, candidate])]
+             .groupby(CASE_COLUMNS + ['Commit'])[metrics].mean())
+    table = means.stack().unstack('Commit').rename_axis(index={None: 'Metric'}).reset_index()
+    table = table.rename(columns={baseline: 'Baseline', candidate: 'Candidate'}).dropna(subset=['Baseline',
+                                                                                                'Candidate'])
+    table['Ratio'] = table['Candidate'] / table['Baseline']
+    table['Regression'] = (table['Ratio'] > 1 + threshold) & (table['Candidate'] - table['Baseline'] > min_delta)
+    table.columns.name = None
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages across instance sizes.")
+    parser.add_argument('--num-credits', type=int, nargs='+', default=DEFAULT_NUM_CREDITS)
+    parser.add_argument('--num-swaps', type=int, nargs='+', default=DEFAULT_NUM_SWAPS)
+    parser.add_argument('--solvers', nargs='+', default=['cbc'], choices=['cbc', 'cplex', 'highs'])
+    parser.add_argument('--dist-key', default='Cash_90-8-2', choices=list(DISTRIBUTION_SCENARIOS))
+    parser.add_argument('--rate-key', default='one_perc_change', choices=list(RATE_CHANGE_SCENARIOS))
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--time-limit', type=float, default=60)
+    parser.add_argument('--mip-gap', type=float, default=0.01)
+    parser.add_argument('--num-cpu', type=int, default=1)
+    parser.add_argument('--history', default=DEFAULT_HISTORY_PATH)
+    parser.add_argument('--threshold', type=float, default=0.2, help="relative slowdown reported as regression")
+    args = parser.parse_args(argv)
+
+    for solver in args.solvers:
+        for num_credits in args.num_credits:
+            for num_swaps in args.num_swaps:
+                for _ in range(args.repeat):
+                    record = run_case(num_credits, num_swaps, solver=solver, dist_key=args.dist_key,
+                                      rate_key=args.rate_key, seed=args.seed, time_limit=args.time_limit,
+                                      mip_gap=args.mip_gap, num_cpu=args.num_cpu)
+                    append_history([record], args.history)
+                    stages = ', '.join(f"{k} {v:.2f}s" for k, v in record['Seconds'].items())
+                    print(f"{solver} {num_credits} x {num_swaps}: {record['Status']} ({stages})")
+
+    try:
+        table = compare_history(args.history, threshold=args.threshold)
+    except ValueError:
+        return
+    regressions = table[table['Regression']]
+    if len(regressions):
+        print(f"Regressions above {args.threshold:.0%}:")
+        print(regressions.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -62,3 +62,84 @@ def SwapGenerator(credits_df, num_swaps, fullfillment=0.9, random_factor=0.95):
     adjusted_credits_df['UNIQUE_INDEX'] = adjusted_credits_df.index
 
     return swap_agg_df, adjusted_credits_df
+
+
+class SwapAccumulator:
+    """
+    Chunked counterpart of ``SwapGenerator``.
+
+    Credits are fed in chunks; each chunk keeps ``fullfillment`` of its rows,
+    assigns them to random swaps and adds their Principal, Delta_FV and
+    Principal * Maturity to running per-swap sums. Only the sums are kept, so
+    memory does not grow with the portfolio.
+
+    Parameters
+    ----------
+    num_swaps : int
+        Number of swaps to assign credits to.
+    fullfillment : float, default=0.9
+        The proportion of credits to retain for assignment.
+    random_factor : float, default=0.95
+        Factor to scale aggregated Delta_FV values.
+    random_seed : int, default=42
+        Seed of the per-chunk retention and swap draws.
+    """
+
+    def __init__(self, num_swaps, fullfillment=0.9, random_factor=0.95, random_seed=42):
+        self.num_swaps = num_swaps
+        self.fullfillment = fullfillment
+        self.random_factor = random_factor
+        self.random_seed = random_seed
+        self.principal = np.zeros(num_swaps + 1)
+        self.delta_fv = np.zeros(num_swaps + 1)
+        self.weighted_maturity = np.zeros(num_swaps + 1)
+        self.count = np.zeros(num_swaps + 1, dtype=np.int64)
+        self.num_chunks = 0
+        self.num_credits = 0
+
+    def add_chunk(self, credits_chunk):
+        """
+        Assign one chunk of credits and update the per-swap sums.
+
+        Returns
+        -------
+        adjusted_chunk : pd.DataFrame
+            The chunk with its 'Swap' assignment (0 for dropped credits) and a
+            running 'UNIQUE_INDEX', retained credits first as in ``SwapGenerator``.
+        """
+        rng = np.random.default_rng([self.random_seed, self.num_chunks])
+        n = len(credits_chunk)
+        order = rng.permutation(n)
+        num_retained = int(round(self.fullfillment * n))
+
+        swap = np.zeros(n, dtype=np.int16)
+        swap[order[:num_retained]] = rng.integers(1, self.num_swaps + 1, num_retained)
+
+        principal = credits_chunk['Principal'].to_numpy(dtype=float)
+        self.principal += np.bincount(swap, weights=principal, minlength=self.num_swaps + 1)
+        self.delta_fv += np.bincount(swap, weights=credits_chunk['Delta_FV'].to_numpy(dtype=float),
+                                     minlength=self.num_swaps + 1)
+        self.weighted_maturity += np.bincount(
+            swap, weights=principal * credits_chunk['Maturity'].to_numpy(dtype=float),
+            minlength=self.num_swaps + 1)
+        self.count += np.bincount(swap, minlength=self.num_swaps + 1)
+
+        adjusted_chunk = credits_chunk.iloc[np.concatenate([order[:num_retained], order[num_retained:]])]
+        adjusted_chunk = adjusted_chunk.reset_index(drop=True)
+        adjusted_chunk['Swap'] = np.concatenate([swap[order[:num_retained]],
+                                                 np.zeros(n - num_retained, dtype=np.int16)])
+        adjusted_chunk['UNIQUE_INDEX'] = np.arange(self.num_credits, self.num_credits + n)
+
+        self.num_chunks += 1
+        self.num_credits += n
+        return adjusted_chunk
+
+    def swaps_df(self):
+        """Aggregated swap statistics in the layout returned by ``SwapGenerator``."""
+        swap_ids = np.flatnonzero(self.count[1:]) + 1
+        return pd.DataFrame({
+            'Swap': swap_ids,
+            'Principal': self.principal[swap_ids],
+            'Delta_FV': self.delta_fv[swap_ids] * self.random_factor * (-1),
+            'Maturity': np.round(self.weighted_maturity[swap_ids] / self.principal[swap_ids], 2),
+        })
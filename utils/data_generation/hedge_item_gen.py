@@ -44,6 +44,93 @@ def credit_fv_delta(principal, maturity, credit_spread, interest_rates):
     return round(fv1 - fv0, 2)
 
 
+def credit_fv_delta_array(principal, maturity, credit_spread, interest_rates):
+    """
+    Vectorized ``credit_fv_delta`` over arrays of credits.
+
+    Uses the same annuity and present value formulas as the scalar function
+    (including the zero-rate case) and the same 2-decimal rounding, so every
+    element equals ``credit_fv_delta`` called on that credit.
+
+    Parameters
+    ----------
+    principal, maturity, credit_spread : array-like
+        Per-credit values, broadcast against each other.
+    interest_rates : (float, float)
+        Benchmark rates (annual) at t=0 and t=1.
+
+    Returns
+    -------
+    np.ndarray : delta values
+    """
+    principal = np.asarray(principal, dtype=float)
+    maturity = np.asarray(maturity, dtype=float)
+    credit_spread = np.asarray(credit_spread, dtype=float)
+
+    rate0 = credit_spread + interest_rates[0]
+    rate1 = credit_spread + interest_rates[1]
+
+    # Monthly payment based on rate0 (coupon); a zero rate repays the principal linearly
+    r_month = rate0 / 12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payment = np.where(r_month == 0,
+                           principal / maturity,
+                           principal * r_month / (1 - (1 + r_month) ** (-maturity)))
+
+    R = maturity - 1
+
+    def pv(period_rate, n, pay):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(period_rate == 0,
+                            -pay * n,
+                            -pay * (1 - (1 + period_rate) ** (-n)) / period_rate)
+
+    fv0 = -pv(rate0, R, payment)
+    fv1 = -pv(rate1, R, payment)
+
+    return _round_like_python(fv1 - fv0, 2)
+
+
+def credit_fv_delta_matrix(principal, maturity, credit_spread, base_rate, rate_shocks):
+    """
+    ``credit_fv_delta_array`` for every credit under every rate shock.
+
+    Parameters
+    ----------
+    principal, maturity, credit_spread : array-like of shape (num_credits,)
+    base_rate : float
+        Benchmark rate (annual) at t=0.
+    rate_shocks : array-like of shape (num_scenarios,)
+        Parallel shifts of the benchmark rate at t=1.
+
+    Returns
+    -------
+    np.ndarray of shape (num_credits, num_scenarios) : delta values; column k
+    equals ``credit_fv_delta_array`` with ``(base_rate, base_rate + rate_shocks[k])``.
+    """
+    rate1 = base_rate + np.asarray(rate_shocks, dtype=float)[np.newaxis, :]
+    return credit_fv_delta_array(np.asarray(principal, dtype=float)[:, np.newaxis],
+                                 np.asarray(maturity, dtype=float)[:, np.newaxis],
+                                 np.asarray(credit_spread, dtype=float)[:, np.newaxis],
+                                 (base_rate, rate1))
+
+
+def _round_like_python(values, decimals):
+    """
+    ``np.round`` that agrees with the builtin ``round`` element for element.
+
+    ``np.round`` scales by ``10**decimals`` before rounding, which can flip
+    values sitting on a half; those few are re-rounded with ``round``.
+    """
+    values = np.asarray(values, dtype=float)
+    rounded = np.round(values, decimals)
+    scaled = values * 10 ** decimals
+    near_half = np.flatnonzero(np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6)
+    for k in near_half:
+        rounded.flat[k] = round(float(values.flat[k]), decimals)
+    return rounded
+
+
 
 class CreditGenerator:
     """
@@ -61,6 +148,7 @@ class CreditGenerator:
         self.credit_spread_ranges = credit_spread_ranges
         self.num_credits = num_credits
         self.interest_rates = interest_rates  # [rate0, rate1] for two months
+        self.random_seed = random_seed
         np.random.seed(random_seed)
         self.validate_parameters()
 
@@ -84,7 +172,19 @@ class CreditGenerator:
             credit_types_info.append(credit_type_info)
         return credit_types_info
 
-    def generate_credits(self):
+    def generate_credits(self, batched=False):
+        """
+        Generate the credit portfolio.
+
+        ``batched=True`` draws every column as a whole array from a
+        ``numpy.random.Generator`` seeded with ``random_seed`` and computes
+        Delta_FV with ``credit_fv_delta_array``. It produces a different (but
+        reproducible) sample than the default per-credit loop, which keeps
+        using the global NumPy random state.
+        """
+        if batched:
+            return self.draw_credits(np.random.default_rng(self.random_seed), self.num_credits)
+
         credits = []
         credit_types_info = self.get_credit_types_info()
         for _ in range(self.num_credits):
@@ -106,3 +206,50 @@ class CreditGenerator:
                 'Delta_FV': delta_fv
             })
         return pd.DataFrame(credits)
+
+    def draw_credits(self, rng, size):
+        """
+        Draw ``size`` credits as whole arrays from the generator ``rng``.
+
+        Parameters
+        ----------
+        rng : np.random.Generator
+        size : int
+
+        Returns
+        -------
+        pd.DataFrame with the same columns as ``generate_credits``.
+        """
+        type_idx = rng.choice(len(self.credit_types), size=size, p=self.distributions)
+
+        principal_lo, principal_hi = np.asarray(self.principals_ranges).T
+        maturity_lo, maturity_hi = np.asarray(self.maturities_ranges).T
+        spread_lo, spread_hi = np.asarray(self.credit_spread_ranges, dtype=float).T
+
+        principal = rng.integers(principal_lo[type_idx], principal_hi[type_idx])
+        maturity = rng.integers(maturity_lo[type_idx], maturity_hi[type_idx])
+        credit_spread = rng.uniform(spread_lo[type_idx], spread_hi[type_idx])
+
+        delta_fv = credit_fv_delta_array(principal, maturity, credit_spread, self.interest_rates)
+
+        return pd.DataFrame({
+            'Type': np.asarray(self.credit_types, dtype=object)[type_idx],
+            'Principal': principal,
+            'Maturity': maturity,
+            'Credit_Spread': credit_spread,
+            'Delta_FV': delta_fv
+        })
+
+    def iter_credit_chunks(self, chunk_size):
+        """
+        Yield the portfolio as DataFrames of at most ``chunk_size`` credits.
+
+        Chunk k is drawn from its own generator spawned from ``random_seed``,
+        so a chunk's content only depends on the seed and its position and
+        the full portfolio never has to sit in memory.
+        """
+        num_chunks = -(-self.num_credits // chunk_size)
+        seeds = np.random.SeedSequence(self.random_seed).spawn(num_chunks)
+        for k, seed in enumerate(seeds):
+            size = min(chunk_size, self.num_credits - k * chunk_size)
+            yield self.draw_credits(np.random.default_rng(seed), size)
@@ -0,0 +1,112 @@
+import os
+import shutil
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+# Numeric columns kept in the store; other columns ('Type', 'Swap') are left out
+CREDIT_COLUMNS = ('Principal', 'Maturity', 'Delta_FV', 'Credit_Spread', 'UNIQUE_INDEX')
+SWAP_COLUMNS = ('Principal', 'Delta_FV', 'Maturity')
+
+
+def as_frame(data):
+    """
+    DataFrame over ``data`` without copying it.
+
+    ``data`` is a DataFrame, returned as is, or a mapping of column name to
+    1-D array such as ``SharedInstance.credits``; the frame's columns are then
+    views of those arrays.
+    """
+    if isinstance(data, pd.DataFrame):
+        return data
+    if isinstance(data, Mapping):
+        return pd.DataFrame(dict(data), copy=False)
+    raise TypeError(f"Expected a DataFrame or a mapping of column arrays, got {type(data).__name__}.")
+
+
+class SharedInstance:
+    """
+    Read-only view of one stored instance.
+
+    ``credits`` and ``swaps`` map column names to NumPy arrays memory-mapped
+    from the store, so every process attached to the same instance shares
+    one copy in the page cache. ``frames()`` wraps them in DataFrames
+    without copying.
+    """
+
+    def __init__(self, credits, swaps):
+        self.credits = credits
+        self.swaps = swaps
+
+    @property
+    def num_credits(self):
+        return len(next(iter(self.credits.values()), ()))
+
+    @property
+    def num_swaps(self):
+        return len(next(iter(self.swaps.values()), ()))
+
+    def frames(self):
+        return as_frame(self.credits), as_frame(self.swaps)
+
+
+class InstanceStore:
+    """
+    Directory of instances as one ``.npy`` file per numeric column.
+
+    An instance is written once (``put`` or ``put_csv``) and then attached by
+    any number of worker processes as memory-mapped, zero-copy arrays
+    (``attach``), instead of every worker parsing the CSV files into its own
+    frames. Instances are written to a temporary directory and renamed into
+    place, so a reader never sees a partial one.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.store_dir, name)
+
+    def __contains__(self, name):
+        return os.path.isdir(self.path(name))
+
+    def put(self, name, credits_df: pd.DataFrame, swaps_df: pd.DataFrame):
+        """Store the numeric columns of an instance under ``name``; an existing one is kept."""
+        if name in self:
+            return self.path(name)
+        tmp_path = f"{self.path(name)}.{os.getpid()}.tmp"
+        for part, frame, columns in (('credits', credits_df, CREDIT_COLUMNS), ('swaps', swaps_df, SWAP_COLUMNS)):
+            os.makedirs(os.path.join(tmp_path, part), exist_ok=True)
+            for column in columns:
+                if column in frame.columns:
+                    np.save(os.path.join(tmp_path, part, f"{column}.npy"),
+                            np.ascontiguousarray(frame[column].to_numpy()))
+        try:
+            os.rename(tmp_path, self.path(name))
+        except OSError:
+            # Another process stored the same instance first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if name not in self:
+                raise
+        return self.path(name)
+
+    def put_csv(self, name, credits_path, swaps_path):
+        """Store an instance from its ``credits_{seed}.csv`` and ``swaps_{seed}.csv`` files."""
+        if name in self:
+            return self.path(name)
+        credits_df = pd.read_csv(credits_path, usecols=lambda column: column in CREDIT_COLUMNS)
+        swaps_df = pd.read_csv(swaps_path, usecols=lambda column: column in SWAP_COLUMNS)
+        return self.put(name, credits_df, swaps_df)
+
+    def attach(self, name):
+        """Memory-map a stored instance as a ``SharedInstance``."""
+        if name not in self:
+            raise KeyError(f"Instance '{name}' is not in the store {self.store_dir}.")
+        parts = {}
+        for part, columns in (('credits', CREDIT_COLUMNS), ('swaps', SWAP_COLUMNS)):
+            paths = {column: os.path.join(self.path(name), part, f"{column}.npy") for column in columns}
+            parts[part] = {column: np.load(path, mmap_mode='r')
+                           for column, path in paths.items() if os.path.exists(path)}
+        return SharedInstance(parts['credits'], parts['swaps'])
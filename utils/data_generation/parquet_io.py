@@ -0,0 +1,85 @@
+import os
+
+from utils.data_generation.hedge_instrument_gen import SwapAccumulator
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError("Parquet instance files require 'pyarrow' (pip install pyarrow).") from exc
+    return pa, pq
+
+
+def credit_schema():
+    """Typed Arrow schema of an adjusted credit file."""
+    pa, _ = _pyarrow()
+    return pa.schema([
+        ('Type', pa.dictionary(pa.int8(), pa.string())),
+        ('Principal', pa.int64()),
+        ('Maturity', pa.int16()),
+        ('Credit_Spread', pa.float64()),
+        ('Delta_FV', pa.float64()),
+        ('Swap', pa.int16()),
+        ('UNIQUE_INDEX', pa.int64()),
+    ])
+
+
+def swap_schema():
+    """Typed Arrow schema of a swap file."""
+    pa, _ = _pyarrow()
+    return pa.schema([
+        ('Swap', pa.int16()),
+        ('Principal', pa.float64()),
+        ('Delta_FV', pa.float64()),
+        ('Maturity', pa.float64()),
+    ])
+
+
+def save_instance_parquet(credit_generator, num_swaps, out_dir, seed, chunk_size=1_000_000,
+                          fulfillment_ratio=0.6, random_factor=0.95):
+    """
+    Generate one instance chunk by chunk and write it as Parquet.
+
+    Credits are drawn with ``credit_generator.iter_credit_chunks`` and
+    assigned to swaps by a ``SwapAccumulator``; each adjusted chunk is written
+    as a row group of ``credits_{seed}.parquet`` and the swap aggregates go to
+    ``swaps_{seed}.parquet``. Peak memory is bounded by ``chunk_size``.
+    Dropped credits carry ``Swap == 0``.
+
+    Returns
+    -------
+    (credits_path, swaps_path)
+    """
+    pa, pq = _pyarrow()
+    os.makedirs(out_dir, exist_ok=True)
+    credits_path = os.path.join(out_dir, f"credits_{seed}.parquet")
+    swaps_path = os.path.join(out_dir, f"swaps_{seed}.parquet")
+
+    schema = credit_schema()
+    accumulator = SwapAccumulator(num_swaps, fulfillment_ratio, random_factor, random_seed=seed)
+    with pq.ParquetWriter(credits_path, schema) as writer:
+        for chunk in credit_generator.iter_credit_chunks(chunk_size):
+            adjusted = accumulator.add_chunk(chunk)
+            writer.write_table(pa.Table.from_pandas(adjusted[schema.names], schema=schema,
+                                                    preserve_index=False))
+
+    swaps_df = accumulator.swaps_df()
+    pq.write_table(pa.Table.from_pandas(swaps_df, schema=swap_schema(), preserve_index=False),
+                   swaps_path)
+    return credits_path, swaps_path
+
+
+def load_instance_parquet(out_dir, seed, columns=None):
+    """
+    Load ``credits_{seed}.parquet`` and ``swaps_{seed}.parquet`` from ``out_dir``.
+
+    ``columns`` restricts the credit columns read, e.g. to the numeric ones a
+    solver needs.
+    """
+    _, pq = _pyarrow()
+    credits_df = pq.read_table(os.path.join(out_dir, f"credits_{seed}.parquet"),
+                               columns=columns).to_pandas()
+    swaps_df = pq.read_table(os.path.join(out_dir, f"swaps_{seed}.parquet")).to_pandas()
+    return credits_df, swaps_df
@@ -0,0 +1,83 @@
+import os
+import numpy as np
+
+from utils.data_generation.hedge_item_gen import CreditGenerator
+from utils.data_generation.hedge_instrument_gen import SwapGenerator
+
+# scenarios
+DISTRIBUTION_SCENARIOS = {
+    "Cash_90-8-2": [0.90, 0.08, 0.02],
+    "Mortgage_74-24-2": [0.74, 0.24, 0.02],
+}
+
+RATE_CHANGE_SCENARIOS = {
+    "one_perc_change": 0.01,
+    "two_perc_change": 0.02,
+}
+
+CREDIT_TYPES = ['Cash Loan Credit', 'Car Loan Credit', 'Mortgage Credit']
+PRINCIPAL_RANGES = [[10_000, 50_000], [20_000, 70_000], [30_000, 100_000]]
+MATURITY_RANGES  = [[4, 8], [3, 9], [2, 12]]
+CREDIT_SPREAD_RANGES = [[0.005, 0.015], [0.015, 0.030], [0.020, 0.040]]
+
+BASE_RATE = 0.07
+
+
+def make_experiment_name(dist_key, num_credits, num_swaps, rate_key):
+    return f"{dist_key}|{rate_key}|{num_credits}_Credits|{num_swaps}_Swaps"
+
+
+def parse_experiment_name(experiment_name):
+    """
+    Scenario keys of a ``make_experiment_name`` name, or None for any other name.
+
+    Returns a dict with 'Dist_Key', 'Rate_Key', 'Num_Credits' and 'Num_Swaps'.
+    """
+    parts = str(experiment_name).split('|')
+    if len(parts) != 4 or not parts[2].endswith('_Credits') or not parts[3].endswith('_Swaps'):
+        return None
+    try:
+        num_credits = int(parts[2][:-len('_Credits')])
+        num_swaps = int(parts[3][:-len('_Swaps')])
+    except ValueError:
+        return None
+    return {'Dist_Key': parts[0], 'Rate_Key': parts[1], 'Num_Credits': num_credits, 'Num_Swaps': num_swaps}
+
+
+def credit_generator_inputs(rate_key, dist_key, num_credits):
+    """Keyword arguments of ``CreditGenerator`` for one point of the scenario grid."""
+    dr = RATE_CHANGE_SCENARIOS[rate_key]
+    return {
+        'credit_types': CREDIT_TYPES,
+        'principals_ranges': PRINCIPAL_RANGES,
+        'maturities_ranges': MATURITY_RANGES,
+        'distributions': DISTRIBUTION_SCENARIOS[dist_key],
+        'credit_spread_ranges': CREDIT_SPREAD_RANGES,
+        'num_credits': num_credits,
+        'interest_rates': [BASE_RATE, BASE_RATE + dr]
+    }
+
+
+def generate_instance(rate_key, dist_key, num_credits, num_swaps, seed, fulfillment_ratio=0.6):
+    """Deterministic (credits_df, swaps_df) instance of one scenario and seed."""
+    np.random.seed(seed)
+    credit_generator = CreditGenerator(**credit_generator_inputs(rate_key, dist_key, num_credits),
+                                       random_seed=seed)
+    credits_df = credit_generator.generate_credits()
+    swaps_df, credits_df = SwapGenerator(credits_df, num_swaps, fulfillment_ratio, random_factor=0.95)
+    return credits_df, swaps_df
+
+
+def generate_and_save_instance(rate_key, dist_key, num_credits, num_swaps,
+                               random_seed_list, fulfillment_ratio=0.6, data_root="../data"):
+    # create one folder for this setup
+    experiment_name = make_experiment_name(dist_key, num_credits, num_swaps, rate_key)
+    out_dir = os.path.join(data_root, experiment_name)
+    os.makedirs(out_dir, exist_ok=True)
+
+    for seed in random_seed_list:
+        credits_df_v1, swaps_df = generate_instance(rate_key, dist_key, num_credits, num_swaps, seed,
+                                                    fulfillment_ratio=fulfillment_ratio)
+
+        credits_df_v1.to_csv(os.path.join(out_dir, f"credits_{seed}.csv"), index=False)
+        swaps_df.to_csv(os.path.join(out_dir, f"swaps_{seed}.csv"), index=False)
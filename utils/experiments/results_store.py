@@ -0,0 +1,244 @@
+"""
+SQLite store of experiment runs and their per-swap validation rows.
+
+Every run keeps its scenario keys (split out of ``Experiment_Name``), the
+seed, the solver, its ``SolveStats`` summary fields and the validation
+summary; the ``validate_assignment`` rows go to a second table keyed by
+run. Writes are buffered and inserted in batches, one transaction each.
+The scenario keys and the solver are indexed. Aggregations run inside
+SQLite, so comparing thousands of runs never loads them all into memory.
+
+Usage::
+
+    with ResultsStore() as store:
+        store.add(summary, results_df, Seed=1)
+        store.aggregate(['Wall_Time', 'MIP_Gap'], by=['Solver', 'Num_Credits'])
+"""
+import math
+import os
+import sqlite3
+import statistics
+import time
+
+import pandas as pd
+
+from utils.data_generation.scenarios import parse_experiment_name
+from utils.validation_functions.validation_core import RESULT_COLUMNS
+
+# Same location as the runner's results CSV
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DEFAULT_RESULTS_DB = os.path.join(REPO_ROOT, "output", "results", "experiment_results.sqlite")
+
+RUN_COLUMNS = {
+    'Run_ID': 'INTEGER PRIMARY KEY',
+    'Job_Key': 'TEXT',
+    'Experiment_Name': 'TEXT',
+    'Dist_Key': 'TEXT',
+    'Rate_Key': 'TEXT',
+    'Num_Credits': 'INTEGER',
+    'Num_Swaps': 'INTEGER',
+    'Seed': 'INTEGER',
+    'Solver': 'TEXT',
+    'Status': 'TEXT',
+    'Objective_Delta': 'REAL',
+    'All_Delta_OK': 'INTEGER',
+    'All_Principal_OK': 'INTEGER',
+    'All_Maturity_OK': 'INTEGER',
+    'Wall_Time': 'REAL',
+    'Build_Time': 'REAL',
+    'Solve_Time': 'REAL',
+    'Deterministic_Time': 'REAL',
+    'MIP_Gap': 'REAL',
+    'Num_Rows': 'INTEGER',
+    'Num_Cols': 'INTEGER',
+    'Num_Nonzeros': 'INTEGER',
+    'Num_Nodes': 'INTEGER',
+    'Peak_RSS_MB': 'REAL',
+    'Recorded_At': 'REAL',
+}
+
+SWAP_RESULT_COLUMNS = ['Run_ID'] + RESULT_COLUMNS
+SWAP_RESULT_TYPES = {'Run_ID': 'INTEGER', 'Swap_ID': 'INTEGER', 'Principal_OK': 'INTEGER', 'Delta_OK': 'INTEGER',
+                     'Maturity_OK': 'INTEGER'}
+
+INDEXES = {
+    'runs_scenario': ('runs', ('Dist_Key', 'Rate_Key', 'Num_Credits', 'Num_Swaps', 'Seed')),
+    'runs_solver': ('runs', ('Solver', 'Num_Credits', 'Num_Swaps')),
+    'runs_experiment': ('runs', ('Experiment_Name', 'Seed', 'Solver')),
+    'swap_results_run': ('swap_results', ('Run_ID', 'Swap_ID')),
+}
+
+AGGREGATES = ('median', 'avg', 'min', 'max', 'sum', 'count')
+
+
+class Median:
+    """SQLite aggregate for the median of a group, ignoring NULLs."""
+
+    def __init__(self):
+        self.values = []
+
+    def step(self, value):
+        if value is not None:
+            self.values.append(value)
+
+    def finalize(self):
+        return statistics.median(self.values) if self.values else None
+
+
+def sql_value(value):
+    """``value`` as a SQLite parameter: NumPy scalars unwrapped, NaN as NULL."""
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def run_record(summary, **metadata):
+    """
+    Row of the runs table from a validation ``summary`` and extra fields.
+
+    The scenario keys are parsed from 'Experiment_Name' unless given, and
+    'Objective_Delta' (formatted by ``summarize_results``) becomes a number.
+    """
+    record = dict(summary, **metadata)
+    for key, value in (parse_experiment_name(record.get('Experiment_Name')) or {}).items():
+        record.setdefault(key, value)
+    delta = record.get('Objective_Delta')
+    if isinstance(delta, str):
+        record['Objective_Delta'] = float(delta.replace(',', '')) if delta.strip() else None
+    record.setdefault('Recorded_At', time.time())
+    return [sql_value(record.get(column)) for column in RUN_COLUMNS if column != 'Run_ID']
+
+
+class ResultsStore:
+    """
+    Runs and per-swap validation rows in one SQLite file.
+
+    ``add`` buffers a run and writes the buffer once it holds ``batch_size``
+    runs; ``flush`` (also on ``close`` and leaving a ``with`` block) writes
+    the rest. The file is in WAL mode, so notebooks can query it while an
+    experiment appends.
+    """
+
+    def __init__(self, path=DEFAULT_RESULTS_DB, batch_size=100):
+        self.path = path
+        self.batch_size = batch_size
+        self.pending = []
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.create_aggregate('median', 1, Median)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.create_tables()
+
+    def create_tables(self):
+        run_columns = ", ".join(f"{column} {kind}" for column, kind in RUN_COLUMNS.items())
+        swap_columns = ", ".join(f"{column} {SWAP_RESULT_TYPES.get(column, 'REAL')}"
+                                 for column in SWAP_RESULT_COLUMNS)
+        with self.connection:
+            self.connection.execute(f"CREATE TABLE IF NOT EXISTS runs ({run_columns})")
+            self.connection.execute(f"CREATE TABLE IF NOT EXISTS swap_results ({swap_columns})")
+            for name, (table, columns) in INDEXES.items():
+                self.connection.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def add(self, summary, results_df: pd.DataFrame = None, **metadata):
+        """
+        Buffer one run.
+
+        ``summary`` is the validation summary (or a runner row) and
+        ``results_df`` the per-swap rows of ``validate_assignment``;
+        ``metadata`` adds or overrides fields, e.g. ``Seed`` or ``Job_Key``.
+        """
+        swap_rows = []
+        if results_df is not None and not results_df.empty:
+            # Column lists instead of a per-run reindex, which dominates small frames
+            num_rows = len(results_df)
+            columns = [results_df[column].tolist() if column in results_df.columns else [None] * num_rows
+                       for column in RESULT_COLUMNS]
+            swap_rows = list(zip(*columns))
+        self.pending.append((run_record(summary, **metadata), swap_rows))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered runs in one transaction."""
+        if not self.pending:
+            return
+        run_columns = [column for column in RUN_COLUMNS if column != 'Run_ID']
+        insert_run = f"INSERT INTO runs ({', '.join(run_columns)}) VALUES ({', '.join('?' * len(run_columns))})"
+        with self.connection:
+            # SQLite assigns Run_ID inside the write transaction, so concurrent writers never collide
+            swap_rows = []
+            for record, rows in self.pending:
+                run_id = self.connection.execute(insert_run, record).lastrowid
+                swap_rows.extend([run_id] + [sql_value(value) for value in row] for row in rows)
+            self.connection.executemany(
+                f"INSERT INTO swap_results ({', '.join(SWAP_RESULT_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(SWAP_RESULT_COLUMNS))})", swap_rows)
+        self.pending = []
+
+    def query(self, sql, params=()):
+        """Run a SELECT on the store and return the result as a DataFrame."""
+        self.flush()
+        return pd.read_sql_query(sql, self.connection, params=params)
+
+    @staticmethod
+    def where(filters):
+        """WHERE clause and parameters from ``column=value`` (or ``column=[values]``) run filters."""
+        clauses, params = [], []
+        for column, value in filters.items():
+            if column not in RUN_COLUMNS:
+                raise ValueError(f"Unknown run column '{column}'.")
+            if isinstance(value, (list, tuple, set)):
+                clauses.append(f"runs.{column} IN ({', '.join('?' * len(value))})")
+                params.extend(sql_value(item) for item in value)
+            else:
+                clauses.append(f"runs.{column} = ?")
+                params.append(sql_value(value))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def runs(self, columns=None, **filters):
+        """Runs matching ``filters``, e.g. ``runs(Solver='cbc', Num_Credits=[50_000, 100_000])``."""
+        columns = list(columns) if columns is not None else list(RUN_COLUMNS)
+        for column in columns:
+            if column not in RUN_COLUMNS:
+                raise ValueError(f"Unknown run column '{column}'.")
+        where, params = self.where(filters)
+        return self.query(f"SELECT {', '.join(columns)} FROM runs{where} ORDER BY Run_ID", params)
+
+    def swap_results(self, **filters):
+        """Per-swap validation rows of the runs matching ``filters``, with their Run_ID."""
+        where, params = self.where(filters)
+        columns = ", ".join(f"swap_results.{column}" for column in SWAP_RESULT_COLUMNS)
+        return self.query(f"SELECT {columns} FROM swap_results JOIN runs ON runs.Run_ID = swap_results.Run_ID"
+                          f"{where} ORDER BY swap_results.Run_ID, swap_results.Swap_ID", params)
+
+    def aggregate(self, metrics, by=('Solver', 'Num_Credits'), how='median', **filters):
+        """
+        One ``how`` aggregate ('median', 'avg', 'min', 'max', 'sum' or 'count')
+        of every metric per group of ``by``, with the group's 'Num_Runs'.
+
+        E.g. ``aggregate(['Wall_Time', 'MIP_Gap'], by=['Solver', 'Num_Credits'])``
+        gives the median wall time and gap by credit count per solver.
+        """
+        metrics, by = [metrics] if isinstance(metrics, str) else list(metrics), list(by)
+        if how not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate '{how}', expected one of {AGGREGATES}.")
+        for column in metrics + by:
+            if column not in RUN_COLUMNS:
+                raise ValueError(f"Unknown run column '{column}'.")
+        where, params = self.where(filters)
+        selected = ", ".join(by + [f"{how}({metric}) AS {metric}" for metric in metrics] + ["COUNT(*) AS Num_Runs"])
+        group = f" GROUP BY {', '.join(by)} ORDER BY {', '.join(by)}" if by else ""
+        return self.query(f"SELECT {selected} FROM runs{where}{group}", params)
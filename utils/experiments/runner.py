@@ -0,0 +1,223 @@
+"""
+Run the solvers over the scenario grid in a process pool.
+
+Each job is one (scenario, seed, solver) triple. Missing instances are
+generated first and their numeric columns put into an ``InstanceStore``
+under the data root; the solves then attach them as shared memory-mapped
+arrays instead of parsing the CSV files in every worker. They run with
+``num_cpu`` solver threads per job and at most ``cpu_count // num_cpu`` jobs
+at a time. Every finished job is appended to a single results CSV; jobs
+already present there are skipped, so an interrupted run can simply be
+restarted. The runs and their per-swap validation rows also go to a
+``ResultsStore`` for querying across the grid.
+
+Usage (from the repository root)::
+
+    python -m utils.experiments.runner --num-credits 50000 --num-swaps 2 4 --solvers cbc
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from utils.data_generation.instance_store import InstanceStore
+from utils.experiments.results_store import DEFAULT_RESULTS_DB, ResultsStore
+from utils.data_generation.scenarios import (DISTRIBUTION_SCENARIOS, RATE_CHANGE_SCENARIOS,
+                                             generate_and_save_instance, make_experiment_name)
+from utils.solvers.backends import BACKENDS, get_backend, solve
+
+# Same locations as the notebooks' "../data" and "../output", resolved from the repository root
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DEFAULT_DATA_ROOT = os.path.join(REPO_ROOT, "data")
+DEFAULT_RESULTS_PATH = os.path.join(REPO_ROOT, "output", "results", "experiment_results.csv")
+
+RESULT_COLUMNS = ['Job_Key', 'Experiment_Name', 'Dist_Key', 'Rate_Key', 'Num_Credits', 'Num_Swaps', 'Seed',
+                  'Solver', 'Status', 'Wall_Time', 'Deterministic_Time', 'MIP_Gap', 'Objective_Delta',
+                  'All_Delta_OK', 'All_Principal_OK', 'All_Maturity_OK']
+
+
+def list_jobs(num_credits_list, num_swaps_list, rate_keys, dist_keys, seeds, solvers):
+    """Enumerate the scenario grid as a list of job dicts."""
+    jobs = []
+    for num_credits, num_swaps, rate_key, dist_key, seed, solver in itertools.product(
+            num_credits_list, num_swaps_list, rate_keys, dist_keys, seeds, solvers):
+        jobs.append({
+            'Experiment_Name': make_experiment_name(dist_key, num_credits, num_swaps, rate_key),
+            'Dist_Key': dist_key,
+            'Rate_Key': rate_key,
+            'Num_Credits': num_credits,
+            'Num_Swaps': num_swaps,
+            'Seed': seed,
+            'Solver': solver,
+        })
+    return jobs
+
+
+def job_key(job):
+    return f"{job['Experiment_Name']}|seed_{job['Seed']}|{job['Solver']}"
+
+
+def instance_paths(job, data_root):
+    out_dir = os.path.join(data_root, job['Experiment_Name'])
+    return (os.path.join(out_dir, f"credits_{job['Seed']}.csv"),
+            os.path.join(out_dir, f"swaps_{job['Seed']}.csv"))
+
+
+def instance_store(data_root):
+    return InstanceStore(os.path.join(data_root, "store"))
+
+
+def instance_name(job):
+    return f"{job['Experiment_Name']}|seed_{job['Seed']}"
+
+
+def ensure_instance(job, data_root, fulfillment_ratio=0.6):
+    """Generate the job's instance files unless they already exist, and put them into the store."""
+    credits_path, swaps_path = instance_paths(job, data_root)
+    if not (os.path.exists(credits_path) and os.path.exists(swaps_path)):
+        generate_and_save_instance(job['Rate_Key'], job['Dist_Key'], job['Num_Credits'], job['Num_Swaps'],
+                                   [job['Seed']], fulfillment_ratio=fulfillment_ratio, data_root=data_root)
+    instance_store(data_root).put_csv(instance_name(job), credits_path, swaps_path)
+    return job
+
+
+def run_job(job, data_root, num_cpu=1, time_limit=None, mip_gap=0.01):
+    """
+    Attach one stored instance, solve it with the job's solver and validate the result.
+
+    Returns the job's results row and its per-swap validation rows (None
+    without a solution).
+    """
+    credits_df, swaps_df = instance_store(data_root).attach(instance_name(job)).frames()
+
+    solver = job['Solver']
+    params = {'export': False} if get_backend(solver).exports else {}
+    start = time.time()
+    assignment, delta, status, mdl = solve(credits_df, swaps_df, backend=solver, time_limit=time_limit,
+                                           num_cpu=num_cpu, mip_gap=mip_gap,
+                                           experiment_name=job['Experiment_Name'], **params)
+    wall_time = time.time() - start
+
+    row = dict(job, Job_Key=job_key(job), Status=status, Wall_Time=wall_time)
+    if assignment is None:
+        return row, None
+
+    results_df, summary = validate_solve(solver, assignment, credits_df, swaps_df, delta, mdl,
+                                         job['Experiment_Name'])
+    row.update(summary)
+    row['Solver'] = solver
+    return row, results_df
+
+
+def validate_solve(solver, assignment, credits_df, swaps_df, delta, mdl, experiment_name):
+    """Per-swap validation rows and summary of a solver's assignment, with the solver's ``mdl.stats`` if any."""
+    stats = getattr(mdl, 'stats', None)
+    if solver == 'cplex':
+        from utils.validation_functions.validation_cplex import validate_solution_cplex
+        return validate_solution_cplex(assignment, swaps_df, credits_df, delta, solver_name='CPLEX',
+                                       mdl=mdl, stats=stats, experiment_name=experiment_name)
+    else:
+        from utils.validation_functions.validation_cbc import validate_solution_cbc
+        return validate_solution_cbc(assignment, swaps_df, credits_df, delta, solver_name=solver.upper(),
+                                     stats=stats, experiment_name=experiment_name)
+
+
+def completed_job_keys(results_path):
+    if not os.path.exists(results_path):
+        return set()
+    return set(pd.read_csv(results_path, usecols=['Job_Key'])['Job_Key'])
+
+
+def append_result(row, results_path):
+    os.makedirs(os.path.dirname(os.path.abspath(results_path)), exist_ok=True)
+    frame = pd.DataFrame([row]).reindex(columns=RESULT_COLUMNS)
+    frame.to_csv(results_path, mode='a', header=not os.path.exists(results_path), index=False)
+
+
+def run_grid(jobs, results_path=DEFAULT_RESULTS_PATH, data_root=DEFAULT_DATA_ROOT, num_cpu=1, max_workers=None,
+             time_limit=None, mip_gap=0.01, fulfillment_ratio=0.6, results_db=DEFAULT_RESULTS_DB):
+    """
+    Run ``jobs`` in a process pool, appending one row per finished job to ``results_path``.
+
+    Each finished job is also added, with its per-swap validation rows, to
+    the ``ResultsStore`` at ``results_db`` (None to skip it).
+
+    Parameters
+    ----------
+    num_cpu : int, default=1
+        Solver threads per job.
+    max_workers : int, optional
+        Concurrent jobs; defaults to ``cpu_count // num_cpu`` so the solver
+        threads never oversubscribe the machine.
+
+    Returns
+    -------
+    list of dict : rows of the jobs run in this call.
+    """
+    if max_workers is None:
+        max_workers = max(1, (os.cpu_count() or 1) // num_cpu)
+
+    done = completed_job_keys(results_path)
+    pending = [job for job in jobs if job_key(job) not in done]
+    print(f"{len(jobs) - len(pending)} of {len(jobs)} jobs already done, running {len(pending)}.")
+
+    # One generation task per instance so that solvers of the same instance never race on its files
+    instances = {(job['Experiment_Name'], job['Seed']): job for job in pending}
+
+    rows = []
+    store = ResultsStore(results_db) if results_db is not None else None
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            for future in as_completed([pool.submit(ensure_instance, job, data_root, fulfillment_ratio)
+                                        for job in instances.values()]):
+                future.result()
+
+            futures = {pool.submit(run_job, job, data_root, num_cpu, time_limit, mip_gap): job
+                       for job in pending}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    row, results_df = future.result()
+                except Exception as exc:
+                    print(f"Job {job_key(job)} failed: {exc!r}", file=sys.stderr)
+                    continue
+                append_result(row, results_path)
+                if store is not None:
+                    store.add(row, results_df)
+                rows.append(row)
+                print(f"{row['Job_Key']}: {row['Status']} in {row['Wall_Time']:.2f}s")
+    finally:
+        if store is not None:
+            store.close()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the solvers over the scenario grid.")
+    parser.add_argument('--num-credits', type=int, nargs='+', default=[50_000, 100_000, 500_000])
+    parser.add_argument('--num-swaps', type=int, nargs='+', default=[2, 4, 8])
+    parser.add_argument('--rate-keys', nargs='+', default=list(RATE_CHANGE_SCENARIOS))
+    parser.add_argument('--dist-keys', nargs='+', default=list(DISTRIBUTION_SCENARIOS))
+    parser.add_argument('--seeds', type=int, nargs='+', default=list(range(1, 6)))
+    parser.add_argument('--solvers', nargs='+', default=['cbc'], choices=list(BACKENDS))
+    parser.add_argument('--num-cpu', type=int, default=1, help="solver threads per job")
+    parser.add_argument('--max-workers', type=int, default=None)
+    parser.add_argument('--time-limit', type=float, default=None)
+    parser.add_argument('--mip-gap', type=float, default=0.01)
+    parser.add_argument('--data-root', default=DEFAULT_DATA_ROOT)
+    parser.add_argument('--results', default=DEFAULT_RESULTS_PATH)
+    parser.add_argument('--results-db', default=DEFAULT_RESULTS_DB)
+    args = parser.parse_args(argv)
+
+    jobs = list_jobs(args.num_credits, args.num_swaps, args.rate_keys, args.dist_keys, args.seeds, args.solvers)
+    run_grid(jobs, results_path=args.results, data_root=args.data_root, num_cpu=args.num_cpu,
+             max_workers=args.max_workers, time_limit=args.time_limit, mip_gap=args.mip_gap,
+             results_db=args.results_db)
+
+
+if __name__ == "__main__":
+    main()
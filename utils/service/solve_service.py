@@ -0,0 +1,559 @@
+"""
+Local solve service: a shared job queue in front of the solvers.
+
+Clients submit instances over a small HTTP/1.1 API on a local TCP port or
+Unix socket. An instance is given inline (``credits``/``swaps`` as mappings
+of column name to values), as CSV paths (``credits_path``/``swaps_path``)
+or as the name of an instance already in the ``InstanceStore``. Jobs queue
+in submission order and start once their ``num_cpu`` solver threads fit in
+the host's core budget. Each job runs in its own ``solve_worker``
+subprocess, so a long MIP never blocks the event loop and cancelling a job
+kills its solver. Each job's incumbent and bound updates stream back to clients as
+JSON lines.
+
+API::
+
+    POST   /jobs                  submit {"solver", "time_limit", "num_cpu", "mip_gap", "params", <instance>}
+    GET    /jobs                  all jobs
+    GET    /jobs/<id>             one job
+    GET    /jobs/<id>/events      the job's events so far, then new ones until it ends (JSON lines)
+    GET    /jobs/<id>/assignment  the compact swap index of a finished job
+    DELETE /jobs/<id>             cancel a queued or running job
+
+Usage (from the repository root)::
+
+    python -m utils.service.solve_service --socket /tmp/mip_drop.sock
+    curl --unix-socket /tmp/mip_drop.sock -N localhost/jobs/1/events
+"""
+import argparse
+import asyncio
+import collections
+import hashlib
+import http.client
+import itertools
+import json
+import os
+import signal
+import socket
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.data_generation.instance_store import CREDIT_COLUMNS, SWAP_COLUMNS, InstanceStore
+from utils.experiments.runner import DEFAULT_DATA_ROOT, REPO_ROOT
+from utils.service.solve_worker import json_safe
+from utils.solvers.backends import BACKENDS
+from utils.solvers.solve_cache import instance_key
+
+DEFAULT_PORT = 8765
+
+JOB_STATES = ('queued', 'running', 'finished', 'failed', 'cancelled', 'timed_out')
+FINAL_STATES = ('finished', 'failed', 'cancelled', 'timed_out')
+
+# Seconds a worker may run past its time limit (model build, validation) before it is killed
+DEFAULT_GRACE_PERIOD = 60
+
+# Columns every inline credit and swap payload must carry; the others are optional
+REQUIRED_COLUMNS = ('Principal', 'Delta_FV', 'Maturity')
+
+# Longest event line read from a worker; the result line carries the whole assignment
+MAX_EVENT_LINE = 2 ** 30
+
+HTTP_REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                409: 'Conflict', 500: 'Internal Server Error'}
+
+
+class SolveJob:
+    """
+    One submitted solve.
+
+    ``events`` holds every event of the job in order; ``changed`` is
+    notified whenever one is added, so streams can wait for the next.
+    ``result`` is the worker's 'result' event without the assignment, which
+    is kept apart in ``assignment``.
+    """
+
+    def __init__(self, job_id, solver, instance, num_cpu, time_limit, params):
+        self.job_id = job_id
+        self.solver = solver
+        self.instance = instance
+        self.num_cpu = num_cpu
+        self.time_limit = time_limit
+        self.params = params
+        self.state = 'queued'
+        self.submitted = time.time()
+        self.started = None
+        self.ended = None
+        self.events = []
+        self.result = None
+        self.assignment = None
+        self.process = None
+        self.changed = asyncio.Condition()
+
+    @property
+    def done(self):
+        return self.state in FINAL_STATES
+
+    async def emit(self, event, **fields):
+        async with self.changed:
+            self.events.append(dict(fields, event=event, job_id=self.job_id, seq=len(self.events)))
+            self.changed.notify_all()
+
+    async def set_state(self, state, **fields):
+        self.state = state
+        if state == 'running':
+            self.started = time.time()
+        elif state in FINAL_STATES:
+            self.ended = time.time()
+        await self.emit('state', state=state, **fields)
+
+    def summary(self):
+        return {'job_id': self.job_id, 'solver': self.solver, 'instance': self.instance, 'state': self.state,
+                'num_cpu': self.num_cpu, 'time_limit': self.time_limit, 'submitted': self.submitted,
+                'started': self.started, 'ended': self.ended, 'result': self.result}
+
+
+def payload_frame(columns, allowed, part):
+    """
+    DataFrame of the allowed numeric columns of an inline instance payload.
+
+    Raises a ValueError unless every ``REQUIRED_COLUMNS`` column is given
+    and all columns are one-dimensional, numeric and of the same length.
+    """
+    if not isinstance(columns, dict):
+        raise ValueError("Inline credits and swaps must be objects mapping column names to values.")
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ValueError(f"Inline {part} lack the column(s) {', '.join(missing)}.")
+    arrays = {column: np.asarray(values) for column, values in columns.items() if column in allowed}
+    for column, values in arrays.items():
+        if values.ndim != 1 or not (np.issubdtype(values.dtype, np.number) or values.dtype == bool):
+            raise ValueError(f"Inline {part} column '{column}' must be a list of numbers.")
+    lengths = {len(values) for values in arrays.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"Inline {part} columns must all have the same length.")
+    if lengths == {0}:
+        raise ValueError(f"Inline {part} are empty.")
+    return pd.DataFrame(arrays)
+
+
+def resolve_instance(store: InstanceStore, request):
+    """
+    Put the instance of a job request into ``store`` and return its name.
+
+    Inline instances are named by the hash of their contents and CSV
+    instances by their absolute paths and modification times, so
+    resubmitting the same data reuses the stored columns.
+    """
+    if 'instance' in request:
+        name = str(request['instance'])
+        if name not in store:
+            raise ValueError(f"Instance '{name}' is not in the store.")
+        return name
+    if 'credits_path' in request and 'swaps_path' in request:
+        paths = [os.path.abspath(request['credits_path']), os.path.abspath(request['swaps_path'])]
+        for path in paths:
+            if not os.path.exists(path):
+                raise ValueError(f"No such file: {path}")
+        digest = hashlib.sha256(json.dumps([(path, os.path.getmtime(path)) for path in paths]).encode())
+        name = f"csv_{digest.hexdigest()[:16]}"
+        store.put_csv(name, *paths)
+        return name
+    if 'credits' in request and 'swaps' in request:
+        credits_df = payload_frame(request['credits'], CREDIT_COLUMNS, 'credits')
+        swaps_df = payload_frame(request['swaps'], SWAP_COLUMNS, 'swaps')
+        name = f"payload_{instance_key(credits_df, swaps_df, 'payload', {})[:16]}"
+        store.put(name, credits_df, swaps_df)
+        return name
+    raise ValueError("A job needs 'instance', 'credits_path' and 'swaps_path', or 'credits' and 'swaps'.")
+
+
+class SolveService:
+    """
+    Queue of solve jobs sharing ``total_cpu`` cores.
+
+    Jobs start in submission order as soon as their ``num_cpu`` fit next to
+    the running ones, so the solver threads never oversubscribe the host. A job
+    with a time limit is killed ``grace_period`` seconds after it should have
+    ended.
+    """
+
+    def __init__(self, store_dir=None, total_cpu=None, grace_period=DEFAULT_GRACE_PERIOD):
+        self.store = InstanceStore(store_dir or os.path.join(DEFAULT_DATA_ROOT, "store"))
+        self.total_cpu = total_cpu or os.cpu_count() or 1
+        self.grace_period = grace_period
+        self.used_cpu = 0
+        self.jobs = {}
+        self.queue = collections.deque()
+        self.capacity = asyncio.Condition()
+        self.job_ids = itertools.count(1)
+        self.tasks = set()
+
+    async def submit(self, request):
+        """Validate a job request, store its instance and queue it; returns the ``SolveJob``."""
+        solver = request.get('solver', 'cbc')
+        if solver not in BACKENDS:
+            raise ValueError(f"Unknown solver '{solver}', expected one of {tuple(BACKENDS)}.")
+        num_cpu = min(max(int(request.get('num_cpu', 1)), 1), self.total_cpu)
+        time_limit = request.get('time_limit')
+        time_limit = float(time_limit) if time_limit is not None else None
+        params = dict(request.get('params', {}), time_limit=time_limit, num_cpu=num_cpu,
+                      mip_gap=float(request.get('mip_gap', 0.01)))
+        # Writing the instance may take a while for large payloads; keep the loop serving meanwhile
+        instance = await asyncio.get_running_loop().run_in_executor(None, resolve_instance, self.store, request)
+
+        job = SolveJob(str(next(self.job_ids)), solver, instance, num_cpu, time_limit, params)
+        self.jobs[job.job_id] = job
+        async with self.capacity:
+            self.queue.append(job)
+        await job.set_state('queued')
+        task = asyncio.create_task(self.run(job))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return job
+
+    async def acquire(self, job):
+        """Wait until ``job`` heads the queue and its cores are free; False if it was cancelled."""
+        async with self.capacity:
+            await self.capacity.wait_for(
+                lambda: job.done or (self.queue[0] is job and self.used_cpu + job.num_cpu <= self.total_cpu))
+            if job.done:
+                return False
+            self.queue.popleft()
+            self.used_cpu += job.num_cpu
+            self.capacity.notify_all()
+            return True
+
+    async def release(self, job):
+        async with self.capacity:
+            self.used_cpu -= job.num_cpu
+            self.capacity.notify_all()
+
+    async def run(self, job):
+        if not await self.acquire(job):
+            return
+        try:
+            await self.run_worker(job)
+        except Exception as exc:
+            if not job.done:
+                await job.set_state('failed', message=repr(exc))
+        finally:
+            await self.release(job)
+
+    async def run_worker(self, job):
+        job.process = await asyncio.create_subprocess_exec(
+            sys.executable, '-m', 'utils.service.solve_worker',
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            cwd=REPO_ROOT, start_new_session=True, limit=MAX_EVENT_LINE)
+        if job.done:
+            # Cancelled while the worker was starting, before kill() could see it
+            self.kill(job)
+            await job.process.wait()
+            return
+        await job.set_state('running')
+        spec = {'job_id': job.job_id, 'store_dir': self.store.store_dir, 'instance': job.instance,
+                'solver': job.solver, 'params': job.params}
+        job.process.stdin.write(json.dumps(spec).encode())
+        job.process.stdin.close()
+
+        stderr_tail = collections.deque(maxlen=20)
+        deadline = job.time_limit + self.grace_period if job.time_limit is not None else None
+        try:
+            await asyncio.wait_for(asyncio.gather(self.read_events(job), self.read_stderr(job, stderr_tail),
+                                                  job.process.wait()), deadline)
+        except asyncio.TimeoutError:
+            self.kill(job)
+            await job.process.wait()
+            await job.set_state('timed_out', message=f"No result {self.grace_period}s after the time limit.")
+            return
+        if job.done:
+            # Cancelled while running
+            return
+        if job.result is not None and job.process.returncode == 0:
+            await job.set_state('finished', status=job.result['status'])
+        else:
+            await job.set_state('failed', returncode=job.process.returncode, stderr="".join(stderr_tail))
+
+    async def read_events(self, job):
+        async for line in job.process.stdout:
+            event = json.loads(line)
+            kind = event.pop('event')
+            event.pop('job_id', None)
+            if kind == 'result':
+                job.assignment = event.pop('assignment')
+                job.result = event
+                await job.emit('result', **{key: event[key] for key in ('status', 'delta', 'wall_time',
+                                                                         'summary')})
+            else:
+                await job.emit(kind, **event)
+
+    @staticmethod
+    async def read_stderr(job, tail):
+        async for line in job.process.stderr:
+            tail.append(line.decode(errors='replace'))
+
+    @staticmethod
+    def kill(job):
+        """Kill a worker together with its children, e.g. the CBC executable."""
+        if job.process is None or job.process.returncode is not None:
+            return
+        try:
+            os.killpg(job.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    async def cancel(self, job_id):
+        """Cancel a queued or running job; returns the ``SolveJob``."""
+        job = self.jobs[job_id]
+        if job.done:
+            return job
+        self.kill(job)
+        await job.set_state('cancelled')
+        async with self.capacity:
+            if job in self.queue:
+                self.queue.remove(job)
+            self.capacity.notify_all()
+        return job
+
+    async def close(self):
+        for job in list(self.jobs.values()):
+            if not job.done:
+                await self.cancel(job.job_id)
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def stream(self, job):
+        """Yield the job's events from the first, waiting for new ones until it has ended."""
+        seq = 0
+        while True:
+            async with job.changed:
+                await job.changed.wait_for(lambda: seq < len(job.events) or job.done)
+                events, ended = job.events[seq:], job.done
+            for event in events:
+                yield event
+            seq += len(events)
+            if ended and seq == len(job.events):
+                return
+
+
+async def read_request(reader):
+    """Method, path and JSON body (or None) of one HTTP request."""
+    request_line = (await reader.readline()).decode('latin-1').strip()
+    if not request_line:
+        return None
+    method, target, _ = request_line.split(' ', 2)
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1').strip()
+        if not line:
+            break
+        key, _, value = line.partition(':')
+        headers[key.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    body = json.loads(await reader.readexactly(length)) if length else None
+    return method.upper(), target.split('?', 1)[0].rstrip('/'), body
+
+
+def response_head(code, content_type='application/json', length=None):
+    head = [f"HTTP/1.1 {code} {HTTP_REASONS[code]}", f"Content-Type: {content_type}", "Connection: close"]
+    if length is not None:
+        head.append(f"Content-Length: {length}")
+    return ("\r\n".join(head) + "\r\n\r\n").encode()
+
+
+async def send_json(writer, code, payload):
+    body = json.dumps(json_safe(payload)).encode()
+    writer.write(response_head(code, length=len(body)) + body)
+    await writer.drain()
+
+
+def handler(service: SolveService):
+    """Connection callback serving the service API, one request per connection."""
+
+    async def handle(reader, writer):
+        try:
+            request = await read_request(reader)
+            if request is not None:
+                await route(service, writer, *request)
+        except (ValueError, KeyError, TypeError) as exc:
+            await send_json(writer, 400, {'error': str(exc)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as exc:
+            await send_json(writer, 500, {'error': repr(exc)})
+        finally:
+            writer.close()
+
+    return handle
+
+
+async def route(service, writer, method, path, body):
+    parts = [part for part in path.split('/') if part]
+    if not parts or parts[0] != 'jobs' or len(parts) > 3:
+        return await send_json(writer, 404, {'error': f"No route {path}"})
+    if len(parts) == 1:
+        if method == 'POST':
+            job = await service.submit(body or {})
+            return await send_json(writer, 202, job.summary())
+        if method == 'GET':
+            return await send_json(writer, 200, [job.summary() for job in service.jobs.values()])
+        return await send_json(writer, 405, {'error': f"{method} {path}"})
+
+    job = service.jobs.get(parts[1])
+    if job is None:
+        return await send_json(writer, 404, {'error': f"No job {parts[1]}"})
+    if len(parts) == 2:
+        if method == 'GET':
+            return await send_json(writer, 200, job.summary())
+        if method == 'DELETE':
+            return await send_json(writer, 200, (await service.cancel(job.job_id)).summary())
+    elif parts[2] == 'events' and method == 'GET':
+        writer.write(response_head(200, content_type='application/x-ndjson'))
+        async for event in service.stream(job):
+            writer.write((json.dumps(json_safe(event)) + "\n").encode())
+            await writer.drain()
+        return
+    elif parts[2] == 'assignment' and method == 'GET':
+        if job.assignment is None:
+            return await send_json(writer, 409, {'error': f"Job {job.job_id} has no assignment ({job.state})."})
+        return await send_json(writer, 200, {'job_id': job.job_id, 'assignment': job.assignment})
+    return await send_json(writer, 405, {'error': f"{method} {path}"})
+
+
+async def serve(service: SolveService, host='127.0.0.1', port=DEFAULT_PORT, socket_path=None):
+    """Serve ``service`` on a Unix socket if ``socket_path`` is given, else on a local TCP port, until cancelled."""
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = await asyncio.start_unix_server(handler(service), path=socket_path)
+        print(f"Solve service on {socket_path} with {service.total_cpu} cores.")
+    else:
+        server = await asyncio.start_server(handler(service), host=host, port=port)
+        print(f"Solve service on http://{host}:{port} with {service.total_cpu} cores.")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class ServiceClient:
+    """
+    Blocking client of a running solve service, e.g. from a notebook.
+
+    Connects to ``socket_path`` when given, else to ``host:port``.
+    """
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, socket_path=None, timeout=None):
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def connection(self):
+        if self.socket_path is not None:
+            return UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, payload=None):
+        connection = self.connection()
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        return connection, response
+
+    def call(self, method, path, payload=None):
+        connection, response = self.request(method, path, payload)
+        try:
+            result = json.loads(response.read())
+        finally:
+            connection.close()
+        if response.status >= 400:
+            raise RuntimeError(f"{method} {path} failed with {response.status}: {result.get('error')}")
+        return result
+
+    def submit(self, credits_df=None, swaps_df=None, solver='cbc', time_limit=None, num_cpu=1, mip_gap=0.01,
+               instance=None, credits_path=None, swaps_path=None, **params):
+        """
+        Queue a solve and return its job summary.
+
+        The instance is ``credits_df``/``swaps_df`` (their stored columns are
+        sent inline), ``credits_path``/``swaps_path`` on the service host, or
+        the name of a stored ``instance``. ``params`` go to the solver.
+        """
+        request = {'solver': solver, 'time_limit': time_limit, 'num_cpu': num_cpu, 'mip_gap': mip_gap,
+                   'params': params}
+        if instance is not None:
+            request['instance'] = instance
+        elif credits_path is not None:
+            request.update(credits_path=credits_path, swaps_path=swaps_path)
+        else:
+            request['credits'] = {column: credits_df[column].tolist() for column in CREDIT_COLUMNS
+                                  if column in credits_df.columns}
+            request['swaps'] = {column: swaps_df[column].tolist() for column in SWAP_COLUMNS
+                                if column in swaps_df.columns}
+        return self.call('POST', '/jobs', request)
+
+    def status(self, job_id=None):
+        return self.call('GET', f"/jobs/{job_id}" if job_id is not None else "/jobs")
+
+    def cancel(self, job_id):
+        return self.call('DELETE', f"/jobs/{job_id}")
+
+    def assignment(self, job_id):
+        """Compact swap index of a finished job (-1 for dropped credits)."""
+        return np.asarray(self.call('GET', f"/jobs/{job_id}/assignment")['assignment'], dtype=np.int32)
+
+    def events(self, job_id):
+        """Yield the job's events as they happen, until it has ended."""
+        connection, response = self.request('GET', f"/jobs/{job_id}/events")
+        try:
+            if response.status >= 400:
+                raise RuntimeError(f"Streaming job {job_id} failed with {response.status}.")
+            for line in response:
+                yield json.loads(line)
+        finally:
+            connection.close()
+
+    def wait(self, job_id, verbose=False):
+        """Follow a job to its end and return its final summary."""
+        for event in self.events(job_id):
+            if verbose:
+                print(event)
+        return self.status(job_id)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the solvers to local clients.")
+    parser.add_argument('--socket', default=None, help="Unix socket path; a TCP port is used without it")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--total-cpu', type=int, default=None, help="cores shared by all running jobs")
+    parser.add_argument('--grace-period', type=float, default=DEFAULT_GRACE_PERIOD)
+    parser.add_argument('--store-dir', default=None)
+    args = parser.parse_args(argv)
+
+    service = SolveService(store_dir=args.store_dir, total_cpu=args.total_cpu, grace_period=args.grace_period)
+    try:
+        asyncio.run(serve(service, host=args.host, port=args.port, socket_path=args.socket))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
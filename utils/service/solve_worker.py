@@ -0,0 +1,103 @@
+"""
+Solve one stored instance for the solve service and report on stdout.
+
+The job arrives as one JSON object on stdin::
+
+    {"job_id": ..., "store_dir": ..., "instance": ..., "solver": "cbc",
+     "params": {"time_limit": 60, "num_cpu": 1, "mip_gap": 0.01, ...}}
+
+and every event leaves as one JSON line on stdout: 'started', one
+'progress' per solver timeline point, then 'result' with the status,
+delta, validation summary and compact assignment. Anything the solvers
+print goes to stderr instead, so stdout only carries events.
+
+Usage (started by ``SolveService``)::
+
+    python -m utils.service.solve_worker < job.json
+"""
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from utils.data_generation.instance_store import InstanceStore
+from utils.experiments.runner import validate_solve
+from utils.solvers.backends import get_backend, solve
+
+
+def json_safe(value):
+    """``value`` with NumPy scalars and arrays as Python objects and NaN/inf as None."""
+    if isinstance(value, dict):
+        return {str(key): json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [json_safe(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+class EventWriter:
+    """Write events as JSON lines to a file object, from any thread."""
+
+    def __init__(self, out, job_id):
+        self.out = out
+        self.job_id = job_id
+        self.lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        line = json.dumps(json_safe(dict(fields, event=event, job_id=self.job_id)))
+        with self.lock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+
+def run(job, events):
+    """Attach the job's instance, solve and validate it, emitting the events."""
+    credits_df, swaps_df = InstanceStore(job['store_dir']).attach(job['instance']).frames()
+    solver = job['solver']
+    backend = get_backend(solver)
+    params = dict(job.get('params', {}), assignment_format='compact')
+    if backend.exports:
+        params.setdefault('export', False)
+
+    def progress(seconds, incumbent, bound):
+        events.emit('progress', seconds=seconds, incumbent=incumbent, bound=bound)
+
+    if backend.progress:
+        params['progress'] = progress
+    events.emit('started', num_credits=len(credits_df), num_swaps=len(swaps_df))
+    start = time.time()
+    assignment, delta, status, mdl = solve(credits_df, swaps_df, backend=solver, **params)
+    wall_time = time.time() - start
+
+    summary = {}
+    if assignment is not None:
+        _, summary = validate_solve(solver, assignment, credits_df, swaps_df, delta, mdl,
+                                    params.get('experiment_name'))
+    events.emit('result', status=status, delta=delta, wall_time=wall_time, summary=summary,
+                stats=mdl.stats.to_dict() if getattr(mdl, 'stats', None) is not None else None,
+                assignment=assignment)
+
+
+def main():
+    job = json.load(sys.stdin)
+    # Keep fd 1 for events; solver output, including native libraries', goes to stderr
+    out = os.fdopen(os.dup(sys.stdout.fileno()), 'w')
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    events = EventWriter(out, job.get('job_id'))
+    try:
+        run(job, events)
+    except Exception as exc:
+        events.emit('error', message=repr(exc))
+        raise
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+from utils.solvers.assignment_utils import DROPPED
+
+AGGREGATION_COLUMNS = ['Principal', 'Maturity', 'Delta_FV']
+
+
+class CreditClasses:
+    """
+    Credits grouped into classes of equivalent (Principal, Maturity, Delta_FV).
+
+    ``class_id`` maps every credit (positionally) to its class, ``sizes`` holds
+    the number of credits per class and ``frame`` one representative row per
+    class with the mean coefficients of its members.
+    """
+
+    def __init__(self, class_id, sizes, frame, exact):
+        self.class_id = class_id
+        self.sizes = sizes
+        self.frame = frame
+        self.exact = exact
+
+    @property
+    def num_classes(self):
+        return len(self.sizes)
+
+    @property
+    def num_credits(self):
+        return len(self.class_id)
+
+    def class_counts(self, swap_index, num_swaps):
+        """Count the credits of each class assigned to each swap in a compact assignment."""
+        swap_index = np.asarray(swap_index, dtype=np.int64)
+        counts = np.zeros((self.num_classes, num_swaps), dtype=np.int64)
+        assigned = swap_index != DROPPED
+        np.add.at(counts, (self.class_id[assigned], swap_index[assigned]), 1)
+        return counts
+
+    def expand(self, counts):
+        """
+        Map per-class assignment counts back to individual credits.
+
+        Within a class, credits are handed out in their original order: the
+        first ``counts[k, 0]`` go to swap 0, the next ``counts[k, 1]`` to swap 1
+        and so on; the rest of the class is dropped.
+
+        Returns
+        -------
+        np.ndarray of int32 : compact swap index.
+        """
+        counts = np.rint(np.asarray(counts, dtype=float)).astype(np.int64)
+        num_swaps = counts.shape[1]
+        order = np.argsort(self.class_id, kind='stable')
+        sorted_class = self.class_id[order]
+        class_start = np.concatenate([[0], np.cumsum(self.sizes)[:-1]])
+        rank = np.arange(self.num_credits) - class_start[sorted_class]
+
+        cum_counts = counts.cumsum(axis=1)
+        swap = (cum_counts[sorted_class] <= rank[:, None]).sum(axis=1)
+
+        swap_index = np.empty(self.num_credits, dtype=np.int32)
+        swap_index[order] = np.where(swap < num_swaps, swap, DROPPED)
+        return swap_index
+
+
+def aggregate_credits(credits_df: pd.DataFrame, tolerance=None):
+    """
+    Group credits with equal coefficients into classes.
+
+    Parameters
+    ----------
+    credits_df : pd.DataFrame
+        Credits with 'Principal', 'Maturity' and 'Delta_FV', read positionally.
+    tolerance : float or dict, optional
+        Bucket width per column; a float applies to all three columns and a
+        dict gives it per column name (missing columns are matched exactly).
+        With no tolerance only identical credits are grouped and the reduced
+        model is equivalent to the full one. Otherwise credits whose values
+        fall into the same buckets are grouped and the class carries their
+        mean coefficients, so the mapped-back assignment can miss the swap
+        targets slightly and should be validated.
+
+    Returns
+    -------
+    CreditClasses
+    """
+    if tolerance is None:
+        tolerance = {}
+    elif not isinstance(tolerance, dict):
+        tolerance = {column: tolerance for column in AGGREGATION_COLUMNS}
+
+    values = np.column_stack([credits_df[column].to_numpy(dtype=float) for column in AGGREGATION_COLUMNS])
+    keys = values.copy()
+    for k, column in enumerate(AGGREGATION_COLUMNS):
+        width = tolerance.get(column) or 0.0
+        if width > 0:
+            keys[:, k] = np.floor(values[:, k] / width)
+    exact = not any((tolerance.get(column) or 0.0) > 0 for column in AGGREGATION_COLUMNS)
+
+    _, class_id, sizes = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+    class_id = class_id.reshape(-1).astype(np.int64)
+
+    means = np.column_stack([np.bincount(class_id, weights=values[:, k], minlength=len(sizes)) / sizes
+                             for k in range(len(AGGREGATION_COLUMNS))])
+    frame = pd.DataFrame(means, columns=AGGREGATION_COLUMNS)
+    frame['Count'] = sizes
+    return CreditClasses(class_id, sizes, frame, exact)
+
+
+def resolve_aggregation(aggregate, credits_df: pd.DataFrame):
+    """
+    Turn a solver's ``aggregate`` argument into ``CreditClasses`` or ``None``.
+
+    ``aggregate`` is ``False``/``None`` (no presolve), ``True`` (exact
+    matches only), a tolerance accepted by ``aggregate_credits`` or
+    ready-made ``CreditClasses``.
+    """
+    if aggregate is None or aggregate is False:
+        return None
+    if isinstance(aggregate, CreditClasses):
+        return aggregate
+    if aggregate is True:
+        return aggregate_credits(credits_df)
+    return aggregate_credits(credits_df, tolerance=aggregate)
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+ASSIGNMENT_FORMATS = ('dense', 'pairs', 'compact')
+DROPPED = -1
+
+
+def assignment_matrix(values, num_credits, num_swaps):
+    """
+    Round a flat, credit-major vector of x_ij values into an int8 assignment matrix.
+
+    Parameters
+    ----------
+    values : array-like
+        Solver values ordered as x_00, x_01, ..., x_10, ...
+    num_credits : int
+    num_swaps : int
+
+    Returns
+    -------
+    np.ndarray of shape (num_credits, num_swaps), dtype int8
+    """
+    matrix = np.empty((num_credits, num_swaps), dtype=np.int8)
+    matrix[...] = np.rint(np.asarray(values, dtype=float).reshape(num_credits, num_swaps))
+    return matrix
+
+
+def assignment_frame(matrix):
+    """Wrap an assignment matrix as the legacy ``Credits_Assigned_Swap_j`` frame."""
+    return pd.DataFrame(matrix, columns=[f"Credits_Assigned_Swap_{j}" for j in range(matrix.shape[1])])
+
+
+def assigned_pairs(matrix):
+    """List the (credit, swap) positions that are assigned as a two-column frame."""
+    credit_idx, swap_idx = np.nonzero(matrix == 1)
+    return pd.DataFrame({'Credit': credit_idx, 'Swap': swap_idx})
+
+
+def swap_index_from_matrix(matrix):
+    """
+    Collapse an assignment matrix into the compact per-credit swap index.
+
+    Returns
+    -------
+    np.ndarray of length num_credits, dtype int32
+        The swap each credit is assigned to, or ``DROPPED`` (-1).
+    """
+    assigned = matrix == 1
+    return np.where(assigned.any(axis=1), assigned.argmax(axis=1), DROPPED).astype(np.int32)
+
+
+def swap_index_from_frame(assignment):
+    """Collapse a legacy ``Credits_Assigned_Swap_j`` frame into the compact swap index."""
+    swap_cols = [c for c in assignment.columns if str(c).startswith('Credits_Assigned_Swap_')]
+    swap_ids = np.array([int(c.split('_')[-1]) for c in swap_cols], dtype=np.int32)
+    assigned = assignment[swap_cols].to_numpy() == 1
+    return np.where(assigned.any(axis=1), swap_ids[assigned.argmax(axis=1)], DROPPED).astype(np.int32)
+
+
+def swap_index_matrix(swap_index, num_swaps):
+    """Expand a compact swap index into an int8 assignment matrix."""
+    swap_index = np.asarray(swap_index)
+    matrix = np.zeros((len(swap_index), num_swaps), dtype=np.int8)
+    assigned = np.flatnonzero(swap_index != DROPPED)
+    matrix[assigned, swap_index[assigned]] = 1
+    return matrix
+
+
+def swap_index_to_frame(swap_index, num_swaps, index=None):
+    """
+    Expand a compact swap index into the legacy ``Credits_Assigned_Swap_j`` frame.
+
+    Parameters
+    ----------
+    swap_index : array-like of int
+        Swap id per credit, ``DROPPED`` (-1) for unassigned credits.
+    num_swaps : int
+    index : pd.Index, optional
+        Index of the resulting frame, positional by default.
+    """
+    frame = assignment_frame(swap_index_matrix(swap_index, num_swaps))
+    if index is not None:
+        frame.index = index
+    return frame
+
+
+def format_assignment(matrix, assignment_format='dense'):
+    """Convert an assignment matrix to the representation requested from a solver."""
+    if assignment_format == 'dense':
+        return assignment_frame(matrix)
+    if assignment_format == 'pairs':
+        return assigned_pairs(matrix)
+    if assignment_format == 'compact':
+        return swap_index_from_matrix(matrix)
+    raise ValueError(f"Unknown assignment_format '{assignment_format}', "
+                     f"expected one of {ASSIGNMENT_FORMATS}.")
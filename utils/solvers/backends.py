@@ -0,0 +1,170 @@
+"""
+Registry of the solver backends behind one ``solve`` entry point.
+
+Every backend names the module and function implementing it, so its
+solver stack (PuLP, docplex, scipy.optimize) is only imported when the
+backend is first used; importing this module costs no more than the
+standard library. Backends also declare what they support, so callers can
+check a capability instead of matching solver names, and ``solve``
+normalizes the solver-specific status strings to ``SOLVE_STATUSES``.
+"""
+import importlib
+import importlib.util
+
+# Normalized statuses: proven optimal (within the MIP gap), a solution without proof, no solution
+# within the limits, proven infeasible or unbounded, and anything else
+SOLVE_STATUSES = ('Optimal', 'Feasible', 'Not Solved', 'Infeasible', 'Unbounded', 'Undefined')
+
+# PuLP solution statuses (LpSolution*) of a CBC run
+PULP_SOLUTION_STATUSES = {1: 'Optimal', 2: 'Feasible', 0: 'Not Solved', -1: 'Infeasible', -2: 'Unbounded'}
+
+CPLEX_OPTIMAL_STATUSES = ('CPX_STAT_OPTIMAL', 'CPXMIP_OPTIMAL', 'CPXMIP_OPTIMAL_TOL')
+
+
+class Backend:
+    """
+    One solver backend.
+
+    ``module`` and ``function`` locate its ``solve_with_*`` function, which
+    takes ``(credits_df, swaps_df, **params)`` and returns ``(assignment,
+    delta, status, model)``. ``requires`` lists the packages it needs. The
+    capability flags tell whether it accepts a MIP start (``warm_start``),
+    honours ``num_cpu`` (``threads``), reports deterministic time
+    (``deterministic_time``), takes a ``progress`` callback, ``aggregate``
+    or ``strengthen``, and writes an LP file unless ``export=False``
+    (``exports``).
+    """
+
+    def __init__(self, name, module, function, requires=(), warm_start=False, threads=False,
+                 deterministic_time=False, progress=False, aggregate=False, strengthen=False, exports=False):
+        self.name = name
+        self.module = module
+        self.function = function
+        self.requires = tuple(requires)
+        self.warm_start = warm_start
+        self.threads = threads
+        self.deterministic_time = deterministic_time
+        self.progress = progress
+        self.aggregate = aggregate
+        self.strengthen = strengthen
+        self.exports = exports
+        self._solve = None
+
+    def __repr__(self):
+        return f"Backend('{self.name}', {self.module}.{self.function})"
+
+    @property
+    def available(self):
+        """Whether the required packages are installed, checked without importing them."""
+        return all(importlib.util.find_spec(package) is not None for package in self.requires)
+
+    def capabilities(self):
+        return {'warm_start': self.warm_start, 'threads': self.threads,
+                'deterministic_time': self.deterministic_time, 'progress': self.progress,
+                'aggregate': self.aggregate, 'strengthen': self.strengthen}
+
+    def load(self):
+        """Import the backend's module on first use and return its solve function."""
+        if self._solve is None:
+            missing = [package for package in self.requires if importlib.util.find_spec(package) is None]
+            if missing:
+                raise ImportError(f"Backend '{self.name}' needs {', '.join(missing)}, which is not installed.")
+            self._solve = getattr(importlib.import_module(self.module), self.function)
+        return self._solve
+
+
+BACKENDS = {}
+
+
+def register_backend(backend: Backend):
+    """Add a backend to the registry, replacing one of the same name."""
+    BACKENDS[backend.name] = backend
+    return backend
+
+
+register_backend(Backend('cbc', 'utils.solvers.mip_drop_cbc', 'solve_with_cbc', requires=('pulp',),
+                         warm_start=True, threads=True, progress=True, aggregate=True, strengthen=True,
+                         exports=True))
+register_backend(Backend('cplex', 'utils.solvers.mip_drop_cplex', 'solve_with_cplex',
+                         requires=('docplex', 'cplex'), warm_start=True, threads=True, deterministic_time=True,
+                         progress=True, aggregate=True, strengthen=True, exports=True))
+register_backend(Backend('highs', 'utils.solvers.mip_drop_highs', 'solve_with_highs', requires=('scipy',),
+                         progress=True, aggregate=True))
+register_backend(Backend('lns', 'utils.solvers.mip_drop_lns', 'solve_with_lns', requires=('scipy',),
+                         warm_start=True))
+register_backend(Backend('lagrangian', 'utils.solvers.mip_drop_lagrangian', 'solve_with_lagrangian',
+                         requires=('scipy',), warm_start=True))
+register_backend(Backend('pruned', 'utils.solvers.mip_drop_pruned', 'solve_with_pruning', requires=('scipy',),
+                         warm_start=True))
+
+
+def get_backend(name):
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown solver backend '{name}', expected one of {tuple(BACKENDS)}.") from None
+
+
+def available_backends():
+    """Names of the registered backends whose packages are installed."""
+    return [name for name, backend in BACKENDS.items() if backend.available]
+
+
+def normalize_cplex_status(status):
+    if status in CPLEX_OPTIMAL_STATUSES:
+        return 'Optimal'
+    # The model minimizes delta >= 0, so infeasible-or-unbounded can only be infeasible
+    if 'INForUNBD' in status:
+        return 'Infeasible'
+    if 'UNBOUNDED' in status:
+        return 'Unbounded'
+    if status.endswith('INFEASIBLE'):
+        return 'Infeasible'
+    # Limits and aborts: *_FEAS kept a solution, *_INFEAS did not
+    if status.endswith('_INFEAS') or '_INFEAS_' in status:
+        return 'Not Solved'
+    if status.endswith(('_FEAS', 'FEASIBLE', 'NUM_BEST', 'SOL_LIM')) or 'POPULATE' in status \
+            or 'FEAS_NO_TREE' in status:
+        return 'Feasible'
+    return 'Not Solved'
+
+
+def normalize_status(backend_name, status, model=None):
+    """
+    Map a backend's status string to one of ``SOLVE_STATUSES``.
+
+    CBC runs stopped on time are reported by PuLP as 'Optimal'; with the
+    returned ``model`` its solution status tells them apart.
+    """
+    if status is None:
+        return 'Undefined'
+    if backend_name == 'cbc' and model is not None and getattr(model, 'sol_status', None) is not None:
+        return PULP_SOLUTION_STATUSES.get(model.sol_status, 'Undefined')
+    if backend_name == 'cplex':
+        return normalize_cplex_status(status)
+    return status if status in SOLVE_STATUSES else 'Undefined'
+
+
+def solve(credits_df, swaps_df, backend='cbc', **params):
+    """
+    Solve the dollar-offset model with the named backend.
+
+    ``params`` go to the backend's solve function (``time_limit``,
+    ``mip_gap``, ``num_cpu``, ...); a ``warm_start``, ``progress``,
+    ``aggregate`` or ``strengthen`` the backend does not support raises a
+    ValueError instead of being ignored. Returns ``(assignment, delta,
+    status, model)`` with the status normalized (see ``normalize_status``);
+    the solver's own status is kept as ``model.raw_status``.
+    """
+    selected = get_backend(backend)
+    capabilities = selected.capabilities()
+    for name in ('warm_start', 'progress', 'aggregate', 'strengthen'):
+        value = params.get(name)
+        if value is not None and value is not False and not capabilities[name]:
+            raise ValueError(f"Backend '{backend}' does not support {name}.")
+    assignment, delta, status, model = selected.load()(credits_df, swaps_df, **params)
+    try:
+        model.raw_status = status
+    except AttributeError:
+        pass
+    return assignment, delta, normalize_status(backend, status, model), model
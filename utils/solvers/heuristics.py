@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+from utils.solvers.assignment_utils import DROPPED
+
+
+def greedy_assignment_arrays(credit_delta_fv, credit_principal, credit_maturity,
+                             swap_delta_fv, swap_principal, swap_maturity):
+    """
+    Greedy assignment on plain coefficient arrays.
+
+    Swaps take turns, the one furthest from its principal target first. A swap
+    whose weighted maturity is on target takes the available credit with the
+    least hedge per unit of principal; one whose maturity is short takes the
+    credit that lifts it most cheaply, i.e. with the least hedge per unit of
+    ``P_i * (M_i - M_j)``. This continues until every swap covers its principal
+    and maturity. A last pass tops up swaps whose assigned hedge is below their
+    Delta_FV target with credits that bring it closer without breaking the
+    maturity.
+
+    Returns
+    -------
+    np.ndarray of int32 : swap id per credit, ``DROPPED`` (-1) if unassigned.
+    """
+    credit_delta_fv = np.asarray(credit_delta_fv, dtype=float)
+    credit_principal = np.asarray(credit_principal, dtype=float)
+    credit_maturity = np.asarray(credit_maturity, dtype=float)
+    swap_delta_fv = np.asarray(swap_delta_fv, dtype=float)
+    swap_principal = np.asarray(swap_principal, dtype=float)
+    swap_maturity = np.asarray(swap_maturity, dtype=float)
+
+    num_credits = len(credit_delta_fv)
+    num_swaps = len(swap_delta_fv)
+    swap_index = np.full(num_credits, DROPPED, dtype=np.int32)
+    if num_credits == 0 or num_swaps == 0:
+        return swap_index
+
+    # Hedge each credit contributes to the dollar-offset lhs, oriented like the swap's target
+    credit_hedge = -credit_delta_fv
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hedge_ratio = np.where(credit_principal > 0, credit_hedge / credit_principal, np.inf)
+
+    cheap_orders, lift_orders = [], []
+    for j in range(num_swaps):
+        sign = -1.0 if swap_delta_fv[j] < 0 else 1.0
+        cheap_orders.append(np.argsort(sign * hedge_ratio, kind='stable').tolist())
+        lift = credit_maturity - swap_maturity[j]
+        candidates = np.flatnonzero(lift > 0)
+        lift_orders.append(candidates[np.argsort(sign * hedge_ratio[candidates] / lift[candidates],
+                                                 kind='stable')].tolist())
+
+    principal = credit_principal.tolist()
+    maturity = credit_maturity.tolist()
+    hedge = credit_hedge.tolist()
+    taken = [False] * num_credits
+    cheap_pointer = [0] * num_swaps
+    lift_pointer = [0] * num_swaps
+    cum_principal = [0.0] * num_swaps
+    cum_hedge = [0.0] * num_swaps
+    maturity_slack = [0.0] * num_swaps   # sum(P_i * (M_i - M_j)) of the assigned credits
+
+    def next_available(order, pointer, j):
+        while pointer[j] < len(order[j]) and taken[order[j][pointer[j]]]:
+            pointer[j] += 1
+        return order[j][pointer[j]] if pointer[j] < len(order[j]) else None
+
+    def assign(i, j):
+        taken[i] = True
+        swap_index[i] = j
+        cum_principal[j] += principal[i]
+        cum_hedge[j] += hedge[i]
+        maturity_slack[j] += principal[i] * (maturity[i] - swap_maturity[j])
+
+    open_swaps = set(range(num_swaps))
+    while open_swaps:
+        j = max(open_swaps, key=lambda k: swap_principal[k] - cum_principal[k])
+        covered = cum_principal[j] >= swap_principal[j]
+        if covered and maturity_slack[j] >= 0:
+            open_swaps.discard(j)
+            continue
+        if maturity_slack[j] >= 0:
+            i = next_available(cheap_orders, cheap_pointer, j)
+        else:
+            i = next_available(lift_orders, lift_pointer, j)
+        if i is None:
+            open_swaps.discard(j)
+            continue
+        assign(i, j)
+
+    # Top up swaps whose hedge falls short of the Delta_FV target, largest hedge first
+    for j in range(num_swaps):
+        target = float(swap_delta_fv[j])
+        for i in reversed(cheap_orders[j]):
+            gap = cum_hedge[j] - target
+            if abs(gap) <= 1e-9 * max(abs(target), 1.0) or (gap > 0) == (target > 0):
+                break
+            if taken[i] or maturity_slack[j] + principal[i] * (maturity[i] - swap_maturity[j]) < 0:
+                continue
+            if abs(gap + hedge[i]) < abs(gap):
+                assign(i, j)
+
+    return swap_index
+
+
+def greedy_assignment(credits_df: pd.DataFrame, swaps_df: pd.DataFrame):
+    """
+    Fast feasible-leaning assignment used as a MIP start.
+
+    See ``greedy_assignment_arrays``; credits and swaps are read positionally.
+
+    Returns
+    -------
+    np.ndarray of int32 : compact swap index.
+    """
+    return greedy_assignment_arrays(credits_df['Delta_FV'].to_numpy(dtype=float),
+                                    credits_df['Principal'].to_numpy(dtype=float),
+                                    credits_df['Maturity'].to_numpy(dtype=float),
+                                    swaps_df['Delta_FV'].to_numpy(dtype=float),
+                                    swaps_df['Principal'].to_numpy(dtype=float),
+                                    swaps_df['Maturity'].to_numpy(dtype=float))
+
+
+def assignment_delta(swap_index, credit_delta_fv, swap_delta_fv):
+    """
+    Smallest delta satisfying the dollar-offset constraints of a compact assignment.
+
+    That is ``max_j |r_j - 1|`` with ``r_j`` the assigned Delta_FV over the
+    negated swap Delta_FV, as in the validators. Swaps without any Delta_FV
+    target are skipped.
+    """
+    swap_index = np.asarray(swap_index, dtype=np.int64)
+    swap_delta_fv = np.asarray(swap_delta_fv, dtype=float)
+    assigned = swap_index >= 0
+    assigned_delta_fv = np.bincount(swap_index[assigned],
+                                    weights=np.asarray(credit_delta_fv, dtype=float)[assigned],
+                                    minlength=len(swap_delta_fv))
+    nonzero = ~np.isclose(swap_delta_fv, 0.0)
+    if not nonzero.any():
+        return 0.0
+    r_j = assigned_delta_fv[nonzero] / (-1 * swap_delta_fv[nonzero])
+    return float(np.max(np.abs(r_j - 1)))
+
+
+def resolve_warm_start(warm_start, credits_df: pd.DataFrame, swaps_df: pd.DataFrame):
+    """
+    Turn a solver's ``warm_start`` argument into a compact assignment and its delta.
+
+    ``warm_start`` is ``False``/``None`` (no start), ``True`` (build one with
+    ``greedy_assignment``) or a compact swap index to start from.
+
+    Returns
+    -------
+    (swap_index, delta) or (None, None)
+    """
+    if warm_start is None or warm_start is False:
+        return None, None
+    if warm_start is True:
+        swap_index = greedy_assignment(credits_df, swaps_df)
+    else:
+        swap_index = np.asarray(warm_start, dtype=np.int32)
+    delta = assignment_delta(swap_index, credits_df['Delta_FV'].to_numpy(dtype=float),
+                             swaps_df['Delta_FV'].to_numpy(dtype=float))
+    return swap_index, delta
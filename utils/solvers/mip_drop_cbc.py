@@ -1,6 +1,147 @@
 import os
+import tempfile
+import time
+import numpy as np
 import pandas as pd
-from pulp import LpProblem, LpVariable, LpMinimize, LpStatus, lpSum, value, PULP_CBC_CMD
+from pulp import (LpProblem, LpVariable, LpAffineExpression, LpConstraint, LpConstraintLE,
+                  LpConstraintGE, LpMinimize, LpStatus, value, PULP_CBC_CMD)
+from utils.data_generation.instance_store import as_frame
+from utils.solvers.aggregation import resolve_aggregation
+from utils.solvers.assignment_utils import assignment_matrix, format_assignment, swap_index_matrix
+from utils.solvers.heuristics import assignment_delta, resolve_warm_start
+from utils.solvers.solve_stats import CbcLogFollower, SolveStats, parse_cbc_log
+from utils.solvers.strengthening import resolve_strengthening
+
+
+def build_cbc_model(credits_df: pd.DataFrame, swaps_df: pd.DataFrame, class_sizes=None):
+    """
+    Build the dollar-offset model from NumPy coefficient arrays.
+
+    The coefficient columns are pulled out of the frames once and every
+    constraint is created from a prebuilt (variable, coefficient) list, so
+    there are no per-cell ``.loc`` lookups while the model is assembled.
+
+    Parameters
+    ----------
+    credits_df : pd.DataFrame
+        Credits with 'Principal', 'Delta_FV' and 'Maturity', positionally indexed.
+    swaps_df : pd.DataFrame
+        Swaps with 'Principal', 'Delta_FV' and 'Maturity', positionally indexed.
+    class_sizes : array-like of int, optional
+        When the rows of ``credits_df`` are aggregated credit classes, the
+        number of credits in each. ``x[i][j]`` then becomes a general integer
+        counting the credits of class i assigned to swap j, bounded by the
+        class size.
+
+    Returns
+    -------
+    mdl : LpProblem
+    x : list of list of LpVariable
+        ``x[i][j]`` is the binary assigning credit i to swap j.
+    delta : LpVariable
+    """
+    credit_delta_fv = credits_df['Delta_FV'].to_numpy(dtype=float)
+    credit_principal = credits_df['Principal'].to_numpy(dtype=float)
+    credit_principal_maturity = credit_principal * credits_df['Maturity'].to_numpy(dtype=float)
+
+    swap_delta_fv = swaps_df['Delta_FV'].to_numpy(dtype=float)
+    swap_principal = swaps_df['Principal'].to_numpy(dtype=float)
+    swap_maturity = swaps_df['Maturity'].to_numpy(dtype=float)
+
+    num_credits = len(credit_delta_fv)
+    num_swaps = len(swap_delta_fv)
+
+    mdl = LpProblem(name="Dollar_Offset_Optimization", sense=LpMinimize)
+
+    delta = LpVariable('delta', lowBound=0.0)
+    if class_sizes is None:
+        x = [[LpVariable(f'x_{i}_{j}', lowBound=0, upBound=1, cat='Binary')
+              for j in range(num_swaps)] for i in range(num_credits)]
+        credit_capacity = [1] * num_credits
+    else:
+        credit_capacity = [int(size) for size in class_sizes]
+        x = [[LpVariable(f'x_{i}_{j}', lowBound=0, upBound=credit_capacity[i], cat='Integer')
+              for j in range(num_swaps)] for i in range(num_credits)]
+
+    mdl += delta
+
+    neg_delta_fv = (-credit_delta_fv).tolist()
+    principal = credit_principal.tolist()
+
+    for j in range(num_swaps):
+        column = [x[i][j] for i in range(num_credits)]
+
+        # lhs <= (1 + delta) * D_j  <=>  lhs - D_j * delta <= D_j, and symmetrically for the lower side
+        lhs_terms = list(zip(column, neg_delta_fv))
+        upper = LpAffineExpression(lhs_terms + [(delta, -swap_delta_fv[j])])
+        lower = LpAffineExpression(lhs_terms + [(delta, swap_delta_fv[j])])
+        mdl.addConstraint(LpConstraint(upper, LpConstraintLE, rhs=swap_delta_fv[j]),
+                          f"Dollar_Offset_Upper_{j}")
+        mdl.addConstraint(LpConstraint(lower, LpConstraintGE, rhs=swap_delta_fv[j]),
+                          f"Dollar_Offset_Lower_{j}")
+
+        mdl.addConstraint(LpConstraint(LpAffineExpression([(v, 1) for v in column]),
+                                       LpConstraintGE, rhs=1), f'swap_{j}_assignment')
+
+        mdl.addConstraint(LpConstraint(LpAffineExpression(zip(column, principal)),
+                                       LpConstraintGE, rhs=swap_principal[j]), f'Principal_Swap_{j}')
+
+        # sum(P_i * M_i * x_ij) >= M_j * sum(P_i * x_ij), reusing the principal coefficients
+        maturity_coefs = (credit_principal_maturity - swap_maturity[j] * credit_principal).tolist()
+        mdl.addConstraint(LpConstraint(LpAffineExpression(zip(column, maturity_coefs)),
+                                       LpConstraintGE, rhs=0), f'Maturity_Swap_{j}')
+
+    for i in range(num_credits):
+        mdl.addConstraint(LpConstraint(LpAffineExpression([(v, 1) for v in x[i]]),
+                                       LpConstraintLE, rhs=credit_capacity[i]), f'credit_{i}_assignment')
+
+    return mdl, x, delta
+
+
+def strengthen_cbc_model(mdl, x, delta, strengthening):
+    """
+    Add a ``Strengthening`` to a model of ``build_cbc_model``.
+
+    The delta bounds and excluded pairs become variable bounds; the cover
+    counts, symmetry orderings and the aggregated principal are new rows
+    ('Cover_Swap_j', 'Swap_Order_j_k', 'Credit_Order_i_k', 'Total_Principal').
+
+    Returns
+    -------
+    (num_rows, num_nonzeros) : size of the added rows.
+    """
+    if strengthening.delta_lower is not None:
+        delta.lowBound = strengthening.delta_lower
+    if strengthening.delta_upper is not None:
+        delta.upBound = strengthening.delta_upper
+    for i, j in zip(*strengthening.excluded.nonzero()):
+        x[i][j].upBound = 0
+
+    num_model_credits, num_swaps = len(x), len(strengthening.min_credits)
+    columns = [[row[j] for row in x] for j in range(num_swaps)]
+    covers = [(j, count) for j, count in enumerate(strengthening.min_credits.tolist()) if count > 1]
+    for j, count in covers:
+        mdl.addConstraint(LpConstraint(LpAffineExpression([(v, 1) for v in columns[j]]),
+                                       LpConstraintGE, rhs=count), f'Cover_Swap_{j}')
+
+    # Equivalent swaps in decreasing order of assigned principal, equivalent credits assigned first-come
+    principal = strengthening.credit_principal.tolist()
+    for j, k in strengthening.swap_pairs:
+        mdl.addConstraint(LpConstraint(LpAffineExpression(list(zip(columns[j], principal))
+                                                          + [(v, -p) for v, p in zip(columns[k], principal)]),
+                                       LpConstraintGE, rhs=0), f'Swap_Order_{j}_{k}')
+    for i, k in strengthening.credit_pairs:
+        mdl.addConstraint(LpConstraint(LpAffineExpression([(v, 1) for v in x[i]] + [(v, -1) for v in x[k]]),
+                                       LpConstraintGE, rhs=0), f'Credit_Order_{i}_{k}')
+
+    mdl.addConstraint(LpConstraint(LpAffineExpression([(v, p) for row, p in zip(x, principal) for v in row]),
+                                   LpConstraintGE, rhs=strengthening.total_principal), 'Total_Principal')
+
+    num_rows = len(covers) + len(strengthening.swap_pairs) + len(strengthening.credit_pairs) + 1
+    num_nonzeros = (num_model_credits * (len(covers) + 2 * len(strengthening.swap_pairs) + num_swaps)
+                    + 2 * num_swaps * len(strengthening.credit_pairs))
+    return num_rows, num_nonzeros
+
 
 def solve_with_cbc(credits_df: pd.DataFrame,
                    swaps_df: pd.DataFrame,
@@ -9,68 +150,151 @@ def solve_with_cbc(credits_df: pd.DataFrame,
                    num_cpu=None,
                    mip_gap=0.01,
                    export=True,
-                   experiment_name='First'):
-    credits_df = credits_df.reset_index(drop=True).copy()
-    swaps_df   = swaps_df.reset_index(drop=True).copy()
+                   experiment_name='First',
+                   assignment_format='compact',
+                   warm_start=False,
+                   aggregate=False,
+                   strengthen=False,
+                   progress=None):
+    """
+    Solve the dollar-offset model with CBC through PuLP.
 
-    for col in ['Principal', 'Delta_FV', 'Maturity']:
-        credits_df[col] = credits_df[col].astype(float)
-        swaps_df[col]   = swaps_df[col].astype(float)
+    ``credits_df`` and ``swaps_df`` may also be mappings of column arrays,
+    e.g. the memory-mapped columns of a ``SharedInstance``; see ``as_frame``.
 
-    num_credits = len(credits_df)
-    num_swaps   = len(swaps_df)
+    ``assignment_format='compact'`` returns an int32 array holding each
+    credit's swap id, or -1 if dropped; ``'dense'`` the legacy credits x swaps
+    frame and ``'pairs'`` only the assigned (credit, swap) positions.
 
-    mdl = LpProblem(name="Dollar_Offset_Optimization", sense=LpMinimize)
+    ``warm_start=True`` passes a ``greedy_assignment`` to CBC as MIP start
+    (a compact swap index can be given instead); its delta is stored as
+    ``mdl.warm_start_delta``.
 
-    delta = LpVariable('delta', lowBound=0.0)
-    x = [[LpVariable(f'x_{i}_{j}', lowBound=0, upBound=1, cat='Binary')
-          for j in range(num_swaps)] for i in range(num_credits)]
+    ``aggregate`` enables the credit aggregation presolve: ``True`` groups
+    identical credits, a tolerance (see ``aggregate_credits``) also groups
+    near-identical ones. The model is then built over the classes with
+    integer counts and the solution is mapped back to individual credits. With
+    a tolerance, the returned delta is recomputed from the mapped assignment.
+    The classes are stored as ``mdl.credit_classes``. The phase breakdown of the run is stored on the
+    returned model as ``mdl.timings`` with the keys 'build', 'heuristic',
+    'export', 'solve' and 'extract' (seconds).
 
-    mdl += delta
+    ``strengthen=True`` tightens the model before the solve: delta bounds
+    from the LP relaxation and a feasible warm start (or greedy assignment),
+    cover and aggregated principal rows and symmetry orderings; see
+    ``strengthen`` and ``strengthen_cbc_model``. The ``Strengthening`` is
+    stored as ``mdl.strengthening`` and its time as the 'strengthen' phase.
 
-    for j in range(num_swaps):
-        lhs = lpSum((-1) * credits_df.loc[i, 'Delta_FV'] * x[i][j] for i in range(num_credits))
-        rhs_up = (1 + delta) * swaps_df.loc[j, 'Delta_FV']
-        rhs_lo = (1 - delta) * swaps_df.loc[j, 'Delta_FV']
-        mdl += lhs <= rhs_up, f"Dollar_Offset_Upper_{j}"
-        mdl += lhs >= rhs_lo, f"Dollar_Offset_Lower_{j}"
+    ``mdl.stats`` is a ``SolveStats`` with these timings, the model size, the
+    node count, the peak RSS of Python and CBC, and the incumbent/bound
+    timeline parsed from the CBC log, which is printed as the solve runs when
+    ``verbose``.
 
-    for i in range(num_credits):
-        mdl += lpSum(x[i][j] for j in range(num_swaps)) <= 1, f'credit_{i}_assignment'
+    ``progress`` is an optional callable ``(seconds, incumbent, bound)``
+    called with every timeline point while the solve runs, parsed from the
+    log as CBC writes it (see ``CbcLogFollower``).
+    """
+    stats = SolveStats('CBC')
+    timings = stats.timings
+    start = time.perf_counter()
 
-    for j in range(num_swaps):
-        mdl += lpSum(x[i][j] for i in range(num_credits)) >= 1, f'swap_{j}_assignment'
+    credits_df = as_frame(credits_df).reset_index(drop=True)
+    swaps_df = as_frame(swaps_df).reset_index(drop=True)
 
-    for j in range(num_swaps):
-        mdl += lpSum(credits_df.loc[i, 'Principal'] * x[i][j] for i in range(num_credits)) \
-               >= swaps_df.loc[j, 'Principal'], f'Principal_Swap_{j}'
+    num_credits = len(credits_df)
+    num_swaps = len(swaps_df)
 
-    for j in range(num_swaps):
-        numer = lpSum(credits_df.loc[i, 'Principal'] * credits_df.loc[i, 'Maturity'] * x[i][j]
-                      for i in range(num_credits))
-        denom = lpSum(credits_df.loc[i, 'Principal'] * x[i][j] for i in range(num_credits))
-        mdl += numer >= swaps_df.loc[j, 'Maturity'] * denom, f'Maturity_Swap_{j}'
+    classes = resolve_aggregation(aggregate, credits_df)
+    if classes is None:
+        mdl, x, delta = build_cbc_model(credits_df, swaps_df)
+    else:
+        mdl, x, delta = build_cbc_model(classes.frame, swaps_df, class_sizes=classes.sizes)
+    mdl.credit_classes = classes
+    mdl.stats = stats
+    # Rows: 5 per swap plus one per credit; every x_ij is in 6 rows and delta in 2 per swap
+    num_model_credits = len(x)
+    stats.num_rows = 5 * num_swaps + num_model_credits
+    stats.num_cols = num_model_credits * num_swaps + 1
+    stats.num_nonzeros = 6 * num_model_credits * num_swaps + 2 * num_swaps
+    timings['build'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    warm_index, warm_delta = resolve_warm_start(warm_start, credits_df, swaps_df)
+    if warm_index is not None:
+        if classes is None:
+            for row, j in zip(x, warm_index.tolist()):
+                for k, v in enumerate(row):
+                    v.setInitialValue(1 if k == j else 0)
+        else:
+            for row, row_counts in zip(x, classes.class_counts(warm_index, num_swaps).tolist()):
+                for v, count in zip(row, row_counts):
+                    v.setInitialValue(count)
+        delta.setInitialValue(warm_delta)
+    mdl.warm_start_delta = warm_delta
+    timings['heuristic'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    mdl.strengthening = resolve_strengthening(strengthen, credits_df, swaps_df, classes, warm_index)
+    if mdl.strengthening is not None:
+        num_rows, num_nonzeros = strengthen_cbc_model(mdl, x, delta, mdl.strengthening)
+        stats.num_rows += num_rows
+        stats.num_nonzeros += num_nonzeros
+    timings['strengthen'] = time.perf_counter() - start
 
-    solver = PULP_CBC_CMD(msg=verbose,
+    log_fd, log_path = tempfile.mkstemp(suffix='.log', prefix='cbc_')
+    os.close(log_fd)
+    solver = PULP_CBC_CMD(msg=False,
                           timeLimit=time_limit,
                           threads=num_cpu,
-                          gapRel=mip_gap)
+                          gapRel=mip_gap,
+                          warmStart=warm_index is not None,
+                          logPath=log_path)
 
+    start = time.perf_counter()
     if export:
         out_dir = os.path.abspath(os.path.join(os.getcwd(), "../output/LP_Models"))
         os.makedirs(out_dir, exist_ok=True)
         mdl.writeLP(os.path.join(out_dir, f"output_model_{experiment_name}.lp"))
+    timings['export'] = time.perf_counter() - start
 
-    status = mdl.solve(solver)
+    start = time.perf_counter()
+    # The log is followed for progress and, when verbose, echoed while CBC writes it
+    follower = CbcLogFollower(log_path, progress, echo=verbose) if progress is not None or verbose else None
+    if follower is not None:
+        follower.start()
+    try:
+        status = mdl.solve(solver)
+    finally:
+        if follower is not None:
+            follower.stop()
+        with open(log_path) as f:
+            log = f.read()
+        os.remove(log_path)
     status_str = LpStatus[mdl.status]
+    timings['solve'] = time.perf_counter() - start
+    parse_cbc_log(log, stats)
+    stats.status = status_str
 
-    assignment = pd.DataFrame(index=credits_df.index, columns=swaps_df.index, data=0)
+    start = time.perf_counter()
     if status_str in ['Optimal', 'Feasible']:
         delta_val = float(value(delta))
-        for i in range(num_credits):
-            for j in range(num_swaps):
-                assignment.loc[i, j] = int(round(value(x[i][j])))
-        assignment.columns = [f"Credits_Assigned_Swap_{j}" for j in assignment.columns]
+        values = np.fromiter((v.varValue or 0.0 for row in x for v in row),
+                             dtype=float, count=len(x) * num_swaps)
+        if classes is None:
+            matrix = assignment_matrix(values, num_credits, num_swaps)
+        else:
+            swap_index = classes.expand(values.reshape(classes.num_classes, num_swaps))
+            matrix = swap_index_matrix(swap_index, num_swaps)
+            if not classes.exact:
+                delta_val = assignment_delta(swap_index, credits_df['Delta_FV'].to_numpy(dtype=float),
+                                             swaps_df['Delta_FV'].to_numpy(dtype=float))
+        assignment = format_assignment(matrix, assignment_format)
+        timings['extract'] = time.perf_counter() - start
+        mdl.timings = timings
+        stats.finish()
         return assignment, delta_val, status_str, mdl
     else:
+        timings['extract'] = time.perf_counter() - start
+        mdl.timings = timings
+        stats.finish()
         return None, None, status_str, mdl
@@ -1,8 +1,18 @@
 from docplex.mp.model import Model
+from docplex.mp.progress import ProgressClock, ProgressListener
+from docplex.mp.solution import SolveSolution
+import numpy as np
 import pandas as pd
 from cplex.exceptions import CplexSolverError
+from utils.data_generation.instance_store import as_frame
+from utils.solvers.aggregation import resolve_aggregation
+from utils.solvers.assignment_utils import assignment_matrix, format_assignment, swap_index_matrix
+from utils.solvers.heuristics import assignment_delta, resolve_warm_start
+from utils.solvers.solve_stats import SolveStats
+from utils.solvers.strengthening import resolve_strengthening
 
 import os
+import time
 
 cplex_status_mapping = {
         1: "CPX_STAT_OPTIMAL",
@@ -93,118 +103,325 @@ from decimal import Decimal, ROUND_HALF_UP
 from docplex.mp.linear import LinearExpr
 
 def round_to_precision(value, precision=4):
-    """Round numeric values to a specified precision."""
-    return float(Decimal(value).quantize(Decimal(f'1e-{precision}'), rounding=ROUND_HALF_UP))
+    """Round numeric values (scalars or arrays) half up on their exact decimal value to a specified precision."""
+    quantum = Decimal(f'1e-{precision}')
+    if np.ndim(value) == 0:
+        return float(Decimal(float(value)).quantize(quantum, rounding=ROUND_HALF_UP))
+    return np.array([float(Decimal(v).quantize(quantum, rounding=ROUND_HALF_UP))
+                     for v in np.asarray(value, dtype=float).tolist()])
 
 def round_linear_expr(expr, model, precision=4):
     """Rounds the coefficients in a linear expression to a specified precision."""
     if isinstance(expr, LinearExpr):
-        # Create a new LinearExpr associated with the same model
-        rounded_expr = LinearExpr(model)
-        for var, coef in expr.iter_terms():
-            rounded_coef = round_to_precision(coef, precision)
-            rounded_expr.add_term(var, rounded_coef)
-        return rounded_expr
+        terms = list(expr.iter_terms())
+        coefs = round_to_precision(np.array([coef for _, coef in terms], dtype=float), precision)
+        return model.scal_prod([var for var, _ in terms], coefs.tolist())
     else:
         return round_to_precision(expr, precision)
 
 
 
-def solve_with_cplex(credits_df: pd.DataFrame, swaps_df: pd.DataFrame,
-                     verbose=False, time_limit=None, num_cpu=None,
-                     mip_gap=0.01, rel_tol=1e-6, abs_tol=1e-6,
-                     precision=4, export=True, experiment_name='First',
-                     presolve=0, reduce=0):
-    # Reset indices
-    credits_df = credits_df.reset_index(drop=True)
-    swaps_df = swaps_df.reset_index(drop=True)
+class TimelineListener(ProgressListener):
+    """Record every progress report of a solve as a point of ``stats.timeline``."""
+
+    def __init__(self, stats):
+        super().__init__(ProgressClock.All)
+        self.stats = stats
+
+    def notify_progress(self, pdata):
+        incumbent = pdata.current_objective if pdata.has_incumbent else np.nan
+        self.stats.record(pdata.time, incumbent, pdata.best_bound)
 
-    mdl = Model(name="Dollar_Offset_Optimization", log_output=verbose)
 
-    if num_cpu is not None:
-        mdl.context.cplex_parameters.threads = num_cpu
+def configure_cplex(mdl, time_limit=None, num_cpu=None, mip_gap=0.01, rel_tol=1e-6, abs_tol=1e-6,
+                    presolve=0, reduce=0):
+    """Set the solve parameters of a dollar-offset model; ``None`` restores the CPLEX default."""
+    mdl.context.cplex_parameters.threads = num_cpu if num_cpu is not None else 0
     if time_limit is not None:
         mdl.set_time_limit(time_limit)
+    else:
+        mdl.parameters.timelimit.reset()
 
     mdl.context.cplex_parameters.mip.tolerances.mipgap = mip_gap
     mdl.context.cplex_parameters.simplex.tolerances.feasibility = rel_tol
     mdl.context.cplex_parameters.simplex.tolerances.optimality = abs_tol
-    mdl._float_precision = precision
     mdl.context.cplex_parameters.preprocessing.presolve = presolve
     mdl.context.cplex_parameters.preprocessing.reduce = reduce
 
-    # Sizes
-    num_credits = len(credits_df)
+
+def credit_coefficients(model_credits: pd.DataFrame, precision=4):
+    """
+    Coefficient arrays of the credits, shared by all swap constraints.
+
+    Principals are rounded to ``precision`` with ``np.round``, as the swap
+    principals on the other side of the constraint. That is what the
+    original ``round(credits_df.loc[i, 'Principal'], precision)`` did, the
+    value being a NumPy float.
+    """
+    credit_delta_fv = model_credits['Delta_FV'].to_numpy(dtype=float)
+    credit_principal = model_credits['Principal'].to_numpy(dtype=float)
+    return {
+        'hedge': -credit_delta_fv,
+        'principal': credit_principal,
+        'rounded_principal': np.round(credit_principal, precision),
+        'principal_maturity': credit_principal * model_credits['Maturity'].to_numpy(dtype=float),
+    }
+
+
+def swap_constraints(mdl, column, delta, coefs, swap, precision=4):
+    """
+    Dollar-offset, principal and maturity constraints of one swap, in ``SWAP_CONSTRAINT_NAMES`` order.
+
+    ``column`` holds the swap's x variables in credit order and ``swap`` its
+    row (Principal, Delta_FV, Maturity). The dollar offset is written directly
+    on x and delta: ``lhs - D_j * delta <= D_j`` and ``lhs + D_j * delta >= D_j``.
+    """
+    swap_delta_fv = float(swap['Delta_FV'])
+    lhs = mdl.scal_prod(column, coefs['hedge'].tolist())
+    return [
+        lhs - swap_delta_fv * delta <= swap_delta_fv,
+        lhs + swap_delta_fv * delta >= swap_delta_fv,
+        # Sum of principals of assigned credits >= swap principal
+        mdl.scal_prod(column, coefs['rounded_principal'].tolist())
+        >= float(np.round(float(swap['Principal']), precision)),
+        # sum(P_i * M_i * x_ij) >= M_j * sum(P_i * x_ij) as a single row
+        mdl.scal_prod(column, (coefs['principal_maturity']
+                               - float(swap['Maturity']) * coefs['principal']).tolist()) >= 0,
+    ]
+
+
+# Constraints returned by swap_constraints, in order
+SWAP_CONSTRAINT_NAMES = ('Dollar_Offset_Upper_{j}', 'Dollar_Offset_Lower_{j}', 'Principal_Swap_{j}',
+                         'Maturity_Swap_{j}')
+
+
+def build_cplex_model(model_credits: pd.DataFrame, swaps_df: pd.DataFrame, credit_capacity=None,
+                      precision=4, verbose=False):
+    """
+    Build the dollar-offset model with docplex.
+
+    Coefficients come from NumPy arrays (``credit_coefficients``) and every
+    row is a ``scal_prod``/``sum_vars`` over the variable lists, added in
+    batches with ``add_constraints``; there are no auxiliary variables.
+
+    ``credit_capacity`` holds the class sizes when the rows of
+    ``model_credits`` are aggregated credit classes; ``x[i, j]`` is then a
+    general integer instead of a binary.
+
+    Returns
+    -------
+    mdl : Model
+    x : dict
+        ``x[i, j]`` assigns credit (class) i to swap j.
+    delta : Var
+    """
+    mdl = Model(name="Dollar_Offset_Optimization", log_output=verbose)
+    mdl._float_precision = precision
+
+    num_model_credits = len(model_credits)
     num_swaps = len(swaps_df)
 
     # Variables
     delta = mdl.continuous_var(name="delta")
-    x = mdl.binary_var_matrix(num_credits, num_swaps, name="x")
+    if credit_capacity is None:
+        credit_capacity = [1] * num_model_credits
+        x = mdl.binary_var_matrix(num_model_credits, num_swaps, name="x")
+    else:
+        x = mdl.integer_var_matrix(num_model_credits, num_swaps, lb=0,
+                                   ub=lambda key: credit_capacity[key[0]], name="x")
 
     mdl.minimize(delta)
 
-    # Dollar offset constraints
+    coefs = credit_coefficients(model_credits, precision)
+    columns = [[x[i, j] for i in range(num_model_credits)] for j in range(num_swaps)]
+
+    # Dollar offset, principal and maturity constraints
+    cts, names = [], []
     for j in range(num_swaps):
-        lhs_var = mdl.continuous_var(name=f"lhs_{j}")
-        rhs_upper_var = mdl.continuous_var(name=f"rhs_upper_{j}")
-        rhs_lower_var = mdl.continuous_var(name=f"rhs_lower_{j}")
+        cts.extend(swap_constraints(mdl, columns[j], delta, coefs, swaps_df.loc[j], precision))
+        names.extend(name.format(j=j) for name in SWAP_CONSTRAINT_NAMES)
+    mdl.add_constraints(cts, names)
 
-        lhs_expr = mdl.sum((-1)*credits_df.loc[i, 'Delta_FV'] * x[i, j] for i in range(num_credits))
-        rhs_upper_expr = (1 + delta) * swaps_df.loc[j, 'Delta_FV']
-        rhs_lower_expr = (1 - delta) * swaps_df.loc[j, 'Delta_FV']
+    # Each credit assigned at most once
+    mdl.add_constraints([mdl.sum_vars([x[i, j] for j in range(num_swaps)]) <= credit_capacity[i]
+                         for i in range(num_model_credits)],
+                        [f'credit_{i}_assignment' for i in range(num_model_credits)])
 
-        mdl.add_constraint(lhs_var == lhs_expr, ctname=f"lhs_def_{j}")
-        mdl.add_constraint(rhs_upper_var == rhs_upper_expr, ctname=f"rhs_upper_def_{j}")
-        mdl.add_constraint(rhs_lower_var == rhs_lower_expr, ctname=f"rhs_lower_def_{j}")
+    # Each swap gets at least one credit
+    mdl.add_constraints([mdl.sum_vars(columns[j]) >= 1 for j in range(num_swaps)],
+                        [f'swap_{j}_assignment' for j in range(num_swaps)])
 
-        mdl.add_constraint(lhs_var <= rhs_upper_var, ctname=f"Dollar_Offset_Upper_{j}")
-        mdl.add_constraint(lhs_var >= rhs_lower_var, ctname=f"Dollar_Offset_Lower_{j}")
+    return mdl, x, delta
 
-    # Each credit assigned at most once
-    for i in range(num_credits):
-        mdl.add_constraint(mdl.sum(x[i, j] for j in range(num_swaps)) <= 1, ctname=f'credit_{i}_assignment')
 
-    # Each swap gets at least one credit
-    for j in range(num_swaps):
-        mdl.add_constraint(mdl.sum(x[i, j] for i in range(num_credits)) >= 1, ctname=f'swap_{j}_assignment')
+def strengthen_cplex_model(mdl, x, delta, strengthening):
+    """
+    Add a ``Strengthening`` to a model of ``build_cplex_model``.
 
-    # Sum of principals of assigned credits >= swap principal
-    for j in range(num_swaps):
-        mdl.add_constraint(mdl.sum(round(credits_df.loc[i, 'Principal'], precision) * x[i, j]
-                                   for i in range(num_credits)) >=
-                           round(swaps_df.loc[j, 'Principal'], precision),
-                           ctname=f'Principal_Swap_{j}')
+    The delta bounds and excluded pairs become variable bounds; the cover
+    counts, symmetry orderings and the aggregated principal are new rows
+    ('Cover_Swap_j', 'Swap_Order_j_k', 'Credit_Order_i_k', 'Total_Principal').
+    """
+    if strengthening.delta_lower is not None:
+        delta.lb = strengthening.delta_lower
+    if strengthening.delta_upper is not None:
+        delta.ub = strengthening.delta_upper
+    for i, j in zip(*strengthening.excluded.nonzero()):
+        x[i, j].ub = 0
 
-    # Weighted maturity constraint
-    for j in range(num_swaps):
-        maturity_lhs = mdl.sum(credits_df.loc[i, 'Principal'] * credits_df.loc[i, 'Maturity'] * x[i, j]
-                               for i in range(num_credits))
-        maturity_rhs = mdl.sum(credits_df.loc[i, 'Principal'] * x[i, j] for i in range(num_credits))
-        swap_maturity = swaps_df.loc[j, 'Maturity']
-        mdl.add_constraint(maturity_lhs >= swap_maturity * maturity_rhs, ctname=f'Maturity_Swap_{j}')
+    num_model_credits, num_swaps = strengthening.excluded.shape
+    columns = [[x[i, j] for i in range(num_model_credits)] for j in range(num_swaps)]
+    rows = [[x[i, j] for j in range(num_swaps)] for i in range(num_model_credits)]
+    principal = strengthening.credit_principal.tolist()
+
+    cts, names = [], []
+    for j, count in enumerate(strengthening.min_credits.tolist()):
+        if count > 1:
+            cts.append(mdl.sum_vars(columns[j]) >= count)
+            names.append(f'Cover_Swap_{j}')
+    # Equivalent swaps in decreasing order of assigned principal, equivalent credits assigned first-come
+    for j, k in strengthening.swap_pairs:
+        cts.append(mdl.scal_prod(columns[j], principal) >= mdl.scal_prod(columns[k], principal))
+        names.append(f'Swap_Order_{j}_{k}')
+    for i, k in strengthening.credit_pairs:
+        cts.append(mdl.sum_vars(rows[i]) >= mdl.sum_vars(rows[k]))
+        names.append(f'Credit_Order_{i}_{k}')
+    cts.append(mdl.sum(mdl.scal_prod(columns[j], principal) for j in range(num_swaps))
+               >= strengthening.total_principal)
+    names.append('Total_Principal')
+    mdl.add_constraints(cts, names)
+    return mdl
+
+
+def solve_with_cplex(credits_df: pd.DataFrame, swaps_df: pd.DataFrame,
+                     verbose=False, time_limit=None, num_cpu=None,
+                     mip_gap=0.01, rel_tol=1e-6, abs_tol=1e-6,
+                     precision=4, export=True, experiment_name='First',
+                     presolve=0, reduce=0, assignment_format='compact',
+                     warm_start=False, aggregate=False, strengthen=False, progress=None):
+    """
+    Solve the dollar-offset model with CPLEX through docplex.
+
+    ``credits_df`` and ``swaps_df`` may also be mappings of column arrays,
+    e.g. the memory-mapped columns of a ``SharedInstance``; see ``as_frame``.
+
+    ``strengthen=True`` adds the bounds and valid inequalities of
+    ``strengthen`` before the solve, as in ``solve_with_cbc``; see
+    ``strengthen_cplex_model``.
+
+    ``mdl.stats`` is a ``SolveStats`` with the phase timings ('build',
+    'heuristic', 'strengthen', 'export', 'solve', 'extract'), the model size,
+    node count, peak RSS, deterministic time, MIP gap and the
+    incumbent/bound timeline reported by a progress listener, which is also
+    passed to ``progress`` live (see ``solve_with_cbc``).
+    """
+    stats = SolveStats('CPLEX')
+    stats.listener = progress
+    timings = stats.timings
+    start = time.perf_counter()
+
+    # Reset indices
+    credits_df = as_frame(credits_df).reset_index(drop=True)
+    swaps_df = as_frame(swaps_df).reset_index(drop=True)
+
+    # Sizes
+    num_credits = len(credits_df)
+    num_swaps = len(swaps_df)
+
+    # Optional presolve: one integer count per (credit class, swap) instead of one binary per credit
+    classes = resolve_aggregation(aggregate, credits_df)
+    if classes is None:
+        model_credits = credits_df
+        mdl, x, delta = build_cplex_model(credits_df, swaps_df, precision=precision, verbose=verbose)
+    else:
+        model_credits = classes.frame
+        mdl, x, delta = build_cplex_model(classes.frame, swaps_df,
+                                          credit_capacity=[int(size) for size in classes.sizes],
+                                          precision=precision, verbose=verbose)
+    mdl.credit_classes = classes
+    num_model_credits = len(model_credits)
+
+    configure_cplex(mdl, time_limit=time_limit, num_cpu=num_cpu, mip_gap=mip_gap, rel_tol=rel_tol,
+                    abs_tol=abs_tol, presolve=presolve, reduce=reduce)
+    mdl.stats = stats
+    mdl.add_progress_listener(TimelineListener(stats))
+    timings['build'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # MIP start from the greedy heuristic (or a given compact assignment)
+    warm_index, warm_delta = resolve_warm_start(warm_start, credits_df, swaps_df)
+    if warm_index is not None:
+        if classes is None:
+            start_values = {x[i, j]: 1 for i, j in enumerate(warm_index.tolist()) if j >= 0}
+        else:
+            counts = classes.class_counts(warm_index, num_swaps)
+            start_values = {x[i, j]: int(counts[i, j]) for i, j in zip(*counts.nonzero())}
+        start_values[delta] = warm_delta
+        mdl.add_mip_start(SolveSolution(mdl, start_values), complete_vars=True)
+        if verbose:
+            print(f"MIP start from heuristic with delta = {warm_delta}")
+    mdl.warm_start_delta = warm_delta
+    timings['heuristic'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    mdl.strengthening = resolve_strengthening(strengthen, credits_df, swaps_df, classes, warm_index)
+    if mdl.strengthening is not None:
+        strengthen_cplex_model(mdl, x, delta, mdl.strengthening)
+    timings['strengthen'] = time.perf_counter() - start
 
     # Export model
+    start = time.perf_counter()
     base_output_folder = os.path.abspath(os.path.join(os.getcwd(), "../output/LP_Models"))
     os.makedirs(base_output_folder, exist_ok=True)
     model_file_path = os.path.join(base_output_folder, f"output_model_{experiment_name}.lp")
     if export:
         mdl.export_as_lp(model_file_path)
+    timings['export'] = time.perf_counter() - start
 
+    start = time.perf_counter()
     solution = mdl.solve()
+    timings['solve'] = time.perf_counter() - start
     print(mdl.solve_details.status)
 
     status = cplex_status_mapping[mdl.solve_details.status_code]
-    assignment = pd.DataFrame(index=credits_df.index, columns=swaps_df.index, data=0)
+    details = mdl.solve_details
+    stats.status = status
+    stats.deterministic_time = details.deterministic_time
+    stats.mip_gap = details.mip_relative_gap
+    stats.num_nodes = details.nb_nodes_processed
+    stats.num_rows = mdl.number_of_constraints
+    stats.num_cols = mdl.number_of_variables
+    try:
+        stats.num_nonzeros = mdl.get_cplex().linear_constraints.get_num_nonzeros()
+    except (AttributeError, CplexSolverError):
+        pass
+    stats.record(details.time, solution.objective_value if solution is not None else np.nan, details.best_bound)
 
+    start = time.perf_counter()
     if solution is not None:
         print(f"Solution status: {status} with delta = {solution['delta']}")
-        for i in range(num_credits):
-            for j in range(num_swaps):
-                assignment.loc[i, j] = int(round(solution[x[i, j]]))
-        assignment.columns = [f"Credits_Assigned_Swap_{i}" for i in assignment.columns]
-        return assignment, solution[delta], status, mdl
+        # Read every x value back in one call instead of one lookup per variable
+        values = solution.get_values([x[i, j] for i in range(num_model_credits) for j in range(num_swaps)])
+        delta_val = solution[delta]
+        if classes is None:
+            matrix = assignment_matrix(values, num_credits, num_swaps)
+        else:
+            # Hand each class's counts out to its individual credits
+            swap_index = classes.expand(np.reshape(values, (num_model_credits, num_swaps)))
+            matrix = swap_index_matrix(swap_index, num_swaps)
+            if not classes.exact:
+                delta_val = assignment_delta(swap_index, credits_df['Delta_FV'].to_numpy(dtype=float),
+                                             swaps_df['Delta_FV'].to_numpy(dtype=float))
+        assignment = format_assignment(matrix, assignment_format)
+        timings['extract'] = time.perf_counter() - start
+        mdl.timings = timings
+        stats.finish()
+        return assignment, delta_val, status, mdl
     else:
         print(f"Solution status: {status}")
+        timings['extract'] = time.perf_counter() - start
+        mdl.timings = timings
+        stats.finish()
         return None, None, status, mdl
 
 
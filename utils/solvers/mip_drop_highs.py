@@ -0,0 +1,263 @@
+import time
+import numpy as np
+import pandas as pd
+from scipy.optimize import milp, Bounds, LinearConstraint
+from scipy.sparse import coo_array
+from utils.data_generation.instance_store import as_frame
+from utils.solvers.aggregation import resolve_aggregation
+from utils.solvers.assignment_utils import assignment_matrix, format_assignment, swap_index_matrix
+from utils.solvers.heuristics import assignment_delta
+from utils.solvers.solve_stats import SolveStats
+
+milp_status_mapping = {
+    0: "Optimal",
+    1: "Feasible",
+    2: "Infeasible",
+    3: "Unbounded",
+    4: "Undefined",
+}
+
+
+class SparseModel:
+    """
+    Dollar-offset model held as CSR arrays, ready to be handed to an in-process solver.
+
+    Column ``i * num_swaps + j`` is the binary x_ij and the last column is delta.
+    Rows are laid out in blocks of ``num_swaps`` (dollar offset upper, dollar offset
+    lower, swap assignment, principal, maturity) followed by one credit assignment
+    row per credit. A model over a sparse ``support`` of (credit, swap) pairs
+    has one x column per pair instead, in support order.
+    """
+
+    def __init__(self, c, A, row_lower, row_upper, col_lower, col_upper, integrality,
+                 num_credits, num_swaps, support=None):
+        self.c = c
+        self.A = A
+        self.row_lower = row_lower
+        self.row_upper = row_upper
+        self.col_lower = col_lower
+        self.col_upper = col_upper
+        self.integrality = integrality
+        self.num_credits = num_credits
+        self.num_swaps = num_swaps
+        self.support = support
+        self.result = None
+        self.timings = {}
+
+    @property
+    def delta_col(self):
+        if self.support is not None:
+            return len(self.support[0])
+        return self.num_credits * self.num_swaps
+
+
+def build_sparse_model(credits_df: pd.DataFrame, swaps_df: pd.DataFrame):
+    """
+    Build the constraint matrix of the dollar-offset model directly as CSR arrays.
+
+    Parameters
+    ----------
+    credits_df : pd.DataFrame
+        Credits with 'Principal', 'Delta_FV' and 'Maturity'.
+    swaps_df : pd.DataFrame
+        Swaps with 'Principal', 'Delta_FV' and 'Maturity'.
+
+    Returns
+    -------
+    SparseModel
+    """
+    return build_sparse_arrays(credits_df['Delta_FV'].to_numpy(dtype=float),
+                               credits_df['Principal'].to_numpy(dtype=float),
+                               credits_df['Maturity'].to_numpy(dtype=float),
+                               swaps_df['Delta_FV'].to_numpy(dtype=float),
+                               swaps_df['Principal'].to_numpy(dtype=float),
+                               swaps_df['Maturity'].to_numpy(dtype=float))
+
+
+def build_sparse_arrays(credit_delta_fv, credit_principal, credit_maturity,
+                        swap_delta_fv, swap_principal, swap_maturity,
+                        offsets=None, delta_lower=0.0, class_sizes=None, support=None):
+    """
+    ``build_sparse_model`` on plain coefficient arrays.
+
+    Parameters
+    ----------
+    offsets : dict of np.ndarray, optional
+        Per-swap contributions of credits that are fixed outside the model:
+        'hedge' (sum of -Delta_FV), 'principal', 'maturity_slack'
+        (sum of P_i * (M_i - M_j)) and 'count'. They move the right-hand
+        sides, so the model re-optimizes only the credits it is given.
+    delta_lower : float, default=0.0
+        Lower bound on delta, e.g. the delta already reached by swaps that
+        are not part of the model.
+    class_sizes : array-like of int, optional
+        Credit counts when the credits are aggregated classes; x_ij becomes an
+        integer count bounded by the class size.
+    support : (np.ndarray, np.ndarray), optional
+        Credit and swap positions of the only x_ij columns to create; every
+        other pair is left out of the model (fixed to 0).
+
+    Returns
+    -------
+    SparseModel
+    """
+    credit_delta_fv = np.asarray(credit_delta_fv, dtype=float)
+    credit_principal = np.asarray(credit_principal, dtype=float)
+    credit_principal_maturity = credit_principal * np.asarray(credit_maturity, dtype=float)
+
+    swap_delta_fv = np.asarray(swap_delta_fv, dtype=float)
+    swap_principal = np.asarray(swap_principal, dtype=float)
+    swap_maturity = np.asarray(swap_maturity, dtype=float)
+
+    num_credits = len(credit_delta_fv)
+    num_swaps = len(swap_delta_fv)
+    S = num_swaps
+    if support is None:
+        ci = np.repeat(np.arange(num_credits), num_swaps)
+        sj = np.tile(np.arange(num_swaps), num_credits)
+    else:
+        ci, sj = (np.asarray(positions, dtype=np.int64) for positions in support)
+    num_pairs = len(ci)
+    cols = np.arange(num_pairs)
+    swap_idx = np.arange(num_swaps)
+
+    rows = np.concatenate([
+        sj,                      # Dollar_Offset_Upper_j
+        S + sj,                  # Dollar_Offset_Lower_j
+        2 * S + sj,              # swap_j_assignment
+        3 * S + sj,              # Principal_Swap_j
+        4 * S + sj,              # Maturity_Swap_j
+        5 * S + ci,              # credit_i_assignment
+        swap_idx,                # delta in Dollar_Offset_Upper_j
+        S + swap_idx,            # delta in Dollar_Offset_Lower_j
+    ])
+    data = np.concatenate([
+        -credit_delta_fv[ci],
+        -credit_delta_fv[ci],
+        np.ones(num_pairs),
+        credit_principal[ci],
+        credit_principal_maturity[ci] - swap_maturity[sj] * credit_principal[ci],
+        np.ones(num_pairs),
+        -swap_delta_fv,
+        swap_delta_fv,
+    ])
+    indices = np.concatenate([np.tile(cols, 6), np.full(2 * S, num_pairs)])
+
+    num_rows = 5 * S + num_credits
+    A = coo_array((data, (rows, indices)), shape=(num_rows, num_pairs + 1)).tocsr()
+
+    if offsets is None:
+        offsets = {}
+    capacity = np.ones(num_credits) if class_sizes is None else np.asarray(class_sizes, dtype=float)
+    fixed_hedge = offsets.get('hedge', np.zeros(S))
+    offset_rhs = swap_delta_fv - fixed_hedge
+    row_lower = np.concatenate([
+        np.full(S, -np.inf), offset_rhs, 1 - offsets.get('count', np.zeros(S)),
+        swap_principal - offsets.get('principal', np.zeros(S)), -offsets.get('maturity_slack', np.zeros(S)),
+        np.full(num_credits, -np.inf),
+    ])
+    row_upper = np.concatenate([
+        offset_rhs, np.full(4 * S, np.inf), capacity,
+    ])
+
+    c = np.zeros(num_pairs + 1)
+    c[num_pairs] = 1.0
+    col_lower = np.zeros(num_pairs + 1)
+    col_lower[num_pairs] = delta_lower
+    col_upper = np.ones(num_pairs + 1)
+    col_upper[:num_pairs] = capacity[ci]
+    col_upper[num_pairs] = np.inf
+    integrality = np.ones(num_pairs + 1, dtype=np.uint8)
+    integrality[num_pairs] = 0
+
+    return SparseModel(c, A, row_lower, row_upper, col_lower, col_upper, integrality,
+                       num_credits, num_swaps, support=support)
+
+
+def run_milp(model, verbose=False, time_limit=None, mip_gap=0.01):
+    """Solve a ``SparseModel`` with ``scipy.optimize.milp`` and keep the result on the model."""
+    options = {'disp': verbose, 'mip_rel_gap': mip_gap}
+    if time_limit is not None:
+        options['time_limit'] = time_limit
+    model.result = milp(model.c,
+                        integrality=model.integrality,
+                        bounds=Bounds(model.col_lower, model.col_upper),
+                        constraints=LinearConstraint(model.A, model.row_lower, model.row_upper),
+                        options=options)
+    return model.result
+
+
+def solve_with_highs(credits_df: pd.DataFrame,
+                     swaps_df: pd.DataFrame,
+                     verbose=False,
+                     time_limit=None,
+                     num_cpu=None,
+                     mip_gap=0.01,
+                     export=False,
+                     experiment_name='First',
+                     assignment_format='compact',
+                     aggregate=False,
+                     progress=None):
+    """
+    Solve the dollar-offset model with HiGHS through ``scipy.optimize.milp``.
+
+    The model goes to the solver as CSR arrays in-process, without an LP/MPS file.
+    ``num_cpu`` and ``export`` are accepted for signature compatibility only; scipy
+    does not expose the HiGHS thread count and no model file is written. ``aggregate`` enables the credit aggregation
+    presolve as in ``solve_with_cbc``. The phase breakdown is stored as
+    ``model.timings``, and ``model.stats`` is a ``SolveStats`` whose timeline
+    holds the final incumbent and dual bound only; ``progress`` (see
+    ``solve_with_cbc``) therefore only sees that point.
+    """
+    start = time.perf_counter()
+    credits_df = as_frame(credits_df).reset_index(drop=True)
+    swaps_df = as_frame(swaps_df).reset_index(drop=True)
+
+    classes = resolve_aggregation(aggregate, credits_df)
+    if classes is None:
+        model = build_sparse_model(credits_df, swaps_df)
+    else:
+        model = build_sparse_arrays(classes.frame['Delta_FV'].to_numpy(), classes.frame['Principal'].to_numpy(),
+                                    classes.frame['Maturity'].to_numpy(),
+                                    swaps_df['Delta_FV'].to_numpy(dtype=float),
+                                    swaps_df['Principal'].to_numpy(dtype=float),
+                                    swaps_df['Maturity'].to_numpy(dtype=float),
+                                    class_sizes=classes.sizes)
+    model.credit_classes = classes
+    model.stats = SolveStats('HiGHS')
+    model.stats.timings = model.timings
+    model.stats.listener = progress
+    model.stats.num_rows, model.stats.num_cols = model.A.shape
+    model.stats.num_nonzeros = model.A.nnz
+    model.timings['build'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = run_milp(model, verbose=verbose, time_limit=time_limit, mip_gap=mip_gap)
+    model.timings['solve'] = time.perf_counter() - start
+
+    status_str = milp_status_mapping.get(result.status, "Undefined")
+    model.stats.mip_gap = getattr(result, 'mip_gap', None)
+    model.stats.record(model.timings['solve'], result.fun if result.x is not None else np.nan,
+                       getattr(result, 'mip_dual_bound', np.nan))
+    if result.x is None:
+        status_str = "Not Solved" if result.status == 1 else status_str
+        model.timings['extract'] = 0.0
+        model.stats.status = status_str
+        model.stats.finish()
+        return None, None, status_str, model
+    model.stats.status = status_str
+
+    start = time.perf_counter()
+    delta_val = float(result.x[model.delta_col])
+    if classes is None:
+        matrix = assignment_matrix(result.x[:model.delta_col], model.num_credits, model.num_swaps)
+    else:
+        swap_index = classes.expand(result.x[:model.delta_col].reshape(model.num_credits, model.num_swaps))
+        matrix = swap_index_matrix(swap_index, model.num_swaps)
+        if not classes.exact:
+            delta_val = assignment_delta(swap_index, credits_df['Delta_FV'].to_numpy(dtype=float),
+                                         swaps_df['Delta_FV'].to_numpy(dtype=float))
+    assignment = format_assignment(matrix, assignment_format)
+    model.timings['extract'] = time.perf_counter() - start
+    model.stats.finish()
+    return assignment, delta_val, status_str, model
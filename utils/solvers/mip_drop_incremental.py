@@ -0,0 +1,294 @@
+import time
+import numpy as np
+import pandas as pd
+
+from utils.solvers.assignment_utils import DROPPED, format_assignment, swap_index_from_frame, swap_index_matrix
+from utils.solvers.mip_drop_highs import build_sparse_arrays, run_milp
+from utils.solvers.mip_drop_lns import swap_deltas, swap_totals
+
+DIFF_COLUMNS = ('Principal', 'Maturity', 'Delta_FV')
+
+
+class CreditDiff:
+    """
+    Changes of the credit book between two runs, as credit ids.
+
+    ``added`` are ids only in the new book, ``removed`` ids only in the old
+    one and ``changed`` ids in both whose Principal, Maturity or Delta_FV
+    moved by more than the tolerance.
+    """
+
+    def __init__(self, added, removed, changed):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+
+    @property
+    def size(self):
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+
+class IncrementalModel:
+    """
+    Record of an incremental re-hedging run.
+
+    ``diff`` is the ``CreditDiff`` of the book, ``free_swaps`` and
+    ``free_credits`` the neighborhood of the last sub-MIP (positions in the
+    new book), ``movement`` the summary of ``designation_movement`` and
+    ``changes`` its per-credit frame.
+    """
+
+    def __init__(self):
+        self.diff = None
+        self.iterations = 0
+        self.free_swaps = None
+        self.free_credits = None
+        self.movement = {}
+        self.changes = None
+        self.swap_index = None
+        self.timings = {}
+
+
+def diff_credits(previous_credits_df: pd.DataFrame, credits_df: pd.DataFrame, id_column='UNIQUE_INDEX',
+                 tolerance=0.0):
+    """Compare two credit books by ``id_column``; see ``CreditDiff``."""
+    for frame in (previous_credits_df, credits_df):
+        if id_column not in frame.columns:
+            raise ValueError(f"Credits need an id column '{id_column}' to be compared between runs.")
+
+    old = previous_credits_df.set_index(id_column)
+    new = credits_df.set_index(id_column)
+    added = new.index.difference(old.index).to_numpy()
+    removed = old.index.difference(new.index).to_numpy()
+    common = new.index.intersection(old.index)
+    columns = list(DIFF_COLUMNS)
+    moved = ~np.isclose(new.loc[common, columns].to_numpy(dtype=float),
+                        old.loc[common, columns].to_numpy(dtype=float), rtol=0.0, atol=tolerance)
+    changed = common[moved.any(axis=1)].to_numpy()
+    return CreditDiff(added, removed, changed)
+
+
+def carry_assignment(previous_credits_df: pd.DataFrame, previous_assignment, credits_df: pd.DataFrame,
+                     id_column='UNIQUE_INDEX'):
+    """
+    Map a previous assignment onto the new book by credit id.
+
+    Credits kept from the previous book keep their swap, new credits start
+    dropped. ``previous_assignment`` is the compact swap index or the
+    legacy ``Credits_Assigned_Swap_j`` frame of ``previous_credits_df``.
+    """
+    if isinstance(previous_assignment, pd.DataFrame):
+        previous_index = swap_index_from_frame(previous_assignment)
+    else:
+        previous_index = np.asarray(previous_assignment, dtype=np.int32)
+    by_id = pd.Series(previous_index, index=previous_credits_df[id_column].to_numpy())
+    carried = by_id.reindex(credits_df[id_column].to_numpy()).fillna(DROPPED)
+    return carried.to_numpy().astype(np.int32)
+
+
+def designation_movement(previous_credits_df: pd.DataFrame, previous_index, credits_df: pd.DataFrame,
+                         swap_index, id_column='UNIQUE_INDEX'):
+    """
+    How far a new designation moved from the previous one.
+
+    Returns
+    -------
+    summary : dict
+        Counts and principal of credits that were de-designated (assigned
+        before, dropped or removed now), newly designated and moved to
+        another swap, and the share of the previous designated principal
+        that changed hands.
+    changes : pd.DataFrame
+        One row per credit whose designation changed, with its id, previous
+        and new swap (``DROPPED`` when unassigned or not in the book) and
+        principal.
+    """
+    old = pd.DataFrame({'Previous_Swap': np.asarray(previous_index, dtype=np.int32),
+                        'Previous_Principal': previous_credits_df['Principal'].to_numpy(dtype=float)},
+                       index=previous_credits_df[id_column].to_numpy())
+    new = pd.DataFrame({'New_Swap': np.asarray(swap_index, dtype=np.int32),
+                        'New_Principal': credits_df['Principal'].to_numpy(dtype=float)},
+                       index=credits_df[id_column].to_numpy())
+    both = old.join(new, how='outer')
+    both[['Previous_Swap', 'New_Swap']] = both[['Previous_Swap', 'New_Swap']].fillna(DROPPED).astype(np.int32)
+    both['Principal'] = both['New_Principal'].fillna(both['Previous_Principal'])
+
+    changes = both[both['Previous_Swap'] != both['New_Swap']]
+    was, now = changes['Previous_Swap'] != DROPPED, changes['New_Swap'] != DROPPED
+    designated_before = both.loc[both['Previous_Swap'] != DROPPED, 'Previous_Principal'].sum()
+    summary = {
+        'Dedesignated': int((was & ~now).sum()),
+        'Dedesignated_Principal': float(changes.loc[was & ~now, 'Principal'].sum()),
+        'Newly_Designated': int((~was & now).sum()),
+        'Newly_Designated_Principal': float(changes.loc[~was & now, 'Principal'].sum()),
+        'Moved': int((was & now).sum()),
+        'Moved_Principal': float(changes.loc[was & now, 'Principal'].sum()),
+    }
+    summary['Changed_Principal_Share'] = (
+        float((summary['Dedesignated_Principal'] + summary['Moved_Principal']) / designated_before)
+        if designated_before > 0 else 0.0)
+    changes = (changes[['Previous_Swap', 'New_Swap', 'Principal']]
+               .rename_axis(id_column).reset_index())
+    return summary, changes
+
+
+def solve_incremental(credits_df: pd.DataFrame,
+                      swaps_df: pd.DataFrame,
+                      previous_credits_df: pd.DataFrame,
+                      previous_assignment,
+                      verbose=False,
+                      time_limit=60,
+                      num_cpu=None,
+                      mip_gap=0.01,
+                      experiment_name='First',
+                      assignment_format='compact',
+                      id_column='UNIQUE_INDEX',
+                      tolerance=0.0,
+                      neighborhood_credits=500,
+                      sub_time_limit=10,
+                      keep_weight=1e-6,
+                      random_seed=42):
+    """
+    Re-hedge an updated credit book starting from the previous designation.
+
+    The previous assignment is carried over by credit id (``carry_assignment``)
+    and compared with the new book (``diff_credits``). Only the affected swaps
+    are re-optimized: those that lost or hold changed credits, those whose
+    constraints the update broke, and the swap with the worst delta when new
+    credits could improve it. Their neighborhood is the added and changed
+    credits plus a sample of the affected swaps' own and of the dropped
+    credits, ``neighborhood_credits`` in total. It goes through one sub-MIP
+    in the LNS formulation, solved in-process by HiGHS, with every other
+    assignment fixed. If that sub-MIP has no solution, the neighborhood
+    doubles and, once it covers every candidate credit, the next-worst swap
+    joins it, until ``time_limit`` seconds (None for no limit) have passed
+    or every swap is free; each sub-MIP gets at most ``sub_time_limit`` of
+    them. The objective rewards every freed credit left on its previous
+    swap by ``keep_weight``, so among designations of
+    (nearly) equal delta the one closest to the previous is chosen. The work
+    thus grows with the size of the change, not of the book;
+    ``solve_with_lns`` can polish the result further from
+    ``warm_start=model.swap_index``. ``num_cpu`` is accepted for signature
+    compatibility only.
+
+    Returns the usual ``(assignment, delta, status, model)`` tuple; ``model`` is
+    an ``IncrementalModel`` whose ``movement`` reports how far the new
+    designation moved from the previous one. The status is 'Feasible', or
+    'Not Solved' without an assignment when no feasible re-hedge was found.
+    """
+    start_time = time.perf_counter()
+    model = IncrementalModel()
+
+    def remaining():
+        return np.inf if time_limit is None else time_limit - (time.perf_counter() - start_time)
+    rng = np.random.default_rng(random_seed)
+
+    credits_df = credits_df.reset_index(drop=True)
+    swaps_df = swaps_df.reset_index(drop=True)
+    previous_credits_df = previous_credits_df.reset_index(drop=True)
+
+    credit_delta_fv = credits_df['Delta_FV'].to_numpy(dtype=float)
+    credit_principal = credits_df['Principal'].to_numpy(dtype=float)
+    credit_maturity = credits_df['Maturity'].to_numpy(dtype=float)
+    credit_hedge = -credit_delta_fv
+    credit_principal_maturity = credit_principal * credit_maturity
+    swap_delta_fv = swaps_df['Delta_FV'].to_numpy(dtype=float)
+    swap_principal = swaps_df['Principal'].to_numpy(dtype=float)
+    swap_maturity = swaps_df['Maturity'].to_numpy(dtype=float)
+    num_swaps = len(swaps_df)
+
+    model.diff = diff_credits(previous_credits_df, credits_df, id_column=id_column, tolerance=tolerance)
+    if isinstance(previous_assignment, pd.DataFrame):
+        previous_index = swap_index_from_frame(previous_assignment)
+    else:
+        previous_index = np.asarray(previous_assignment, dtype=np.int32)
+    carried = carry_assignment(previous_credits_df, previous_index, credits_df, id_column=id_column)
+    model.timings['diff'] = time.perf_counter() - start_time
+
+    def totals_of(swap_index):
+        return swap_totals(swap_index, credit_hedge, credit_principal, credit_principal_maturity, swap_maturity)
+
+    def feasible_swaps(totals):
+        return ((totals['count'] >= 1) & (totals['principal'] >= swap_principal - 1e-6)
+                & (totals['maturity_slack'] >= -1e-6))
+
+    # Affected swaps: lost or changed credits, broken constraints, and the worst swap if new credits arrived
+    ids = credits_df[id_column].to_numpy()
+    previous_ids = previous_credits_df[id_column].to_numpy()
+    removed_swaps = previous_index[np.isin(previous_ids, model.diff.removed)]
+    changed_credits = np.flatnonzero(np.isin(ids, model.diff.changed))
+    added_credits = np.flatnonzero(np.isin(ids, model.diff.added))
+    totals = totals_of(carried)
+    deltas = swap_deltas(totals['hedge'], swap_delta_fv)
+    affected = np.zeros(num_swaps, dtype=bool)
+    affected[removed_swaps[removed_swaps != DROPPED]] = True
+    affected[carried[changed_credits][carried[changed_credits] != DROPPED]] = True
+    affected |= ~feasible_swaps(totals)
+    if len(added_credits) and num_swaps:
+        affected[int(np.argmax(deltas))] = True
+
+    incumbent = carried
+    if affected.any():
+        free_swaps = np.flatnonzero(affected)
+        # Changed credits are dropped or sit on an affected swap, so all of them can move
+        must_free = np.union1d(added_credits, changed_credits)
+        size = max(neighborhood_credits, len(must_free))
+        while True:
+            candidates = np.setdiff1d(np.flatnonzero(np.isin(carried, np.append(free_swaps, DROPPED))), must_free)
+            take = min(len(candidates), size - len(must_free))
+            free_credits = np.union1d(must_free, rng.choice(candidates, size=take, replace=False))
+
+            fixed = carried.copy()
+            fixed[free_credits] = DROPPED
+            fixed_totals = totals_of(fixed)
+            other_swaps = np.setdiff1d(np.arange(num_swaps), free_swaps)
+            fixed_deltas = swap_deltas(fixed_totals['hedge'], swap_delta_fv)
+            delta_floor = float(fixed_deltas[other_swaps].max()) if len(other_swaps) else 0.0
+
+            sub = build_sparse_arrays(credit_delta_fv[free_credits], credit_principal[free_credits],
+                                      credit_maturity[free_credits], swap_delta_fv[free_swaps],
+                                      swap_principal[free_swaps], swap_maturity[free_swaps],
+                                      offsets={k: v[free_swaps] for k, v in fixed_totals.items()},
+                                      delta_lower=delta_floor)
+            # Reward x_ij of credits kept on their previous swap
+            position = np.full(num_swaps + 1, -1)
+            position[free_swaps] = np.arange(len(free_swaps))
+            previous = position[carried[free_credits]]
+            kept = np.flatnonzero(previous >= 0)
+            sub.c[kept * len(free_swaps) + previous[kept]] = -keep_weight
+            result = run_milp(sub, verbose=verbose, time_limit=max(min(sub_time_limit, remaining()), 1e-3),
+                              mip_gap=mip_gap)
+            model.iterations += 1
+            if verbose:
+                print(f"Re-hedge sub-MIP {model.iterations}: {len(free_credits)} credits x "
+                      f"{len(free_swaps)} swaps, status {result.status}")
+
+            if result.x is not None:
+                sub_values = np.rint(result.x[:sub.delta_col]).reshape(len(free_credits), len(free_swaps))
+                assigned = sub_values.max(axis=1) > 0.5
+                fixed[free_credits[assigned]] = free_swaps[sub_values.argmax(axis=1)[assigned]]
+                incumbent = fixed
+                break
+            if remaining() <= 0:
+                break
+            if take < len(candidates):
+                size *= 2
+            elif len(other_swaps):
+                # Every candidate is already free: bring in the next-worst swap
+                next_swap = other_swaps[np.argmax(deltas[other_swaps])]
+                free_swaps = np.append(free_swaps, next_swap)
+            else:
+                break
+        model.free_swaps, model.free_credits = free_swaps, free_credits
+    model.timings['search'] = time.perf_counter() - start_time - model.timings['diff']
+
+    model.swap_index = incumbent
+    model.movement, model.changes = designation_movement(previous_credits_df, previous_index, credits_df,
+                                                         incumbent, id_column=id_column)
+    totals = totals_of(incumbent)
+    if not feasible_swaps(totals).all():
+        return None, None, 'Not Solved', model
+
+    delta = float(swap_deltas(totals['hedge'], swap_delta_fv).max()) if num_swaps else 0.0
+    assignment = format_assignment(swap_index_matrix(incumbent, num_swaps), assignment_format)
+    return assignment, delta, 'Feasible', model
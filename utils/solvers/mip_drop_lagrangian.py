@@ -0,0 +1,317 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.solvers.assignment_utils import DROPPED, format_assignment, swap_index_matrix
+from utils.solvers.heuristics import resolve_warm_start
+from utils.solvers.mip_drop_highs import build_sparse_arrays, run_milp
+from utils.solvers.mip_drop_lns import swap_deltas, swap_totals
+
+# Coefficient arrays of the instance, set once per worker process by _init_worker
+_INSTANCE = {}
+
+
+class LagrangianModel:
+    """
+    Record of a Lagrangian decomposition run.
+
+    ``history`` holds one ``(seconds, lower_bound, upper_bound)`` entry per
+    subgradient iteration; ``lower_bound`` is the best Lagrangian bound on
+    delta and ``multipliers`` the final credit multipliers.
+    """
+
+    def __init__(self):
+        self.history = []
+        self.iterations = 0
+        self.lower_bound = 0.0
+        self.multipliers = None
+        self.swap_weights = None
+        self.timings = {}
+
+    def history_df(self):
+        return pd.DataFrame(self.history, columns=['Seconds', 'Lower_Bound', 'Upper_Bound'])
+
+
+def _init_worker(credit_delta_fv, credit_principal, credit_maturity, swap_delta_fv, swap_principal, swap_maturity):
+    _INSTANCE.update(credit_delta_fv=credit_delta_fv, credit_principal=credit_principal,
+                     credit_maturity=credit_maturity, swap_delta_fv=swap_delta_fv,
+                     swap_principal=swap_principal, swap_maturity=swap_maturity, models={})
+
+
+def _swap_model(j):
+    """Single-swap model without the credit rows, built once per worker and swap."""
+    models = _INSTANCE['models']
+    if j not in models:
+        model = build_sparse_arrays(_INSTANCE['credit_delta_fv'], _INSTANCE['credit_principal'],
+                                    _INSTANCE['credit_maturity'], _INSTANCE['swap_delta_fv'][j:j + 1],
+                                    _INSTANCE['swap_principal'][j:j + 1], _INSTANCE['swap_maturity'][j:j + 1])
+        # With one swap, x_i <= 1 is already a column bound
+        model.A = model.A[:5]
+        model.row_lower = model.row_lower[:5]
+        model.row_upper = model.row_upper[:5]
+        models[j] = model
+    return models[j]
+
+
+def solve_swap_subproblem(j, multipliers, swap_weight, delta_upper, time_limit, mip_gap):
+    """
+    Lagrangian subproblem of swap j.
+
+    ``min swap_weight * delta_j + sum(multipliers[i] * x_ij)`` subject to the
+    dollar-offset, principal, maturity and assignment constraints of swap j
+    alone, with ``delta_j <= delta_upper``.
+
+    Returns
+    -------
+    credits : np.ndarray of int
+        Credits picked for swap j, empty when no solution was found.
+    delta : float
+    bound : float
+        Dual bound on the subproblem's objective, valid even if it was not solved to optimality.
+    """
+    model = _swap_model(j)
+    model.c[:model.delta_col] = multipliers
+    model.c[model.delta_col] = swap_weight
+    model.col_upper[model.delta_col] = delta_upper
+    result = run_milp(model, time_limit=time_limit, mip_gap=mip_gap)
+    bound = getattr(result, 'mip_dual_bound', None)
+    if bound is None or not np.isfinite(bound):
+        bound = result.fun if result.x is not None else 0.0
+    if result.x is None:
+        return np.empty(0, dtype=np.int64), np.nan, float(bound)
+    credits = np.flatnonzero(result.x[:model.delta_col] > 0.5)
+    return credits, float(result.x[model.delta_col]), float(bound)
+
+
+def project_to_simplex(v):
+    """Euclidean projection of ``v`` onto the probability simplex."""
+    u = np.sort(v)[::-1]
+    cumulative = np.cumsum(u) - 1
+    rho = np.flatnonzero(u - cumulative / np.arange(1, len(v) + 1) > 0)[-1]
+    return np.maximum(v - cumulative[rho] / (rho + 1), 0.0)
+
+
+def repair_claims(claims, arrays, time_limit=10, mip_gap=0.01):
+    """
+    Turn per-swap subproblem picks into a compact assignment with unique credits.
+
+    Credits picked by a single swap keep it. A credit picked by several swaps
+    goes to the one with the largest remaining principal deficit, largest
+    credits first. Swaps left infeasible by this are re-optimized together
+    in one sub-MIP over their own and the unassigned credits, with every
+    other swap fixed.
+    """
+    credit_hedge, credit_principal, credit_maturity, credit_principal_maturity, \
+        swap_delta_fv, swap_principal, swap_maturity = arrays
+    num_swaps = len(swap_delta_fv)
+    swap_index = np.full(len(credit_principal), DROPPED, dtype=np.int32)
+
+    claim_count = np.zeros(len(credit_principal), dtype=np.int64)
+    for credits in claims:
+        claim_count[credits] += 1
+    for j, credits in enumerate(claims):
+        swap_index[credits[claim_count[credits] == 1]] = j
+
+    totals = swap_totals(swap_index, credit_hedge, credit_principal, credit_principal_maturity, swap_maturity)
+    deficit = swap_principal - totals['principal']
+    conflicted = np.flatnonzero(claim_count > 1)
+    claim_sets = [set(credits.tolist()) for credits in claims]
+    for i in conflicted[np.argsort(-credit_principal[conflicted], kind='stable')].tolist():
+        claimants = [j for j, credits in enumerate(claim_sets) if i in credits]
+        j = max(claimants, key=lambda k: deficit[k])
+        swap_index[i] = j
+        deficit[j] -= credit_principal[i]
+
+    totals = swap_totals(swap_index, credit_hedge, credit_principal, credit_principal_maturity, swap_maturity)
+    damaged = np.flatnonzero((totals['count'] < 1) | (totals['principal'] < swap_principal - 1e-6)
+                             | (totals['maturity_slack'] < -1e-6))
+    if len(damaged) == 0:
+        return swap_index
+
+    free_credits = np.flatnonzero((swap_index == DROPPED) | np.isin(swap_index, damaged))
+    fixed = swap_index.copy()
+    fixed[free_credits] = DROPPED
+    fixed_totals = swap_totals(fixed, credit_hedge, credit_principal, credit_principal_maturity, swap_maturity)
+    intact = np.setdiff1d(np.arange(num_swaps), damaged)
+    deltas = swap_deltas(fixed_totals['hedge'], swap_delta_fv)
+    sub = build_sparse_arrays(-credit_hedge[free_credits], credit_principal[free_credits],
+                              credit_maturity[free_credits], swap_delta_fv[damaged],
+                              swap_principal[damaged], swap_maturity[damaged],
+                              offsets={k: v[damaged] for k, v in fixed_totals.items()},
+                              delta_lower=float(deltas[intact].max()) if len(intact) else 0.0)
+    result = run_milp(sub, time_limit=time_limit, mip_gap=mip_gap)
+    if result.x is None:
+        return swap_index
+
+    sub_values = np.rint(result.x[:sub.delta_col]).reshape(len(free_credits), len(damaged))
+    assigned = sub_values.max(axis=1) > 0.5
+    fixed[free_credits[assigned]] = damaged[sub_values.argmax(axis=1)[assigned]]
+    return fixed
+
+
+def totals_feasible(totals, swap_principal):
+    """Whether ``swap_totals`` meet every swap's count, principal and maturity constraint."""
+    return bool(np.all(totals['count'] >= 1)
+                and np.all(totals['principal'] >= swap_principal - 1e-6)
+                and np.all(totals['maturity_slack'] >= -1e-6))
+
+
+def gap_closed(upper_bound, lower_bound, mip_gap):
+    return np.isfinite(upper_bound) and upper_bound - lower_bound <= mip_gap * max(upper_bound, 1e-12)
+
+
+def solve_with_lagrangian(credits_df: pd.DataFrame,
+                          swaps_df: pd.DataFrame,
+                          verbose=False,
+                          time_limit=60,
+                          num_cpu=None,
+                          mip_gap=0.01,
+                          experiment_name='First',
+                          assignment_format='compact',
+                          warm_start=True,
+                          max_iterations=50,
+                          step_scale=2.0,
+                          sub_time_limit=10,
+                          repair_time_limit=10):
+    """
+    Lagrangian decomposition of the dollar-offset model by swap.
+
+    The credit assignment rows ``sum_j x_ij <= 1`` are relaxed with multipliers
+    ``lambda_i >= 0`` and ``delta >= delta_j`` with swap weights ``mu_j`` on the
+    simplex, which leaves one independent subproblem per swap (see
+    ``solve_swap_subproblem``). The subproblems of an iteration run in a process
+    pool of ``num_cpu`` workers (one per swap by default, at most the CPU
+    count). The multipliers follow projected subgradient steps with a Polyak
+    step size, ``step_scale`` being halved when the bound stalls. Every
+    iteration's picks are repaired into a unique assignment (``repair_claims``)
+    to update the incumbent, which starts from ``warm_start`` (the greedy
+    assignment by default) if that is feasible. Without a feasible
+    incumbent the subproblems are not capped and the first feasible repaired
+    assignment is taken.
+
+    The search stops after ``max_iterations``, ``time_limit`` seconds (None
+    for no limit) or once the gap between incumbent and bound is within
+    ``mip_gap``. Returns the usual ``(assignment, delta, status, model)``
+    tuple; ``model`` is a ``LagrangianModel`` holding the bound history and
+    ``model.lower_bound``. The status is 'Optimal' when the gap was closed and 'Feasible' otherwise.
+    """
+    start_time = time.perf_counter()
+    model = LagrangianModel()
+
+    credits_df = credits_df.reset_index(drop=True)
+    swaps_df = swaps_df.reset_index(drop=True)
+
+    credit_delta_fv = credits_df['Delta_FV'].to_numpy(dtype=float)
+    credit_principal = credits_df['Principal'].to_numpy(dtype=float)
+    credit_maturity = credits_df['Maturity'].to_numpy(dtype=float)
+    swap_delta_fv = swaps_df['Delta_FV'].to_numpy(dtype=float)
+    swap_principal = swaps_df['Principal'].to_numpy(dtype=float)
+    swap_maturity = swaps_df['Maturity'].to_numpy(dtype=float)
+    credit_hedge = -credit_delta_fv
+    credit_principal_maturity = credit_principal * credit_maturity
+    arrays = (credit_hedge, credit_principal, credit_maturity, credit_principal_maturity,
+              swap_delta_fv, swap_principal, swap_maturity)
+    num_credits = len(credits_df)
+    num_swaps = len(swaps_df)
+
+    if warm_start is None or warm_start is False:
+        warm_start = True
+    incumbent, _ = resolve_warm_start(warm_start, credits_df, swaps_df)
+    incumbent = incumbent.copy()
+    totals = swap_totals(incumbent, credit_hedge, credit_principal, credit_principal_maturity, swap_maturity)
+    # Only a feasible incumbent bounds the search; an infeasible warm start leaves it open
+    if not num_swaps:
+        upper_bound = 0.0
+    elif totals_feasible(totals, swap_principal):
+        upper_bound = float(swap_deltas(totals['hedge'], swap_delta_fv).max())
+    else:
+        upper_bound = np.inf
+    model.timings['heuristic'] = time.perf_counter() - start_time
+
+    multipliers = np.zeros(num_credits)
+    swap_weights = np.full(num_swaps, 1.0 / max(num_swaps, 1))
+    stalled = 0
+
+    def remaining():
+        return np.inf if time_limit is None else time_limit - (time.perf_counter() - start_time)
+
+    instance = (credit_delta_fv, credit_principal, credit_maturity, swap_delta_fv, swap_principal, swap_maturity)
+    if num_cpu is None:
+        num_cpu = min(num_swaps, os.cpu_count() or 1)
+    pool = ProcessPoolExecutor(max_workers=num_cpu, initializer=_init_worker, initargs=instance) \
+        if num_cpu > 1 else None
+    if pool is None:
+        _init_worker(*instance)
+
+    try:
+        while (model.iterations < max_iterations and num_swaps > 0
+               and remaining() > 0
+               and not gap_closed(upper_bound, model.lower_bound, mip_gap)):
+            sub_limit = max(min(sub_time_limit, remaining()), 1e-3)
+            args = [(j, multipliers, swap_weights[j], upper_bound, sub_limit, mip_gap) for j in range(num_swaps)]
+            if pool is None:
+                results = [solve_swap_subproblem(*a) for a in args]
+            else:
+                results = list(pool.map(solve_swap_subproblem, *zip(*args)))
+            model.iterations += 1
+
+            claims = [credits for credits, _, _ in results]
+            sub_deltas = np.array([d for _, d, _ in results])
+            bound = sum(b for _, _, b in results) - multipliers.sum()
+            if bound > model.lower_bound + 1e-12:
+                model.lower_bound = bound
+                stalled = 0
+            else:
+                stalled += 1
+                if stalled >= 3:
+                    step_scale /= 2
+                    stalled = 0
+
+            candidate = repair_claims(claims, arrays, time_limit=max(min(repair_time_limit, remaining()), 1e-3),
+                                      mip_gap=mip_gap)
+            candidate_totals = swap_totals(candidate, credit_hedge, credit_principal, credit_principal_maturity,
+                                           swap_maturity)
+            candidate_delta = float(swap_deltas(candidate_totals['hedge'], swap_delta_fv).max())
+            if totals_feasible(candidate_totals, swap_principal) and candidate_delta < upper_bound:
+                incumbent, totals, upper_bound = candidate, candidate_totals, candidate_delta
+
+            elapsed = time.perf_counter() - start_time
+            model.history.append((elapsed, model.lower_bound, upper_bound))
+            if verbose:
+                print(f"Lagrangian iteration {model.iterations}: bound = {bound:.6f}, "
+                      f"best bound = {model.lower_bound:.6f}, incumbent = {upper_bound:.6f}")
+
+            # Projected subgradient step on (lambda, mu)
+            claim_count = np.zeros(num_credits)
+            for credits in claims:
+                claim_count[credits] += 1
+            credit_subgradient = claim_count - 1
+            # Polyak target: the incumbent, or the repaired candidate while there is none
+            target = upper_bound if np.isfinite(upper_bound) else max(candidate_delta, bound + 1e-6)
+            weight_subgradient = np.nan_to_num(sub_deltas, nan=target)
+            weight_direction = weight_subgradient - weight_subgradient.mean()
+            norm = (np.square(np.maximum(credit_subgradient, -multipliers)).sum()
+                    + np.square(weight_direction).sum())
+            if norm <= 0:
+                break
+            step = step_scale * (target - bound) / norm
+            multipliers = np.maximum(multipliers + step * credit_subgradient, 0.0)
+            swap_weights = project_to_simplex(swap_weights + step * weight_subgradient)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    model.multipliers = multipliers
+    model.swap_weights = swap_weights
+    model.swap_index = incumbent
+    model.timings['search'] = time.perf_counter() - start_time - model.timings['heuristic']
+
+    if not totals_feasible(totals, swap_principal):
+        return None, None, 'Not Solved', model
+
+    closed = gap_closed(upper_bound, model.lower_bound, mip_gap)
+    assignment = format_assignment(swap_index_matrix(incumbent, num_swaps), assignment_format)
+    return assignment, upper_bound, 'Optimal' if closed else 'Feasible', model
@@ -0,0 +1,190 @@
+import time
+import numpy as np
+import pandas as pd
+
+from utils.solvers.assignment_utils import DROPPED, format_assignment, swap_index_matrix
+from utils.solvers.heuristics import resolve_warm_start
+from utils.solvers.mip_drop_highs import build_sparse_arrays, run_milp
+
+
+class LNSModel:
+    """
+    Record of a large-neighborhood-search run.
+
+    ``history`` holds one ``(seconds, delta)`` entry per improvement of the
+    incumbent, starting with the initial assignment; ``iterations`` counts the
+    sub-MIPs solved.
+    """
+
+    def __init__(self):
+        self.history = []
+        self.iterations = 0
+        self.improvements = 0
+        self.timings = {}
+
+    def history_df(self):
+        return pd.DataFrame(self.history, columns=['Seconds', 'Delta'])
+
+
+def swap_totals(swap_index, credit_hedge, credit_principal, credit_principal_maturity, swap_maturity):
+    """
+    Per-swap hedge, principal, maturity slack and credit count of a compact assignment.
+
+    The maturity slack is ``sum(P_i * (M_i - M_j))``, non-negative when the
+    weighted maturity meets the swap's.
+    """
+    num_swaps = len(swap_maturity)
+    assigned = swap_index >= 0
+    idx = swap_index[assigned]
+    hedge = np.bincount(idx, weights=credit_hedge[assigned], minlength=num_swaps)
+    principal = np.bincount(idx, weights=credit_principal[assigned], minlength=num_swaps)
+    principal_maturity = np.bincount(idx, weights=credit_principal_maturity[assigned], minlength=num_swaps)
+    count = np.bincount(idx, minlength=num_swaps).astype(float)
+    return {'hedge': hedge,
+            'principal': principal,
+            'maturity_slack': principal_maturity - swap_maturity * principal,
+            'count': count}
+
+
+def swap_deltas(hedge, swap_delta_fv):
+    """``|r_j - 1|`` per swap, 0 for swaps without a Delta_FV target."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(np.isclose(swap_delta_fv, 0.0), 0.0, np.abs(hedge / swap_delta_fv - 1))
+
+
+def solve_with_lns(credits_df: pd.DataFrame,
+                   swaps_df: pd.DataFrame,
+                   verbose=False,
+                   time_limit=60,
+                   num_cpu=None,
+                   mip_gap=0.01,
+                   export=False,
+                   experiment_name='First',
+                   assignment_format='compact',
+                   warm_start=True,
+                   neighborhood_credits=2000,
+                   neighborhood_swaps=2,
+                   sub_time_limit=10,
+                   random_seed=42,
+                   max_stall=None):
+    """
+    Large-neighborhood search for portfolios too large for the monolithic MIP.
+
+    Starting from ``warm_start`` (the greedy assignment unless a compact swap
+    index is given), each iteration frees the worst swap plus random
+    others (``neighborhood_swaps`` in total). Up to ``neighborhood_credits``
+    credits are then re-optimized: some of those assigned to the freed swaps
+    and some of the dropped ones. They go through a sub-MIP with the same
+    formulation, solved in-process by HiGHS. Every other assignment stays
+    fixed and enters the sub-MIP as right-hand-side offsets. Improvements are
+    kept until ``time_limit`` seconds have passed (None for no limit) or
+    ``max_stall`` iterations in a row found no improvement; without a time
+    limit ``max_stall`` defaults to 20, so the search always ends.
+    ``mip_gap`` applies to the sub-MIPs; ``num_cpu`` and ``export`` are
+    accepted for signature compatibility only.
+
+    Returns the usual ``(assignment, delta, status, model)`` tuple; ``model`` is
+    an ``LNSModel`` with the incumbent delta over time. The status is
+    'Feasible' when the incumbent meets every constraint, otherwise the
+    assignment is not returned and the status is 'Not Solved'.
+    """
+    start_time = time.perf_counter()
+    model = LNSModel()
+    rng = np.random.default_rng(random_seed)
+
+    credits_df = credits_df.reset_index(drop=True)
+    swaps_df = swaps_df.reset_index(drop=True)
+
+    credit_delta_fv = credits_df['Delta_FV'].to_numpy(dtype=float)
+    credit_principal = credits_df['Principal'].to_numpy(dtype=float)
+    credit_maturity = credits_df['Maturity'].to_numpy(dtype=float)
+    credit_hedge = -credit_delta_fv
+    credit_principal_maturity = credit_principal * credit_maturity
+    swap_delta_fv = swaps_df['Delta_FV'].to_numpy(dtype=float)
+    swap_principal = swaps_df['Principal'].to_numpy(dtype=float)
+    swap_maturity = swaps_df['Maturity'].to_numpy(dtype=float)
+    num_swaps = len(swaps_df)
+
+    # The search always needs a starting assignment
+    if warm_start is None or warm_start is False:
+        warm_start = True
+    incumbent, _ = resolve_warm_start(warm_start, credits_df, swaps_df)
+    incumbent = incumbent.copy()
+    totals = swap_totals(incumbent, credit_hedge, credit_principal, credit_principal_maturity, swap_maturity)
+    deltas = swap_deltas(totals['hedge'], swap_delta_fv)
+    best_delta = float(deltas.max()) if num_swaps else 0.0
+    model.timings['heuristic'] = time.perf_counter() - start_time
+    model.history.append((model.timings['heuristic'], best_delta))
+
+    if max_stall is None and time_limit is None:
+        max_stall = 20
+
+    def remaining():
+        return np.inf if time_limit is None else time_limit - (time.perf_counter() - start_time)
+
+    stall = 0
+    while remaining() > 0 and num_swaps > 0 and (max_stall is None or stall < max_stall):
+        # Neighborhood: the worst swap plus random others, some of their credits and some dropped ones
+        worst = int(np.argmax(deltas))
+        others = np.setdiff1d(np.arange(num_swaps), [worst])
+        extra = rng.choice(others, size=min(neighborhood_swaps - 1, len(others)), replace=False)
+        free_swaps = np.concatenate([[worst], extra]).astype(int)
+
+        in_free_swaps = np.flatnonzero(np.isin(incumbent, free_swaps))
+        dropped = np.flatnonzero(incumbent == DROPPED)
+        take_dropped = min(len(dropped), neighborhood_credits // 2)
+        take_assigned = min(len(in_free_swaps), neighborhood_credits - take_dropped)
+        take_dropped = min(len(dropped), neighborhood_credits - take_assigned)
+        free_credits = np.concatenate([rng.choice(in_free_swaps, size=take_assigned, replace=False),
+                                       rng.choice(dropped, size=take_dropped, replace=False)])
+
+        fixed = incumbent.copy()
+        fixed[free_credits] = DROPPED
+        fixed_totals = swap_totals(fixed, credit_hedge, credit_principal, credit_principal_maturity,
+                                   swap_maturity)
+        other_swaps = np.setdiff1d(np.arange(num_swaps), free_swaps)
+        delta_floor = float(deltas[other_swaps].max()) if len(other_swaps) else 0.0
+
+        sub = build_sparse_arrays(credit_delta_fv[free_credits], credit_principal[free_credits],
+                                  credit_maturity[free_credits], swap_delta_fv[free_swaps],
+                                  swap_principal[free_swaps], swap_maturity[free_swaps],
+                                  offsets={k: v[free_swaps] for k, v in fixed_totals.items()},
+                                  delta_lower=delta_floor)
+        result = run_milp(sub, verbose=verbose, time_limit=max(min(sub_time_limit, remaining()), 1e-3),
+                          mip_gap=mip_gap)
+        model.iterations += 1
+        stall += 1
+        if result.x is None:
+            continue
+
+        sub_values = np.rint(result.x[:sub.delta_col]).reshape(len(free_credits), len(free_swaps))
+        candidate = fixed
+        chosen = sub_values.argmax(axis=1)
+        assigned = sub_values.max(axis=1) > 0.5
+        candidate[free_credits[assigned]] = free_swaps[chosen[assigned]]
+
+        candidate_totals = swap_totals(candidate, credit_hedge, credit_principal, credit_principal_maturity,
+                                       swap_maturity)
+        candidate_deltas = swap_deltas(candidate_totals['hedge'], swap_delta_fv)
+        if candidate_deltas.max() <= best_delta + 1e-12:
+            improved = candidate_deltas.max() < best_delta - 1e-12
+            incumbent, totals, deltas = candidate, candidate_totals, candidate_deltas
+            best_delta = float(deltas.max())
+            if improved:
+                stall = 0
+                model.improvements += 1
+                model.history.append((time.perf_counter() - start_time, best_delta))
+                if verbose:
+                    print(f"LNS iteration {model.iterations}: delta = {best_delta:.6f}")
+
+    model.timings['search'] = time.perf_counter() - start_time - model.timings['heuristic']
+    model.swap_index = incumbent
+
+    feasible = (np.all(totals['count'] >= 1)
+                and np.all(totals['principal'] >= swap_principal - 1e-6)
+                and np.all(totals['maturity_slack'] >= -1e-6))
+    if not feasible:
+        return None, None, 'Not Solved', model
+
+    assignment = format_assignment(swap_index_matrix(incumbent, num_swaps), assignment_format)
+    return assignment, best_delta, 'Feasible', model
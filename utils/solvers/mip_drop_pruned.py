@@ -0,0 +1,283 @@
+import time
+import numpy as np
+import pandas as pd
+from scipy.optimize import linprog
+from scipy.sparse import vstack
+
+from utils.data_generation.instance_store import as_frame
+from utils.solvers.assignment_utils import DROPPED, format_assignment, swap_index_matrix
+from utils.solvers.heuristics import resolve_warm_start
+from utils.solvers.mip_drop_highs import build_sparse_arrays, milp_status_mapping, run_milp
+from utils.solvers.solve_stats import SolveStats
+
+# Reduced cost below which a pruned column is priced back in
+PRICING_TOLERANCE = 1e-9
+
+
+class PruningModel:
+    """
+    Record of a solve over a pruned support of (credit, swap) pairs.
+
+    ``support`` holds the credit and swap positions of the final x columns
+    and ``rounds`` one ``(support size, LP objective, columns added)`` entry
+    per pricing round. ``model`` is the final ``SparseModel``.
+    """
+
+    def __init__(self):
+        self.support = None
+        self.rounds = []
+        self.model = None
+        self.stats = SolveStats('HiGHS')
+        self.timings = self.stats.timings
+
+    def rounds_df(self):
+        return pd.DataFrame(self.rounds, columns=['Support_Size', 'LP_Objective', 'Columns_Added'])
+
+
+def candidate_scores(credit_hedge, credit_principal, credit_maturity, swap_delta_fv, swap_principal,
+                     swap_maturity):
+    """
+    Fit of every credit to every swap; lower is better.
+
+    The relative distance between the credit's hedge per unit of principal
+    and the swap's Delta_FV per unit of principal, plus the relative
+    maturity shortfall of the credit against the swap.
+
+    Returns
+    -------
+    np.ndarray of shape (num_credits, num_swaps)
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        credit_ratio = np.where(credit_principal > 0, credit_hedge / credit_principal, 0.0)
+        swap_ratio = np.where(swap_principal > 0, swap_delta_fv / swap_principal, 0.0)
+        ratio_gap = np.abs(credit_ratio[:, np.newaxis] - swap_ratio) / np.maximum(np.abs(swap_ratio), 1e-12)
+        shortfall = np.maximum(swap_maturity - credit_maturity[:, np.newaxis], 0.0) / np.maximum(swap_maturity,
+                                                                                                 1e-12)
+    return ratio_gap + shortfall
+
+
+def top_k_support(credit_hedge, credit_principal, credit_maturity, swap_delta_fv, swap_principal, swap_maturity,
+                  k, chunk_size=100_000):
+    """
+    Pair ids ``i * num_swaps + j`` of the ``k`` best-scoring swaps of every credit.
+
+    Scores are computed ``chunk_size`` credits at a time, so the full
+    credits x swaps matrix is never held.
+    """
+    num_credits, num_swaps = len(credit_hedge), len(swap_delta_fv)
+    k = min(k, num_swaps)
+    ids = []
+    for start in range(0, num_credits, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        scores = candidate_scores(credit_hedge[chunk], credit_principal[chunk], credit_maturity[chunk],
+                                  swap_delta_fv, swap_principal, swap_maturity)
+        best = np.argpartition(scores, k - 1, axis=1)[:, :k] if k < num_swaps else \
+            np.broadcast_to(np.arange(num_swaps), scores.shape)
+        credits = np.arange(start, start + len(scores))[:, np.newaxis]
+        ids.append((credits * num_swaps + best).ravel())
+    return np.unique(np.concatenate(ids)) if ids else np.zeros(0, dtype=np.int64)
+
+
+def lp_duals(model):
+    """
+    Solve the LP relaxation of a ``SparseModel`` and return ``(result, row_duals)``.
+
+    ``row_duals`` follow the sign convention ``reduced cost = c - A^T y``;
+    they are None when the LP has no optimal solution.
+    """
+    upper = np.isfinite(model.row_upper)
+    lower = np.isfinite(model.row_lower)
+    A_ub = vstack([model.A[upper], -model.A[lower]]).tocsr()
+    b_ub = np.concatenate([model.row_upper[upper], -model.row_lower[lower]])
+    result = linprog(model.c, A_ub=A_ub, b_ub=b_ub, bounds=np.column_stack([model.col_lower, model.col_upper]),
+                     method='highs')
+    if result.status != 0:
+        return result, None
+    marginals = result.ineqlin.marginals
+    y = np.zeros(model.A.shape[0])
+    y[upper] += marginals[:upper.sum()]
+    y[lower] -= marginals[upper.sum():]
+    return result, y
+
+
+def reduced_costs(y, credit_hedge, credit_principal, credit_principal_maturity, swap_maturity, credits):
+    """
+    Reduced costs of the x columns of ``credits`` for every swap, given the row duals ``y``.
+
+    Rows follow the ``SparseModel`` layout; x has no objective cost.
+
+    Returns
+    -------
+    np.ndarray of shape (len(credits), num_swaps)
+    """
+    S = len(swap_maturity)
+    y_upper, y_lower, y_count, y_principal, y_maturity = (y[b * S:(b + 1) * S] for b in range(5))
+    y_credit = y[5 * S:][credits]
+    hedge = credit_hedge[credits][:, np.newaxis]
+    principal = credit_principal[credits][:, np.newaxis]
+    column_dot = (hedge * (y_upper + y_lower) + y_count + principal * y_principal
+                  + (credit_principal_maturity[credits][:, np.newaxis] - principal * swap_maturity) * y_maturity
+                  + y_credit[:, np.newaxis])
+    return -column_dot
+
+
+def solve_with_pruning(credits_df: pd.DataFrame,
+                       swaps_df: pd.DataFrame,
+                       verbose=False,
+                       time_limit=None,
+                       num_cpu=None,
+                       mip_gap=0.01,
+                       experiment_name='First',
+                       assignment_format='compact',
+                       candidates_per_credit=2,
+                       candidates='score',
+                       warm_start=True,
+                       max_pricing_rounds=5,
+                       pricing_time_share=0.5,
+                       chunk_size=100_000):
+    """
+    Solve the dollar-offset model with HiGHS over a pruned support of x_ij.
+
+    Every credit keeps only ``candidates_per_credit`` candidate swaps: the
+    best by ``candidate_scores`` (``candidates='score'``), or those plus the
+    pairs used by the full LP relaxation (``candidates='lp'``, which builds
+    the full product once). The pairs of ``warm_start`` (the greedy
+    assignment by default) are always kept. The LP relaxation over the
+    support is then priced: every credit gets back its pruned column with
+    the most negative reduced cost, if any, until no such column is left,
+    ``max_pricing_rounds`` is reached or pricing has used
+    ``pricing_time_share`` of ``time_limit``. The MIP is finally solved over
+    the remaining time and the support, so model
+    memory and solve time follow the number of candidates instead of
+    credits x swaps. When the restricted LP or MIP is infeasible, the
+    candidates per credit are doubled and the search restarts.
+
+    Pricing only runs at the root LP; a pruned column that would help
+    deeper in the tree is not recovered, so the result is a heuristic
+    solution, reported as 'Feasible' unless the support kept every pair.
+    ``num_cpu`` is accepted for signature compatibility only.
+
+    Returns the usual ``(assignment, delta, status, model)`` tuple; ``model``
+    is a ``PruningModel``.
+    """
+    start_time = time.perf_counter()
+    pruning = PruningModel()
+    timings = pruning.timings
+
+    credits_df = as_frame(credits_df).reset_index(drop=True)
+    swaps_df = as_frame(swaps_df).reset_index(drop=True)
+    credit_delta_fv = credits_df['Delta_FV'].to_numpy(dtype=float)
+    credit_principal = credits_df['Principal'].to_numpy(dtype=float)
+    credit_maturity = credits_df['Maturity'].to_numpy(dtype=float)
+    credit_hedge = -credit_delta_fv
+    credit_principal_maturity = credit_principal * credit_maturity
+    swap_delta_fv = swaps_df['Delta_FV'].to_numpy(dtype=float)
+    swap_principal = swaps_df['Principal'].to_numpy(dtype=float)
+    swap_maturity = swaps_df['Maturity'].to_numpy(dtype=float)
+    num_credits, num_swaps = len(credits_df), len(swaps_df)
+    credit_arrays = (credit_delta_fv, credit_principal, credit_maturity)
+    swap_arrays = (swap_delta_fv, swap_principal, swap_maturity)
+
+    # Candidates: best-scoring swaps, the warm start's pairs and optionally the full LP's support
+    start = time.perf_counter()
+    warm_index, _ = resolve_warm_start(warm_start, credits_df, swaps_df)
+    base_ids = np.zeros(0, dtype=np.int64)
+    if warm_index is not None:
+        assigned = np.flatnonzero(warm_index != DROPPED)
+        base_ids = assigned * num_swaps + warm_index[assigned]
+    if candidates == 'lp':
+        full_lp, _ = lp_duals(build_sparse_arrays(*credit_arrays, *swap_arrays))
+        if full_lp.x is not None:
+            base_ids = np.union1d(base_ids, np.flatnonzero(full_lp.x[:num_credits * num_swaps] > 1e-6))
+    elif candidates != 'score':
+        raise ValueError(f"Unknown candidates '{candidates}', expected 'score' or 'lp'.")
+    timings['candidates'] = time.perf_counter() - start
+
+    def remaining():
+        return None if time_limit is None else max(time_limit - (time.perf_counter() - start_time), 1e-3)
+
+    k = candidates_per_credit
+    result, model, pricing_time = None, None, 0.0
+    while True:
+        start = time.perf_counter()
+        support_ids = np.union1d(base_ids, top_k_support(credit_hedge, credit_principal, credit_maturity,
+                                                         *swap_arrays, k, chunk_size=chunk_size))
+        pruning.rounds = []
+        lp_feasible = False
+        for _ in range(max_pricing_rounds):
+            model = build_sparse_arrays(*credit_arrays, *swap_arrays,
+                                        support=(support_ids // num_swaps, support_ids % num_swaps))
+            lp, y = lp_duals(model)
+            if y is None:
+                break
+            lp_feasible = True
+
+            # Price the pruned columns credit chunk by credit chunk, keeping each credit's best
+            new_ids = []
+            for chunk_start in range(0, num_credits, chunk_size):
+                credits = np.arange(chunk_start, min(chunk_start + chunk_size, num_credits))
+                costs = reduced_costs(y, credit_hedge, credit_principal, credit_principal_maturity,
+                                      swap_maturity, credits)
+                ids = credits[:, np.newaxis] * num_swaps + np.arange(num_swaps)
+                costs[np.isin(ids, support_ids, assume_unique=True)] = 0.0
+                best = costs.argmin(axis=1)
+                rows = np.arange(len(credits))
+                new_ids.append(ids[rows, best][costs[rows, best] < -PRICING_TOLERANCE])
+            new_ids = np.concatenate(new_ids)
+            pruning.rounds.append((len(support_ids), float(lp.fun), len(new_ids)))
+            if verbose:
+                print(f"Pricing: {len(support_ids)} columns, LP delta {lp.fun:.6f}, {len(new_ids)} added")
+            if len(new_ids) == 0 or (time_limit is not None and time.perf_counter() - start_time
+                                     >= pricing_time_share * time_limit):
+                break
+            support_ids = np.union1d(support_ids, new_ids)
+        pricing_time += time.perf_counter() - start
+
+        if lp_feasible:
+            start = time.perf_counter()
+            model = build_sparse_arrays(*credit_arrays, *swap_arrays,
+                                        support=(support_ids // num_swaps, support_ids % num_swaps))
+            result = run_milp(model, verbose=verbose, time_limit=remaining(), mip_gap=mip_gap)
+            timings['solve'] = timings.get('solve', 0.0) + time.perf_counter() - start
+            if result.x is not None:
+                break
+        out_of_time = time_limit is not None and time.perf_counter() - start_time >= time_limit
+        if k >= num_swaps or out_of_time:
+            break
+        k = min(2 * k, num_swaps)
+        if verbose:
+            print(f"Restricted model infeasible, widening to {k} candidate swaps per credit")
+    timings['pricing'] = pricing_time
+    timings.setdefault('solve', 0.0)
+
+    pruning.model = model
+    pruning.support = model.support
+    stats = pruning.stats
+    stats.num_rows, stats.num_cols = model.A.shape
+    stats.num_nonzeros = model.A.nnz
+    if result is None or result.x is None:
+        stats.status = "Not Solved"
+        timings['extract'] = 0.0
+        stats.finish()
+        return None, None, stats.status, pruning
+
+    start = time.perf_counter()
+    status_str = milp_status_mapping.get(result.status, "Undefined")
+    # Optimality over the support proves nothing about the full model once columns were pruned
+    if status_str == "Optimal" and len(model.support[0]) < num_credits * num_swaps:
+        status_str = "Feasible"
+    stats.status = status_str
+    stats.mip_gap = getattr(result, 'mip_gap', None)
+    stats.record(timings['solve'], result.fun, getattr(result, 'mip_dual_bound', np.nan))
+    values = np.rint(result.x[:model.delta_col])
+    swap_index = np.full(num_credits, DROPPED, dtype=np.int32)
+    chosen = values > 0.5
+    swap_index[model.support[0][chosen]] = model.support[1][chosen]
+    pruning.swap_index = swap_index
+    if assignment_format == 'compact':
+        assignment = swap_index
+    else:
+        assignment = format_assignment(swap_index_matrix(swap_index, num_swaps), assignment_format)
+    timings['extract'] = time.perf_counter() - start
+    stats.finish()
+    return assignment, float(result.x[model.delta_col]), status_str, pruning
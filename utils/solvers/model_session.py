@@ -0,0 +1,263 @@
+import abc
+import time
+import numpy as np
+import pandas as pd
+
+from utils.solvers.assignment_utils import DROPPED, assignment_matrix, format_assignment, swap_index_from_matrix
+from utils.solvers.heuristics import assignment_delta, resolve_warm_start
+
+SWAP_TARGET_COLUMNS = ('Principal', 'Delta_FV', 'Maturity')
+
+
+class HedgeModel(abc.ABC):
+    """
+    Dollar-offset model built once and re-solved under changing settings.
+
+    Parameter sweeps (``mip_gap``, ``time_limit``, threads, CPLEX
+    presolve/reduce), new swap targets and fixed or excluded credits are
+    applied to the existing model instead of rebuilding it from the frames.
+    Every solve starts from the previous solution (the greedy assignment on
+    the first one).
+
+    Use ``CbcHedgeModel`` or ``CplexHedgeModel``, or ``hedge_model`` to pick
+    one by solver name.
+    """
+
+    def __init__(self, credits_df: pd.DataFrame, swaps_df: pd.DataFrame):
+        start = time.perf_counter()
+        self.credits_df = credits_df.reset_index(drop=True)
+        self.swaps_df = swaps_df.reset_index(drop=True).copy()
+        self.num_credits = len(self.credits_df)
+        self.num_swaps = len(self.swaps_df)
+        self.swap_index = None
+        self.delta = None
+        self.solves = 0
+        self.build()
+        self.build_time = time.perf_counter() - start
+
+    @abc.abstractmethod
+    def build(self):
+        """Build the solver model from ``self.credits_df`` and ``self.swaps_df``."""
+
+    @abc.abstractmethod
+    def update_swap(self, j):
+        """Push the targets in ``self.swaps_df.loc[j]`` into the model."""
+
+    @abc.abstractmethod
+    def set_bounds(self, lower, upper):
+        """Set the (num_credits, num_swaps) bounds of the assignment variables."""
+
+    @abc.abstractmethod
+    def run(self, warm_index, warm_delta, **params):
+        """Solve the model; returns ``(values, delta, status)`` with ``values`` None if unsolved."""
+
+    def set_swap_targets(self, swap_targets):
+        """
+        Change swap targets in place.
+
+        ``swap_targets`` is a frame or dict of per-swap 'Principal', 'Delta_FV'
+        and/or 'Maturity' values, in swap order. Only swaps whose targets
+        actually change are touched in the model.
+        """
+        targets = pd.DataFrame(swap_targets).reset_index(drop=True)
+        unknown = set(targets.columns) - set(SWAP_TARGET_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown swap target columns {sorted(unknown)}, "
+                             f"expected a subset of {SWAP_TARGET_COLUMNS}.")
+        if len(targets) != self.num_swaps:
+            raise ValueError(f"Expected targets for {self.num_swaps} swaps, got {len(targets)}.")
+
+        columns = list(targets.columns)
+        old = self.swaps_df[columns].to_numpy(dtype=float)
+        new = targets[columns].to_numpy(dtype=float)
+        self.swaps_df[columns] = new
+        for j in np.flatnonzero((old != new).any(axis=1)).tolist():
+            self.update_swap(j)
+
+    def solve(self, swap_targets=None, fixed=None, excluded=None, warm_start=True,
+              assignment_format='compact', **params):
+        """
+        Re-solve the session's model.
+
+        Parameters
+        ----------
+        swap_targets : pd.DataFrame or dict, optional
+            New swap targets, see ``set_swap_targets``. They stay in effect
+            for later solves.
+        fixed : dict or array-like, optional
+            ``{credit: swap}`` assignments, or ``(credit, swap)`` pairs,
+            forced in this solve only.
+        excluded : array-like of int, optional
+            Credits left unassigned in this solve only.
+        warm_start : bool or array-like, default=True
+            ``True`` starts from the previous solution (the greedy assignment
+            before the first solve), adjusted to ``fixed`` and ``excluded``;
+            a compact swap index can be given instead; ``False`` disables it.
+        **params
+            Solver settings of ``solve_with_cbc`` / ``solve_with_cplex``,
+            e.g. ``time_limit``, ``num_cpu``, ``mip_gap``.
+
+        Returns the usual ``(assignment, delta, status, model)`` tuple, the
+        model being the underlying solver model with ``timings``.
+        """
+        timings = {}
+        start = time.perf_counter()
+        if swap_targets is not None:
+            self.set_swap_targets(swap_targets)
+
+        lower = np.zeros((self.num_credits, self.num_swaps), dtype=np.int8)
+        upper = np.ones((self.num_credits, self.num_swaps), dtype=np.int8)
+        if fixed is None:
+            fixed = []
+        elif hasattr(fixed, 'items'):
+            fixed = list(fixed.items())
+        fixed_credits, fixed_swaps = np.asarray(fixed, dtype=int).reshape(-1, 2).T
+        excluded = np.unique(np.asarray(excluded if excluded is not None else [], dtype=int))
+        upper[excluded] = 0
+        upper[fixed_credits] = 0
+        upper[fixed_credits, fixed_swaps] = 1
+        lower[fixed_credits, fixed_swaps] = 1
+        self.set_bounds(lower, upper)
+        timings['update'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if warm_start is True and self.swap_index is not None:
+            warm_start = self.swap_index
+        warm_index, _ = resolve_warm_start(warm_start, self.credits_df, self.swaps_df)
+        warm_delta = None
+        if warm_index is not None:
+            warm_index = warm_index.copy()
+            warm_index[excluded] = DROPPED
+            warm_index[fixed_credits] = fixed_swaps
+            warm_delta = assignment_delta(warm_index, self.credits_df['Delta_FV'].to_numpy(dtype=float),
+                                          self.swaps_df['Delta_FV'].to_numpy(dtype=float))
+        timings['heuristic'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        values, delta_val, status_str = self.run(warm_index, warm_delta, **params)
+        self.solves += 1
+        timings['solve'] = time.perf_counter() - start
+
+        self.model.warm_start_delta = warm_delta
+        self.model.timings = timings
+        if values is None:
+            timings['extract'] = 0.0
+            return None, None, status_str, self.model
+
+        start = time.perf_counter()
+        matrix = assignment_matrix(values, self.num_credits, self.num_swaps)
+        self.swap_index = swap_index_from_matrix(matrix)
+        self.delta = delta_val
+        assignment = format_assignment(matrix, assignment_format)
+        timings['extract'] = time.perf_counter() - start
+        return assignment, delta_val, status_str, self.model
+
+
+class CbcHedgeModel(HedgeModel):
+    """``HedgeModel`` on the PuLP/CBC model of ``build_cbc_model``."""
+
+    def build(self):
+        from utils.solvers.mip_drop_cbc import build_cbc_model
+        self.model, self.x, self.delta_var = build_cbc_model(self.credits_df, self.swaps_df)
+        self.variables = [v for row in self.x for v in row]
+
+    def constraint(self, name):
+        # PuLP 3 keeps the terms on ``.expr``; older constraints are expressions themselves
+        if hasattr(self.model, 'get_constraint_by_name'):
+            constraint = self.model.get_constraint_by_name(name)
+        else:
+            constraint = self.model.constraints[name]
+        return constraint, getattr(constraint, 'expr', constraint)
+
+    def update_swap(self, j):
+        swap = self.swaps_df.loc[j]
+        for name, sign in ((f"Dollar_Offset_Upper_{j}", -1.0), (f"Dollar_Offset_Lower_{j}", 1.0)):
+            constraint, terms = self.constraint(name)
+            terms[self.delta_var] = sign * swap['Delta_FV']
+            constraint.changeRHS(swap['Delta_FV'])
+
+        constraint, _ = self.constraint(f"Principal_Swap_{j}")
+        constraint.changeRHS(swap['Principal'])
+
+        _, terms = self.constraint(f"Maturity_Swap_{j}")
+        principal = self.credits_df['Principal'].to_numpy(dtype=float)
+        maturity_coefs = principal * (self.credits_df['Maturity'].to_numpy(dtype=float) - swap['Maturity'])
+        for row, coef in zip(self.x, maturity_coefs.tolist()):
+            terms[row[j]] = coef
+
+    def set_bounds(self, lower, upper):
+        for v, lb, ub in zip(self.variables, lower.ravel().tolist(), upper.ravel().tolist()):
+            v.lowBound = lb
+            v.upBound = ub
+
+    def run(self, warm_index, warm_delta, verbose=False, time_limit=None, num_cpu=None, mip_gap=0.01):
+        from pulp import LpStatus, value, PULP_CBC_CMD
+        if warm_index is not None:
+            for row, j in zip(self.x, warm_index.tolist()):
+                for k, v in enumerate(row):
+                    v.setInitialValue(1 if k == j else 0)
+            self.delta_var.setInitialValue(warm_delta)
+
+        solver = PULP_CBC_CMD(msg=verbose, timeLimit=time_limit, threads=num_cpu, gapRel=mip_gap,
+                              warmStart=warm_index is not None)
+        self.model.solve(solver)
+        status_str = LpStatus[self.model.status]
+        if status_str not in ['Optimal', 'Feasible']:
+            return None, None, status_str
+        values = np.fromiter((v.varValue or 0.0 for v in self.variables), dtype=float, count=len(self.variables))
+        return values, float(value(self.delta_var)), status_str
+
+
+class CplexHedgeModel(HedgeModel):
+    """``HedgeModel`` on the docplex model of ``build_cplex_model``."""
+
+    def __init__(self, credits_df: pd.DataFrame, swaps_df: pd.DataFrame, precision=4):
+        self.precision = precision
+        super().__init__(credits_df, swaps_df)
+
+    def build(self):
+        from utils.solvers.mip_drop_cplex import build_cplex_model, credit_coefficients
+        self.model, self.x, self.delta_var = build_cplex_model(self.credits_df, self.swaps_df,
+                                                               precision=self.precision)
+        self.variables = [self.x[i, j] for i in range(self.num_credits) for j in range(self.num_swaps)]
+        self.coefs = credit_coefficients(self.credits_df, self.precision)
+
+    def update_swap(self, j):
+        from utils.solvers.mip_drop_cplex import SWAP_CONSTRAINT_NAMES, swap_constraints
+        names = [name.format(j=j) for name in SWAP_CONSTRAINT_NAMES]
+        self.model.remove_constraints([self.model.get_constraint_by_name(name) for name in names])
+        column = [self.x[i, j] for i in range(self.num_credits)]
+        self.model.add_constraints(swap_constraints(self.model, column, self.delta_var, self.coefs,
+                                                    self.swaps_df.loc[j], self.precision), names)
+
+    def set_bounds(self, lower, upper):
+        for v, lb, ub in zip(self.variables, lower.ravel().tolist(), upper.ravel().tolist()):
+            v.lb = lb
+            v.ub = ub
+
+    def run(self, warm_index, warm_delta, time_limit=None, num_cpu=None, mip_gap=0.01, rel_tol=1e-6,
+            abs_tol=1e-6, presolve=0, reduce=0, verbose=False):
+        from docplex.mp.solution import SolveSolution
+        from utils.solvers.mip_drop_cplex import configure_cplex, cplex_status_mapping
+        configure_cplex(self.model, time_limit=time_limit, num_cpu=num_cpu, mip_gap=mip_gap, rel_tol=rel_tol,
+                        abs_tol=abs_tol, presolve=presolve, reduce=reduce)
+        self.model.clear_mip_starts()
+        if warm_index is not None:
+            start_values = {self.x[i, j]: 1 for i, j in enumerate(warm_index.tolist()) if j >= 0}
+            start_values[self.delta_var] = warm_delta
+            self.model.add_mip_start(SolveSolution(self.model, start_values), complete_vars=True)
+
+        solution = self.model.solve(log_output=verbose)
+        status_str = cplex_status_mapping[self.model.solve_details.status_code]
+        if solution is None:
+            return None, None, status_str
+        return np.asarray(solution.get_values(self.variables), dtype=float), solution[self.delta_var], status_str
+
+
+def hedge_model(credits_df: pd.DataFrame, swaps_df: pd.DataFrame, solver='cbc', **kwargs):
+    """Build a ``HedgeModel`` session for 'cbc' or 'cplex'."""
+    if solver == 'cbc':
+        return CbcHedgeModel(credits_df, swaps_df, **kwargs)
+    if solver == 'cplex':
+        return CplexHedgeModel(credits_df, swaps_df, **kwargs)
+    raise ValueError(f"Unknown solver '{solver}', expected 'cbc' or 'cplex'.")
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from utils.data_generation.instance_store import as_frame
+from utils.solvers.assignment_utils import format_assignment, swap_index_matrix
+from utils.solvers.backends import BACKENDS, get_backend
+from utils.solvers.solve_stats import SolveStats
+
+# Arguments that do not change the solution and are left out of the cache key
+IGNORED_PARAMS = ('verbose', 'export', 'experiment_name', 'assignment_format', 'warm_start')
+
+# Statuses proving the returned assignment optimal within the MIP gap
+PROVEN_STATUSES = {
+    'cbc': ('Optimal',),
+    'cplex': ('CPX_STAT_OPTIMAL', 'CPXMIP_OPTIMAL', 'CPXMIP_OPTIMAL_TOL'),
+    'highs': ('Optimal',),
+}
+
+# Solvers that accept a compact swap index as warm_start
+WARM_START_SOLVERS = tuple(name for name, backend in BACKENDS.items() if backend.warm_start)
+
+
+def resolve_solver(solver_name):
+    """Import the solve function of a registered backend ('cbc', 'cplex', 'highs', ...) on demand."""
+    return get_backend(solver_name).load()
+
+
+def instance_key(credits_df: pd.DataFrame, swaps_df: pd.DataFrame, solver_name, params):
+    """
+    SHA-256 of an instance and the solver settings.
+
+    Every numeric column of both frames is hashed positionally with its name
+    and dtype, so the key does not depend on the frames' index or on
+    non-numeric columns (e.g. 'Credit_Type'). The frames may also be
+    mappings of column arrays (see ``as_frame``). ``params`` are the solver's
+    keyword arguments; those in ``IGNORED_PARAMS`` are skipped.
+    """
+    digest = hashlib.sha256()
+    for name, frame in (('credits', credits_df), ('swaps', swaps_df)):
+        numeric = as_frame(frame).select_dtypes(include='number')
+        digest.update(f"{name}:{len(numeric)}".encode())
+        for column in numeric.columns:
+            values = np.ascontiguousarray(numeric[column].to_numpy())
+            digest.update(f"{column}:{values.dtype.str}".encode())
+            digest.update(values.tobytes())
+    settings = {k: v for k, v in params.items() if k not in IGNORED_PARAMS}
+    digest.update(solver_name.encode())
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def proven_optimal(solver_name, status, mdl):
+    """Whether a solve ended within its MIP gap rather than at the time limit."""
+    if status not in PROVEN_STATUSES.get(solver_name, ()):
+        return False
+    # PuLP reports CBC runs stopped on time as 'Optimal' with an integer-feasible solution status
+    return getattr(mdl, 'sol_status', 1) == 1
+
+
+def solve_stats(mdl, wall_time):
+    """Collect the statistics of a solve that are kept alongside the cached assignment."""
+    stats = {'wall_time': wall_time,
+             'warm_start_delta': getattr(mdl, 'warm_start_delta', None)}
+    if getattr(mdl, 'stats', None) is not None:
+        stats['solve_stats'] = mdl.stats.to_dict()
+    return stats
+
+
+class CachedSolve:
+    """
+    Solve record returned in place of the solver model on a cache hit.
+
+    Exposes ``stats`` (the original run's ``SolveStats``), ``timings``,
+    ``warm_start_delta`` and, for CPLEX runs, ``solve_details`` like the
+    original model, so the validation functions accept it unchanged.
+    """
+
+    def __init__(self, key, status, record_stats):
+        self.key = key
+        self.status = status
+        self.wall_time = record_stats['wall_time']
+        self.warm_start_delta = record_stats.get('warm_start_delta')
+        self.stats = None
+        self.timings = {}
+        if 'solve_stats' in record_stats:
+            self.stats = SolveStats.from_dict(record_stats['solve_stats'])
+            self.timings = self.stats.timings
+            if self.stats.deterministic_time is not None:
+                self.solve_details = SimpleNamespace(deterministic_time=self.stats.deterministic_time,
+                                                     mip_relative_gap=self.stats.mip_gap,
+                                                     time=self.wall_time)
+
+
+class SolveCache:
+    """
+    Disk-backed cache of solver results, keyed by ``instance_key``.
+
+    Each entry is one ``.npz`` file holding the compact assignment and a JSON
+    record of delta, status and solve statistics. Reading an entry refreshes
+    its modification time, and once the directory grows beyond ``max_bytes``
+    the least recently used entries are deleted.
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        Defaults to ``../output/solve_cache``, next to the exported LP models.
+    max_bytes : int, default=512 MiB
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=512 * 2 ** 20):
+        if cache_dir is None:
+            cache_dir = os.path.abspath(os.path.join(os.getcwd(), "../output/solve_cache"))
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key):
+        """
+        Load an entry.
+
+        Returns
+        -------
+        (swap_index, record) or None
+            ``record`` holds 'delta', 'status', 'final' and 'stats'.
+        """
+        path = self.path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                swap_index = data['swap_index']
+                record = json.loads(str(data['record']))
+        except (OSError, KeyError, ValueError):
+            return None
+        os.utime(path)
+        return swap_index, record
+
+    def put(self, key, swap_index, delta, status, final, stats):
+        """Store an entry, then evict down to ``max_bytes``."""
+        record = {'delta': float(delta), 'status': status, 'final': bool(final), 'stats': stats}
+        tmp_path = os.path.join(self.cache_dir, f"{key}.{os.getpid()}.tmp.npz")
+        np.savez(tmp_path, swap_index=np.asarray(swap_index, dtype=np.int32),
+                 record=np.array(json.dumps(record, default=float)))
+        os.replace(tmp_path, self.path(key))
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in ``max_bytes``."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.npz') and '.tmp' not in entry.name:
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def solve(self, solver_name, credits_df: pd.DataFrame, swaps_df: pd.DataFrame, **params):
+        """
+        Cached ``solve_with_<solver_name>(credits_df, swaps_df, **params)``.
+
+        Results proven optimal are returned straight from the cache. A cached
+        result that stopped at the time limit is not final: the solver runs
+        again, warm-started from it (CBC and CPLEX), and only a better result
+        replaces the entry and is returned; otherwise, or if the re-run finds
+        no solution, the cached result is. Runs without a solution are not
+        cached.
+
+        Returns the usual ``(assignment, delta, status, model)`` tuple, with
+        the assignment in ``params['assignment_format']`` (compact by
+        default). On a hit ``model`` is a ``CachedSolve``.
+        """
+        assignment_format = params.pop('assignment_format', 'compact')
+        credits_df, swaps_df = as_frame(credits_df), as_frame(swaps_df)
+        key = instance_key(credits_df, swaps_df, solver_name, params)
+        num_swaps = len(swaps_df)
+
+        cached = self.get(key)
+        if cached is not None:
+            swap_index, record = cached
+            if record['final']:
+                return self.cached_result(key, cached, num_swaps, assignment_format)
+            if solver_name in WARM_START_SOLVERS:
+                params['warm_start'] = swap_index
+
+        start = time.perf_counter()
+        swap_index, delta, status, mdl = resolve_solver(solver_name)(credits_df, swaps_df,
+                                                                     assignment_format='compact', **params)
+        wall_time = time.perf_counter() - start
+        if swap_index is None:
+            if cached is not None:
+                return self.cached_result(key, cached, num_swaps, assignment_format)
+            return None, None, status, mdl
+
+        final = proven_optimal(solver_name, status, mdl)
+        if cached is not None:
+            cached_delta = cached[1]['delta']
+            # Keep the entry unless the re-solve improved on it, or proved a solution as good optimal
+            if delta > cached_delta or (delta == cached_delta and not final):
+                return self.cached_result(key, cached, num_swaps, assignment_format)
+        self.put(key, swap_index, delta, status, final, solve_stats(mdl, wall_time))
+        return format_assignment(swap_index_matrix(swap_index, num_swaps), assignment_format), delta, status, mdl
+
+    @staticmethod
+    def cached_result(key, cached, num_swaps, assignment_format):
+        """The ``(assignment, delta, status, model)`` tuple of a cache entry."""
+        swap_index, record = cached
+        assignment = format_assignment(swap_index_matrix(swap_index, num_swaps), assignment_format)
+        return assignment, record['delta'], record['status'], CachedSolve(key, record['status'], record['stats'])
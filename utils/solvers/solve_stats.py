@@ -0,0 +1,223 @@
+import re
+import resource
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Objective CBC reports while it has no solution yet
+CBC_NO_SOLUTION = 1e50
+
+CBC_CONTINUOUS_RE = re.compile(r"Continuous objective value is (\S+) - ([\d.]+) seconds")
+CBC_INCUMBENT_RE = re.compile(r"Cbc00(?:04|12)I Integer solution of (\S+) found.*\(([\d.]+) seconds\)")
+CBC_PROGRESS_RE = re.compile(r"Cbc0010I After .* (\S+) best solution, best possible (\S+) \(([\d.]+) seconds\)")
+CBC_ROOT_RE = re.compile(r"Cbc0013I At root node, .* changed objective from \S+ to (\S+) in")
+CBC_FINAL_RE = re.compile(r"Cbc000([15])I .*best objective (\S+?),?(?: \(best possible (\S+)\))?, took .*"
+                          r"\(([\d.]+) seconds\)")
+CBC_GAP_RE = re.compile(r"^Gap:\s+(\S+)", re.MULTILINE)
+CBC_NODES_RE = re.compile(r"^Enumerated nodes:\s+(\d+)", re.MULTILINE)
+
+
+def peak_rss_mb(children=False):
+    """
+    Peak resident set size in MiB of this process, or of its finished children
+    (e.g. the CBC executable). ru_maxrss is in KiB on Linux and bytes on macOS.
+    """
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2 ** 20 if sys.platform == 'darwin' else rss / 2 ** 10
+
+
+class SolveStats:
+    """
+    Instrumentation of one solver call, stored on the returned model as ``mdl.stats``.
+
+    ``timings`` holds the seconds per phase ('build', 'heuristic',
+    'strengthen', 'export', 'solve', 'extract'), ``num_rows``/``num_cols``/
+    ``num_nonzeros`` the model size, ``num_nodes`` the branch-and-bound nodes
+    and ``timeline`` one ``(seconds, incumbent, bound)`` entry per solver
+    progress report, NaN where not known yet. ``listener``, when set, is
+    called with every new timeline entry as it is recorded.
+    """
+
+    def __init__(self, solver_name):
+        self.solver_name = solver_name
+        self.status = None
+        self.timings = {}
+        self.num_rows = None
+        self.num_cols = None
+        self.num_nonzeros = None
+        self.num_nodes = None
+        self.timeline = []
+        self.mip_gap = None
+        self.deterministic_time = None
+        self.peak_rss_mb = None
+        self.peak_child_rss_mb = None
+        self.listener = None
+
+    @property
+    def wall_time(self):
+        return sum(self.timings.values())
+
+    @property
+    def incumbent(self):
+        values = [incumbent for _, incumbent, _ in self.timeline if not np.isnan(incumbent)]
+        return values[-1] if values else None
+
+    @property
+    def bound(self):
+        values = [bound for _, _, bound in self.timeline if not np.isnan(bound)]
+        return values[-1] if values else None
+
+    def record(self, seconds, incumbent=np.nan, bound=np.nan):
+        """Add a timeline point; missing values carry over from the previous one."""
+        incumbent = np.nan if incumbent is None else incumbent
+        bound = np.nan if bound is None else bound
+        if self.timeline:
+            _, last_incumbent, last_bound = self.timeline[-1]
+            incumbent = last_incumbent if np.isnan(incumbent) else incumbent
+            bound = last_bound if np.isnan(bound) else bound
+        self.timeline.append((float(seconds), float(incumbent), float(bound)))
+        if self.listener is not None:
+            self.listener(*self.timeline[-1])
+
+    def finish(self):
+        """Record the memory high-water marks and derive the gap if the solver gave none."""
+        self.peak_rss_mb = peak_rss_mb()
+        self.peak_child_rss_mb = peak_rss_mb(children=True)
+        if self.mip_gap is None and self.incumbent is not None and self.bound is not None:
+            self.mip_gap = abs(self.incumbent - self.bound) / max(abs(self.incumbent), 1e-10)
+        return self
+
+    def time_to_gap(self, gap):
+        """Solver seconds until the relative gap first fell to ``gap``, None if it never did."""
+        for seconds, incumbent, bound in self.timeline:
+            if not (np.isnan(incumbent) or np.isnan(bound)) \
+                    and abs(incumbent - bound) / max(abs(incumbent), 1e-10) <= gap:
+                return seconds
+        return None
+
+    def timeline_df(self):
+        return pd.DataFrame(self.timeline, columns=['Seconds', 'Incumbent', 'Bound'])
+
+    def summary_fields(self):
+        """Fields of the validation summary, in summary column order."""
+        return {
+            'Wall_Time': self.wall_time,
+            'Build_Time': self.timings.get('build'),
+            'Solve_Time': self.timings.get('solve'),
+            'Deterministic_Time': self.deterministic_time,
+            'MIP_Gap': self.mip_gap if self.mip_gap is not None else np.nan,
+            'Num_Rows': self.num_rows,
+            'Num_Cols': self.num_cols,
+            'Num_Nonzeros': self.num_nonzeros,
+            'Num_Nodes': self.num_nodes,
+            'Peak_RSS_MB': max(self.peak_rss_mb or 0.0, self.peak_child_rss_mb or 0.0) or None,
+        }
+
+    def to_dict(self):
+        values = {key: value for key, value in vars(self).items() if key != 'listener'}
+        return dict(values, timeline=[list(point) for point in self.timeline])
+
+    @classmethod
+    def from_dict(cls, values):
+        stats = cls(values['solver_name'])
+        stats.__dict__.update(values)
+        stats.timeline = [tuple(point) for point in values.get('timeline', [])]
+        return stats
+
+
+def _cbc_float(text):
+    value = float(text)
+    return np.nan if abs(value) >= CBC_NO_SOLUTION else value
+
+
+def parse_cbc_log(log, stats):
+    """
+    Fill the timeline of ``stats`` from a CBC log.
+
+    The LP relaxation and the root cuts (Cbc0013I, timed like the preceding
+    message) give the first bounds; every new integer solution
+    (Cbc0004I/Cbc0012I), node report (Cbc0010I) and the final search summary
+    adds a point. A completed search (Cbc0001I) closes the bound on the
+    incumbent, a partial one (Cbc0005I) reports its best possible value. The
+    gap CBC prints after a partial search becomes ``stats.mip_gap`` and the
+    enumerated nodes ``stats.num_nodes``.
+    """
+    events = []
+    for match in CBC_CONTINUOUS_RE.finditer(log):
+        events.append((match.start(), float(match.group(2)), np.nan, _cbc_float(match.group(1))))
+    for match in CBC_INCUMBENT_RE.finditer(log):
+        events.append((match.start(), float(match.group(2)), _cbc_float(match.group(1)), np.nan))
+    for match in CBC_PROGRESS_RE.finditer(log):
+        events.append((match.start(), float(match.group(3)), _cbc_float(match.group(1)),
+                       _cbc_float(match.group(2))))
+    for match in CBC_ROOT_RE.finditer(log):
+        events.append((match.start(), np.nan, np.nan, _cbc_float(match.group(1))))
+    for match in CBC_FINAL_RE.finditer(log):
+        incumbent = _cbc_float(match.group(2))
+        if match.group(1) == '1':
+            bound = incumbent
+        else:
+            bound = _cbc_float(match.group(3)) if match.group(3) else np.nan
+        events.append((match.start(), float(match.group(4)), incumbent, bound))
+
+    seconds_so_far = 0.0
+    for _, seconds, incumbent, bound in sorted(events):
+        seconds_so_far = seconds_so_far if np.isnan(seconds) else seconds
+        stats.record(seconds_so_far, incumbent, bound)
+
+    gaps = CBC_GAP_RE.findall(log)
+    if gaps:
+        stats.mip_gap = float(gaps[-1])
+    nodes = CBC_NODES_RE.findall(log)
+    if nodes:
+        stats.num_nodes = int(nodes[-1])
+    return stats
+
+
+class CbcLogFollower(threading.Thread):
+    """
+    Parse a growing CBC log while the solve runs and pass new timeline points to ``listener``.
+
+    The log is re-read every ``interval`` seconds up to its last complete
+    line; CBC writes it buffered, so points arrive in bursts. With ``echo``
+    the new lines are also printed as they arrive (``listener`` may then be
+    None). ``stop()`` ends the thread after a last read.
+    """
+
+    def __init__(self, log_path, listener, interval=0.5, echo=False):
+        super().__init__(daemon=True)
+        self.log_path = log_path
+        self.listener = listener
+        self.interval = interval
+        self.echo = echo
+        self.num_emitted = 0
+        self.num_printed = 0
+        self.stopped = threading.Event()
+
+    def poll(self):
+        try:
+            with open(self.log_path) as f:
+                log = f.read()
+        except OSError:
+            return
+        log = log[:log.rfind('\n') + 1]
+        if self.echo and len(log) > self.num_printed:
+            print(log[self.num_printed:], end='', flush=True)
+            self.num_printed = len(log)
+        if self.listener is None:
+            return
+        timeline = parse_cbc_log(log, SolveStats('CBC')).timeline
+        for point in timeline[self.num_emitted:]:
+            self.listener(*point)
+        self.num_emitted = max(self.num_emitted, len(timeline))
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.poll()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.poll()
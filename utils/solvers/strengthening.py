@@ -0,0 +1,220 @@
+import time
+import numpy as np
+import pandas as pd
+from scipy.optimize import milp, Bounds, LinearConstraint
+
+from utils.solvers.heuristics import assignment_delta, greedy_assignment
+from utils.solvers.mip_drop_highs import build_sparse_arrays
+from utils.solvers.mip_drop_lns import swap_totals
+
+# Slack on the derived delta bounds, so LP tolerances never cut off the optimum
+BOUND_TOLERANCE = 1e-7
+
+STRENGTHENING_COLUMNS = ['Strengthen', 'Status', 'Objective_Delta', 'Num_Nodes', 'Time_To_Gap', 'Solve_Time',
+                         'Wall_Time', 'MIP_Gap']
+
+
+class Strengthening:
+    """
+    Bounds and valid inequalities added to the dollar-offset model.
+
+    ``delta_lower`` comes from the LP relaxation and ``delta_upper`` from a
+    feasible incumbent, either None when unknown. ``min_credits[j]`` is the
+    least number of credits swap j needs to reach its principal and, given
+    ``delta_upper``, its lower dollar offset. ``excluded`` marks the (credit,
+    swap) pairs whose hedge alone overshoots the upper dollar offset.
+    ``swap_pairs`` lists consecutive swaps with identical targets, ordered by
+    their assigned ``credit_principal``, and ``credit_pairs`` consecutive
+    credits with identical data, the first assigned no later than the second;
+    both break symmetries without cutting off any objective value.
+    ``total_principal`` is the right-hand side of the aggregated principal
+    row.
+    """
+
+    def __init__(self):
+        self.delta_lower = None
+        self.delta_upper = None
+        self.min_credits = None
+        self.excluded = None
+        self.swap_pairs = []
+        self.credit_pairs = []
+        self.credit_principal = None
+        self.total_principal = 0.0
+        self.timings = {}
+
+    def summary(self):
+        return {'Delta_Lower': self.delta_lower,
+                'Delta_Upper': self.delta_upper,
+                'Cover_Rows': int((self.min_credits > 1).sum()) if self.min_credits is not None else 0,
+                'Excluded_Pairs': int(self.excluded.sum()) if self.excluded is not None else 0,
+                'Swap_Order_Rows': len(self.swap_pairs),
+                'Credit_Order_Rows': len(self.credit_pairs)}
+
+
+def min_cover_count(values, sizes, target):
+    """
+    Least number of items whose values can sum to ``target``.
+
+    Items are taken largest first, ``sizes[k]`` copies of ``values[k]``;
+    negative values never help and are ignored. Returns 0 for a target
+    that is already met and ``np.inf`` for one out of reach.
+    """
+    if target <= 0:
+        return 0
+    values = np.maximum(np.asarray(values, dtype=float), 0.0)
+    order = np.argsort(-values, kind='stable')
+    values, sizes = values[order], np.asarray(sizes, dtype=float)[order]
+    cum_value = np.cumsum(values * sizes)
+    k = int(np.searchsorted(cum_value, target * (1 - 1e-12)))
+    if k == len(values) or values[k] <= 0:
+        return np.inf
+    value_before = cum_value[k - 1] if k > 0 else 0.0
+    count_before = sizes[:k].sum()
+    return int(count_before + np.ceil((target - value_before) / values[k] - 1e-9))
+
+
+def consecutive_pairs(keys):
+    """Pairs of consecutive row positions sharing the same key, within each group of equal keys."""
+    frame = pd.DataFrame(keys)
+    groups = frame.groupby(list(frame.columns), sort=False).indices
+    pairs = []
+    for positions in groups.values():
+        pairs.extend(zip(positions[:-1].tolist(), positions[1:].tolist()))
+    return pairs
+
+
+def incumbent_delta(swap_index, credits_df: pd.DataFrame, swaps_df: pd.DataFrame):
+    """Delta of a compact assignment if it meets every constraint, else None."""
+    if swap_index is None:
+        return None
+    credit_principal = credits_df['Principal'].to_numpy(dtype=float)
+    swap_principal = swaps_df['Principal'].to_numpy(dtype=float)
+    totals = swap_totals(np.asarray(swap_index, dtype=np.int64), -credits_df['Delta_FV'].to_numpy(dtype=float),
+                         credit_principal, credit_principal * credits_df['Maturity'].to_numpy(dtype=float),
+                         swaps_df['Maturity'].to_numpy(dtype=float))
+    feasible = (np.all(totals['count'] >= 1) and np.all(totals['principal'] >= swap_principal - 1e-6)
+                and np.all(totals['maturity_slack'] >= -1e-6))
+    if not feasible:
+        return None
+    return assignment_delta(swap_index, credits_df['Delta_FV'].to_numpy(dtype=float),
+                            swaps_df['Delta_FV'].to_numpy(dtype=float))
+
+
+def strengthen(model_credits: pd.DataFrame, swaps_df: pd.DataFrame, class_sizes=None, upper_bound=None,
+               lp_relaxation=True, lp_time_limit=30):
+    """
+    Derive a ``Strengthening`` for the model over ``model_credits``.
+
+    Parameters
+    ----------
+    model_credits : pd.DataFrame
+        The credits, or the credit classes, the model is built on.
+    class_sizes : array-like of int, optional
+        Class sizes when ``model_credits`` are aggregated classes; identical
+        credits are then already merged and get no ordering rows.
+    upper_bound : float, optional
+        Delta of a feasible assignment (see ``incumbent_delta``).
+    lp_relaxation : bool, default=True
+        Solve the LP relaxation with HiGHS for ``delta_lower``; skipped if
+        it does not finish within ``lp_time_limit`` seconds.
+    """
+    result = Strengthening()
+    start = time.perf_counter()
+    credit_delta_fv = model_credits['Delta_FV'].to_numpy(dtype=float)
+    credit_principal = model_credits['Principal'].to_numpy(dtype=float)
+    credit_maturity = model_credits['Maturity'].to_numpy(dtype=float)
+    swap_delta_fv = swaps_df['Delta_FV'].to_numpy(dtype=float)
+    swap_principal = swaps_df['Principal'].to_numpy(dtype=float)
+    swap_maturity = swaps_df['Maturity'].to_numpy(dtype=float)
+    sizes = np.ones(len(model_credits)) if class_sizes is None else np.asarray(class_sizes, dtype=float)
+
+    if lp_relaxation:
+        lp = build_sparse_arrays(credit_delta_fv, credit_principal, credit_maturity, swap_delta_fv,
+                                 swap_principal, swap_maturity, class_sizes=class_sizes)
+        relaxed = milp(lp.c, integrality=np.zeros_like(lp.integrality),
+                       bounds=Bounds(lp.col_lower, lp.col_upper),
+                       constraints=LinearConstraint(lp.A, lp.row_lower, lp.row_upper),
+                       options={'time_limit': lp_time_limit})
+        if relaxed.status == 0:
+            result.delta_lower = max(float(relaxed.fun) - BOUND_TOLERANCE, 0.0)
+    if upper_bound is not None:
+        result.delta_upper = float(upper_bound) * (1 + 1e-9) + BOUND_TOLERANCE
+    result.timings['bounds'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # Cover counts from the principal and, under delta_upper, the lower dollar offset
+    credit_hedge = -credit_delta_fv
+    min_credits = np.ones(len(swaps_df))
+    excluded = np.zeros((len(model_credits), len(swaps_df)), dtype=bool)
+    for j in range(len(swaps_df)):
+        min_credits[j] = max(min_credits[j], min_cover_count(credit_principal, sizes, swap_principal[j]))
+        if result.delta_upper is None or np.isclose(swap_delta_fv[j], 0.0):
+            continue
+        oriented = np.sign(swap_delta_fv[j]) * credit_hedge
+        target = abs(swap_delta_fv[j])
+        min_credits[j] = max(min_credits[j],
+                             min_cover_count(oriented, sizes, (1 - result.delta_upper) * target))
+        if (oriented >= 0).all():
+            excluded[:, j] = oriented > (1 + result.delta_upper) * target
+    # An unreachable cover means the model is infeasible anyway; leave that to the solver
+    result.min_credits = np.where(np.isfinite(min_credits), min_credits, 1).astype(np.int64)
+    result.excluded = excluded
+    result.credit_principal = credit_principal
+    result.total_principal = float(swap_principal.sum())
+
+    result.swap_pairs = consecutive_pairs({'Principal': swap_principal, 'Delta_FV': swap_delta_fv,
+                                           'Maturity': swap_maturity})
+    if class_sizes is None:
+        result.credit_pairs = consecutive_pairs({'Principal': credit_principal, 'Delta_FV': credit_delta_fv,
+                                                 'Maturity': credit_maturity})
+    result.timings['inequalities'] = time.perf_counter() - start
+    return result
+
+
+def resolve_strengthening(strengthen_model, credits_df: pd.DataFrame, swaps_df: pd.DataFrame, classes,
+                          warm_index=None):
+    """
+    Turn a solver's ``strengthen`` argument into a ``Strengthening``, or None.
+
+    The upper bound comes from ``warm_index``, or the greedy assignment
+    without one, whenever it is feasible and the model's classes (if any)
+    are exact, so its delta is attainable in the model.
+    """
+    if not strengthen_model:
+        return None
+    upper_bound = None
+    if classes is None or classes.exact:
+        incumbent = warm_index if warm_index is not None else greedy_assignment(credits_df, swaps_df)
+        upper_bound = incumbent_delta(incumbent, credits_df, swaps_df)
+    if classes is None:
+        return strengthen(credits_df, swaps_df, upper_bound=upper_bound)
+    return strengthen(classes.frame, swaps_df, class_sizes=classes.sizes, upper_bound=upper_bound)
+
+
+def compare_strengthening(credits_df: pd.DataFrame, swaps_df: pd.DataFrame, solver='cbc', **params):
+    """
+    Solve an instance with and without ``strengthen`` and compare the runs.
+
+    ``params`` go to ``solve_with_<solver>`` ('cbc' or 'cplex'), e.g.
+    ``time_limit`` and ``mip_gap``; time-to-gap is measured against that
+    ``mip_gap``.
+
+    Returns
+    -------
+    pd.DataFrame with the ``STRENGTHENING_COLUMNS`` schema, one row per run.
+    """
+    from utils.solvers.solve_cache import resolve_solver
+    if solver in ('cbc', 'cplex'):
+        params.setdefault('export', False)
+    mip_gap = params.get('mip_gap', 0.01)
+
+    rows = []
+    for strengthen_model in (False, True):
+        _, delta, status, mdl = resolve_solver(solver)(credits_df, swaps_df, strengthen=strengthen_model,
+                                                        **params)
+        stats = mdl.stats
+        rows.append({'Strengthen': strengthen_model, 'Status': status, 'Objective_Delta': delta,
+                     'Num_Nodes': stats.num_nodes, 'Time_To_Gap': stats.time_to_gap(mip_gap),
+                     'Solve_Time': stats.timings.get('solve'), 'Wall_Time': stats.wall_time,
+                     'MIP_Gap': stats.mip_gap})
+    return pd.DataFrame(rows, columns=STRENGTHENING_COLUMNS)
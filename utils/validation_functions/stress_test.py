@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_array
+
+from utils.data_generation.hedge_item_gen import credit_fv_delta_array, credit_fv_delta_matrix
+from utils.data_generation.scenarios import BASE_RATE
+from utils.solvers.assignment_utils import swap_index_from_frame
+
+STRESS_COLUMNS = ['Rate_Shock', 'Min_r_j', 'Max_r_j', 'Worst_Swap', 'Failing_Swaps', 'All_Delta_OK']
+
+
+def scenario_shocks(rate_shocks):
+    """
+    Rate shocks as a 1-D array of parallel shifts.
+
+    A (num_scenarios, num_steps) array of rate paths enters through the
+    shift at its last step: the one-period valuation of ``credit_fv_delta``
+    only sees the benchmark rate at the valuation date.
+    """
+    shocks = np.asarray(rate_shocks, dtype=float)
+    if shocks.ndim == 2:
+        shocks = shocks[:, -1]
+    if shocks.ndim != 1:
+        raise ValueError(f"Expected rate shocks of shape (num_scenarios,) or (num_scenarios, num_steps), "
+                         f"got {shocks.shape}.")
+    return shocks
+
+
+def swap_fv_delta_matrix(swaps_df: pd.DataFrame, rate_shocks, base_shock, base_rate=BASE_RATE):
+    """
+    Delta_FV of every swap under every rate shock.
+
+    Swaps only carry their Delta_FV under ``base_shock``, so each is repriced
+    as an amortizing leg with the swap's Principal and Maturity at the bare
+    benchmark rate: its Delta_FV scales with that leg's change in fair value
+    relative to the base shock.
+
+    Returns
+    -------
+    np.ndarray of shape (num_swaps, num_scenarios)
+    """
+    shocks = scenario_shocks(rate_shocks)
+    principal = swaps_df['Principal'].to_numpy(dtype=float)
+    maturity = swaps_df['Maturity'].to_numpy(dtype=float)
+    spread = np.zeros(len(swaps_df))
+
+    leg_base = credit_fv_delta_array(principal, maturity, spread, (base_rate, base_rate + base_shock))
+    leg = credit_fv_delta_matrix(principal, maturity, spread, base_rate, shocks)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = np.where(leg_base[:, np.newaxis] == 0, 0.0, leg / leg_base[:, np.newaxis])
+    return swaps_df['Delta_FV'].to_numpy(dtype=float)[:, np.newaxis] * scale
+
+
+def assigned_delta_matrix(swap_index, credits_df: pd.DataFrame, num_swaps, rate_shocks, base_rate=BASE_RATE,
+                          chunk_size=100_000):
+    """
+    Assigned Delta_FV per swap under every rate shock.
+
+    Credits are revalued ``chunk_size`` at a time, so at most a
+    (chunk_size, num_scenarios) matrix is held, and summed per swap with one
+    sparse product per chunk.
+
+    Returns
+    -------
+    np.ndarray of shape (num_swaps, num_scenarios)
+    """
+    if 'Credit_Spread' not in credits_df.columns:
+        raise ValueError("Credits need a 'Credit_Spread' column to be revalued under rate shocks.")
+    shocks = scenario_shocks(rate_shocks)
+    swap_index = np.asarray(swap_index, dtype=np.int64)
+    principal = credits_df['Principal'].to_numpy(dtype=float)
+    maturity = credits_df['Maturity'].to_numpy(dtype=float)
+    spread = credits_df['Credit_Spread'].to_numpy(dtype=float)
+
+    sums = np.zeros((num_swaps, len(shocks)))
+    for start in range(0, len(swap_index), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        assigned = np.flatnonzero(swap_index[chunk] >= 0)
+        if len(assigned) == 0:
+            continue
+        rows = assigned + start
+        deltas = credit_fv_delta_matrix(principal[rows], maturity[rows], spread[rows], base_rate, shocks)
+        membership = csr_array((np.ones(len(rows)), (swap_index[rows], np.arange(len(rows)))),
+                               shape=(num_swaps, len(rows)))
+        sums += membership @ deltas
+    return sums
+
+
+def stress_test_assignment(assignment, credits_df: pd.DataFrame, swaps_df: pd.DataFrame, rate_shocks,
+                           base_shock, base_rate=BASE_RATE, swap_delta_fv=None, chunk_size=100_000):
+    """
+    Dollar-offset ratio of an assignment under many rate shocks.
+
+    Every credit is revalued under every shock (``assigned_delta_matrix``)
+    and compared with the swaps' Delta_FV under the same shock, from
+    ``swap_delta_fv`` when given, else ``swap_fv_delta_matrix`` calibrated on
+    ``base_shock``, the shock the swaps' Delta_FV were generated with. At the
+    base shock the credits' Delta_FV are those of ``credits_df``, so that
+    scenario reproduces ``validate_assignment``.
+
+    Parameters
+    ----------
+    assignment : np.ndarray or pd.DataFrame
+        Compact swap index or legacy ``Credits_Assigned_Swap_j`` frame, in
+        ``credits_df`` row order.
+    rate_shocks : array-like
+        Parallel shifts, or rate paths (see ``scenario_shocks``).
+    swap_delta_fv : array-like of shape (num_swaps, num_scenarios), optional
+
+    Returns
+    -------
+    r_df : pd.DataFrame
+        ``r_j`` with one row per swap (index 'Swap_ID') and one column per shock.
+    stress_df : pd.DataFrame
+        One row per shock with the ``STRESS_COLUMNS`` schema; a swap fails
+        when its ``r_j`` leaves the 0.85-1.15 band of ``validate_assignment``.
+    """
+    if isinstance(assignment, pd.DataFrame):
+        swap_index = swap_index_from_frame(assignment)
+    else:
+        swap_index = np.asarray(assignment, dtype=np.int64)
+    shocks = scenario_shocks(rate_shocks)
+    num_swaps = len(swaps_df)
+
+    if swap_delta_fv is None:
+        swap_delta_fv = swap_fv_delta_matrix(swaps_df, shocks, base_shock, base_rate=base_rate)
+    swap_delta_fv = np.asarray(swap_delta_fv, dtype=float)
+    assigned = assigned_delta_matrix(swap_index, credits_df.reset_index(drop=True), num_swaps, shocks,
+                                     base_rate=base_rate, chunk_size=chunk_size)
+
+    zero_target = np.isclose(swap_delta_fv, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_j = np.where(zero_target, np.nan, assigned / (-1 * swap_delta_fv))
+    failing = np.where(zero_target, ~np.isclose(assigned, 0.0), ~((0.85 <= r_j) & (r_j <= 1.15)))
+    deviation = np.where(np.isnan(r_j), -np.inf, np.abs(r_j - 1))
+
+    r_df = pd.DataFrame(r_j, index=pd.Index(np.arange(num_swaps), name='Swap_ID'), columns=shocks)
+    stress_df = pd.DataFrame({
+        'Rate_Shock': shocks,
+        'Min_r_j': r_df.min().to_numpy(),
+        'Max_r_j': r_df.max().to_numpy(),
+        'Worst_Swap': np.where(np.isfinite(deviation).any(axis=0), deviation.argmax(axis=0), -1),
+        'Failing_Swaps': failing.sum(axis=0),
+        'All_Delta_OK': ~failing.any(axis=0),
+    }, columns=STRESS_COLUMNS)
+    return r_df, stress_df
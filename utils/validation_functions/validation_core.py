@@ -0,0 +1,129 @@
+import pandas as pd
+import numpy as np
+
+from utils.data_generation.instance_store import as_frame
+
+RESULT_COLUMNS = ['Swap_ID',
+                  'Assigned_Principal', 'Swap_Principal', 'Principal_OK',
+                  'Assigned_Delta_FV', 'Swap_Delta_FV', 'r_j', 'Delta_OK',
+                  'Assigned_Weighted_Maturity', 'Swap_Maturity', 'Maturity_OK']
+
+
+def assigned_sums(assignment, swaps_df: pd.DataFrame, credits_df: pd.DataFrame):
+    """
+    Sum Principal, Delta_FV and Principal * Maturity of the assigned credits per swap.
+
+    All swaps are aggregated in one pass: an ``np.bincount`` over the compact
+    swap index, or one matrix-vector product over the legacy wide frame.
+
+    Returns
+    -------
+    swap_ids : np.ndarray
+    targets : pd.DataFrame
+        Rows of ``swaps_df`` matching ``swap_ids``.
+    sums : np.ndarray of shape (len(swap_ids), 3)
+        Assigned principal, Delta_FV and principal x maturity per swap.
+    """
+    credits_df, swaps_df = as_frame(credits_df), as_frame(swaps_df)
+    if 'UNIQUE_INDEX' in credits_df.columns and credits_df.index.name != 'UNIQUE_INDEX':
+        credits_df = credits_df.set_index('UNIQUE_INDEX')
+
+    principal = credits_df['Principal'].to_numpy(dtype=float)
+    weights = np.column_stack([principal,
+                               credits_df['Delta_FV'].to_numpy(dtype=float),
+                               principal * credits_df['Maturity'].to_numpy(dtype=float)])
+
+    if isinstance(assignment, (np.ndarray, pd.Series)):
+        # Compact swap index, positional over credits and swaps
+        swap_index = np.asarray(assignment, dtype=np.int64)
+        targets = swaps_df.reset_index(drop=True)
+        swap_ids = np.arange(len(targets))
+        assigned = swap_index >= 0
+        sums = np.column_stack([np.bincount(swap_index[assigned], weights=w[assigned],
+                                            minlength=len(swap_ids))
+                                for w in weights.T])
+        return swap_ids, targets, sums
+
+    if 'UNIQUE_INDEX' in assignment.columns and assignment.index.name != 'UNIQUE_INDEX':
+        assignment = assignment.set_index('UNIQUE_INDEX')
+
+    swap_cols = [c for c in assignment.columns if str(c).startswith('Credits_Assigned_Swap_')]
+    swap_ids = np.array([int(c.split('_')[-1]) for c in swap_cols], dtype=int)
+
+    # Match assignment rows to credits by label, as the per-swap isin() lookups did
+    assigned = assignment[swap_cols] == 1
+    if not assigned.index.is_unique:
+        assigned = assigned.groupby(level=0).any()
+    assigned = assigned.reindex(credits_df.index, fill_value=False).to_numpy(dtype=float)
+
+    sums = assigned.T @ weights
+    targets = swaps_df.loc[swap_ids]
+    return swap_ids, targets, sums
+
+
+def validate_assignment(assignment, swaps_df: pd.DataFrame, credits_df: pd.DataFrame):
+    """
+    Per-swap dollar-offset, principal and weighted maturity checks.
+
+    ``assignment`` is the legacy ``Credits_Assigned_Swap_j`` frame or the
+    compact int32 swap index (swap id per credits_df row, -1 if dropped).
+    Both frames may also be mappings of column arrays (see ``as_frame``).
+
+    Returns
+    -------
+    results_df : pd.DataFrame
+        One row per swap with the ``RESULT_COLUMNS`` schema; 'r_j' and
+        'Assigned_Weighted_Maturity' are float columns, NaN where undefined
+        (zero target delta, no assigned principal).
+    """
+    swap_ids, targets, sums = assigned_sums(assignment, swaps_df, credits_df)
+    if len(swap_ids) == 0:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    assigned_principal, assigned_delta_fv, assigned_pm = sums.T
+    swap_principal = targets['Principal'].to_numpy(dtype=float)
+    swap_delta_fv = targets['Delta_FV'].to_numpy(dtype=float)
+    swap_maturity = targets['Maturity'].to_numpy(dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        assigned_wmaturity = np.where(assigned_principal > 0, assigned_pm / assigned_principal, np.nan)
+        zero_target = np.isclose(swap_delta_fv, 0.0)
+        r_j = np.where(zero_target, np.nan, assigned_delta_fv / (-1 * swap_delta_fv))
+
+    delta_ok = np.where(zero_target, np.isclose(assigned_delta_fv, 0.0), (0.85 <= r_j) & (r_j <= 1.15))
+    principal_ok = assigned_principal >= swap_principal
+    maturity_ok = ~np.isnan(assigned_wmaturity) & (assigned_wmaturity >= swap_maturity)
+
+    results_df = pd.DataFrame({
+        'Swap_ID': swap_ids,
+        'Assigned_Principal': np.round(assigned_principal, 2),
+        'Swap_Principal': np.round(swap_principal, 2),
+        'Principal_OK': principal_ok,
+
+        'Assigned_Delta_FV': np.round(assigned_delta_fv, 2),
+        'Swap_Delta_FV': np.round(swap_delta_fv, 2),
+        'r_j': np.round(r_j, 6),
+        'Delta_OK': delta_ok.astype(bool),
+
+        'Assigned_Weighted_Maturity': np.round(assigned_wmaturity, 6),
+        'Swap_Maturity': np.round(swap_maturity, 6),
+        'Maturity_OK': maturity_ok
+    })
+    return results_df.sort_values('Swap_ID').reset_index(drop=True)
+
+
+def summarize_results(results_df: pd.DataFrame, objective_delta: float, **fields):
+    """
+    Overall summary of a validation run.
+
+    ``fields`` (experiment name, solver, timings, ...) come first, in the order
+    given, followed by the objective and the all-swaps checks.
+    """
+    summary = dict(fields)
+    summary.update({
+        'Objective_Delta': f"{objective_delta:,.4f}",
+        'All_Delta_OK': bool(results_df['Delta_OK'].all()) if not results_df.empty else False,
+        'All_Principal_OK': bool(results_df['Principal_OK'].all()) if not results_df.empty else False,
+        'All_Maturity_OK': bool(results_df['Maturity_OK'].all()) if not results_df.empty else False
+    })
+    return summary